@@ -0,0 +1,561 @@
+# CS472 - Homework #4
+# Edward Parrish
+# aioclient.py
+#
+# This module is the asyncio module of the FTP client. It contains the
+# AsyncClient class which performs the same operations as the Client class on
+# an event loop, so that one process can drive many sessions at once without
+# a thread per connection. Replies are parsed by the same ReplyReader, and
+# chunks are sized, translated, rate limited and counted by the same
+# TransferState, as in the blocking client.
+
+from reply import ReplyReader, decode, is_transfer_started
+from reply import parse_pasv_response, parse_epsv_response, parse_size
+from reply import convert_port_to_p1p2
+from exceptions import ServerReplyError, TransferError, ConnectionClosedError
+from throttle import TokenBucket, transfer_limiter
+from transfer import TransferState
+from tuning import default_profile
+from util import System
+import asyncio
+import socket
+
+COMMAND_OK = 200
+SERVICE_READY = 220
+FILE_ACTION_SUCCESSFUL = 226
+USER_LOGGED_IN = 230
+PASSWORD_NEEDED = 331
+FILE_ACTION_PENDING = 350
+
+PASV = 'pasv'
+EPSV = 'epsv'
+PORT = 'port'
+EPRT = 'eprt'
+DATA_CONN_MODES = [PASV, EPSV, PORT, EPRT]
+
+IPv4 = 1
+IPv6 = 2
+
+FILE_QUEUE_DEPTH = 8
+
+TYPE_BINARY = 'I'
+
+
+class AsyncDataConnection:
+    '''AsyncDataConnection
+    A data connection on the event loop. Passive connections are opened by the
+    client; active connections are accepted from a listening server and
+    become usable once wait_connected returns.'''
+
+    def __init__(self, profile=default_profile):
+        self.profile = profile
+        self.limiter = None
+        self.reader = None
+        self.writer = None
+        self.server = None
+        self.connected = asyncio.Event()
+
+    async def connect(self, host, port):
+        '''connect(host, port)
+        Connect data connection to host and set the connected event.'''
+
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.connected.set()
+
+    async def listen(self, host, family):
+        '''listen(host, family) -> port number
+        Listen for the server to connect on an ephemeral port of host.'''
+
+        self.server = await asyncio.start_server(
+            self.accept, host=host, port=0, family=family, backlog=1)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def accept(self, reader, writer):
+        # Test if a connection was already accepted.
+        if self.connected.is_set():
+            writer.close()
+            return
+
+        self.reader, self.writer = reader, writer
+        self.connected.set()
+
+    async def wait_connected(self, timeout=None):
+        '''wait_connected(timeout=None)
+        Wait until the data connection is established, at most timeout
+        seconds or the accept timeout of the socket profile. Raise
+        TransferError if the server does not connect in time.'''
+
+        if timeout is None:
+            timeout = self.profile.accept_timeout
+        try:
+            await asyncio.wait_for(self.connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise TransferError(None, 'Server did not open the data connection.')
+
+        # Only one connection is expected.
+        if self.server:
+            self.server.close()
+
+    async def receive_text(self, bufsize=None):
+        '''receive_text(bufsize=None) -> data
+        Receive a text transfer, such as a directory listing, until the server
+        closes the data connection and return it decoded.'''
+
+        state = TransferState(self.profile.chunk_sizer(bufsize), limiter=self.limiter)
+        chunks = []
+        while True:
+            chunk = await self.reader.read(state.next_size())
+
+            # Test if server closed the data connection.
+            if not chunk:
+                break
+
+            chunks.append(chunk)
+            wait = state.count(len(chunk))
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        return decode(b''.join(chunks))
+
+    async def receive_to(self, f, size=None, bufsize=None, translator=None,
+                         progress=None):
+        '''receive_to(f, size=None, bufsize=None, translator=None, progress=None) -> number of bytes
+        Stream the data transfer into an open binary file until the server
+        closes the data connection, or until size bytes have arrived. Chunks
+        are handed through a bounded queue to a worker that writes them on a
+        thread, so a slow disk never stalls the event loop, and reading waits
+        while the queue is full. Whether the transfer ends, fails or is
+        cancelled, it returns only once the worker has stopped, so f is never
+        closed under a write.'''
+
+        state = TransferState(self.profile.chunk_sizer(bufsize), size, translator,
+                              self.limiter, progress)
+        queue = asyncio.Queue(FILE_QUEUE_DEPTH)
+        worker = asyncio.create_task(write_chunks(queue, f))
+        try:
+            while not state.is_done():
+                chunk = await self.reader.read(state.next_size())
+
+                # Test if server closed the data connection.
+                if not chunk:
+                    break
+
+                wait = state.count(len(chunk))
+                await put_chunk(queue, worker, state.translate(chunk))
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            await put_chunk(queue, worker, state.flush())
+        finally:
+            await stop_writer(queue, worker)
+
+        # Raise the worker's error, if it failed.
+        worker.result()
+        return state.total
+
+    async def send_from(self, f, bufsize=None, translator=None, progress=None):
+        '''send_from(f, bufsize=None, translator=None, progress=None) -> number of bytes
+        Stream an open binary file to the server. A worker reads the file on
+        a thread ahead of the sender, at most FILE_QUEUE_DEPTH chunks ahead,
+        and the sender waits for the socket to drain after each chunk, so
+        memory use stays bounded. It returns only once the worker has
+        stopped, so f is never closed under a read.'''
+
+        state = TransferState(self.profile.chunk_sizer(bufsize), None, translator,
+                              self.limiter, progress)
+        queue = asyncio.Queue(FILE_QUEUE_DEPTH)
+        stop = asyncio.Event()
+        worker = asyncio.create_task(read_chunks(queue, f, state, stop))
+        try:
+            while True:
+                chunk = await queue.get()
+
+                # Test if the worker failed to read the file.
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                # Test if end of file.
+                if not chunk:
+                    break
+
+                # Pay for the chunk before it is sent.
+                wait = state.count(len(chunk))
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                self.writer.write(state.translate(chunk))
+                await self.writer.drain()
+
+            tail = state.flush()
+            if tail:
+                self.writer.write(tail)
+                await self.writer.drain()
+        finally:
+            await stop_reader(queue, worker, stop)
+
+        return state.total
+
+    async def close(self):
+        '''close()
+        Close the data connection and any listening server.'''
+
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+
+        if self.server:
+            self.server.close()
+            self.server = None
+
+
+async def write_chunks(queue, f):
+    '''write_chunks(queue, f)
+    Write the chunks of a queue to an open binary file on a thread until a
+    None chunk ends the transfer. The chunks queued at each turn are written
+    in one call, so a fast transfer does not pay a thread hand-off per
+    chunk.'''
+
+    while True:
+        chunks = [await queue.get()]
+        while not queue.empty() and chunks[-1] is not None:
+            chunks.append(queue.get_nowait())
+
+        done = chunks[-1] is None
+        if done:
+            chunks.pop()
+        if chunks:
+            await asyncio.to_thread(write_all, f, chunks)
+
+        # Test if the transfer is over.
+        if done:
+            return
+
+
+def write_all(f, chunks):
+    for chunk in chunks:
+        f.write(chunk)
+
+
+async def stop_writer(queue, worker):
+    '''stop_writer(queue, worker)
+    Let a write_chunks worker write what is queued and wait until it has
+    stopped. A write already on its thread cannot be cancelled, so the file
+    must stay open until then. The worker's error is left for the caller.'''
+
+    # Test if the worker is still running.
+    if not worker.done():
+        put = asyncio.ensure_future(queue.put(None))
+        await asyncio.wait({put, worker}, return_when=asyncio.FIRST_COMPLETED)
+
+        # Test if the worker stopped before taking the end of the transfer.
+        if not put.done():
+            put.cancel()
+
+        await asyncio.wait({worker})
+
+    # Mark the worker's error as retrieved.
+    if not worker.cancelled():
+        worker.exception()
+
+
+async def read_chunks(queue, f, state, stop):
+    '''read_chunks(queue, f, state, stop)
+    Read an open binary file into a queue on a thread, in chunks of the
+    size state asks for, until the file ends or stop is set. An empty chunk
+    marks the end of the file. An error is queued in place of a chunk.'''
+
+    while not stop.is_set():
+        try:
+            chunk = await asyncio.to_thread(f.read, state.next_size())
+        except OSError as err:
+            await queue.put(err)
+            return
+
+        await queue.put(chunk)
+
+        # Test if end of file.
+        if not chunk:
+            return
+
+
+async def stop_reader(queue, worker, stop):
+    '''stop_reader(queue, worker, stop)
+    Stop a read_chunks worker and wait until it has stopped. A read already
+    on its thread cannot be cancelled, so the file must stay open until
+    then. Emptying the queue leaves room for the one chunk the worker may
+    still put before it sees stop.'''
+
+    stop.set()
+    while not queue.empty():
+        queue.get_nowait()
+
+    await asyncio.wait({worker})
+
+
+async def put_chunk(queue, worker, chunk):
+    '''put_chunk(queue, worker, chunk)
+    Queue a chunk for a file worker, waiting while the queue is full. Raise
+    the worker's error if it stops before taking the chunk.'''
+
+    # Test if there is room without waiting.
+    if not worker.done() and not queue.full():
+        queue.put_nowait(chunk)
+        return
+
+    put = asyncio.ensure_future(queue.put(chunk))
+    await asyncio.wait({put, worker}, return_when=asyncio.FIRST_COMPLETED)
+
+    # Test if the worker stopped first.
+    if not put.done():
+        put.cancel()
+        worker.result()
+        raise TransferError(None, 'File worker stopped early.')
+
+
+class AsyncClient:
+    '''AsyncClient
+    An FTP client session on the event loop. It supports login, cwd, pwd,
+    list, retr and stor over PASV, EPSV, PORT and EPRT data connections.'''
+
+    def __init__(self, host, port, mode=PASV):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.profile = default_profile
+        self.transfer_limit = None
+        self.session_limit = TokenBucket()
+        self.reader = None
+        self.writer = None
+        self.replies = ReplyReader()
+        self.logged_in = False
+        self.current_type = None
+
+    async def connect(self):
+        '''connect()
+        Open the control connection and wait for the server to be ready.'''
+
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port)
+        self.replies = ReplyReader()
+
+        while True:
+            response = await self.get_response()
+            if response.code == SERVICE_READY:
+                break
+
+    async def close(self):
+        '''close()
+        Send QUIT and close the control connection.'''
+
+        if self.writer:
+            try:
+                await self.send_message('QUIT')
+                await self.get_response()
+            except (OSError, ConnectionClosedError):
+                pass
+            self.writer.close()
+            self.writer = None
+
+    async def send_message(self, command, value=''):
+        '''send_message(command, value='')
+        Send a command to the server.'''
+
+        self.writer.write(f'{command} {value}\r\n'.encode())
+        await self.writer.drain()
+
+    async def get_response(self, bufsize=4096):
+        '''get_response(bufsize=4096) -> ServerResponse
+        Receive the next complete reply from the server. Malformed replies are
+        skipped.'''
+
+        while True:
+            # Receive until the reader holds a complete reply.
+            while not self.replies.has_reply():
+                data = await self.reader.read(bufsize)
+
+                # Test if server closed the control connection.
+                if not data:
+                    raise ConnectionClosedError(
+                        'Connection closed by remote host.')
+
+                self.replies.feed(data)
+
+            try:
+                return self.replies.next_reply()
+            except ServerReplyError:
+                continue
+
+    async def command(self, command, value=''):
+        '''command(command, value='') -> ServerResponse
+        Send a command and return its reply.'''
+
+        await self.send_message(command, value)
+        return await self.get_response()
+
+    async def login(self, username, password=''):
+        '''login(username, password='') -> ServerResponse
+        Perform user login with the USER and PASS commands.'''
+
+        response = await self.command('USER', username)
+
+        # Test if server reply code indicates password needed.
+        if response.code == PASSWORD_NEEDED:
+            response = await self.command('PASS', password)
+
+        # Test if login was refused.
+        if response.code != USER_LOGGED_IN:
+            raise ServerReplyError(response, 'Login was refused.')
+
+        self.logged_in = True
+        return response
+
+    async def cwd(self, path):
+        return await self.command('CWD', path)
+
+    async def pwd(self):
+        return await self.command('PWD')
+
+    async def ensure_binary(self):
+        '''ensure_binary()
+        Switch the session to binary (TYPE I) so files are transferred byte
+        for byte.'''
+
+        # Test if session is already in binary mode.
+        if self.current_type == TYPE_BINARY:
+            return
+
+        response = await self.command('TYPE', TYPE_BINARY)
+        if response.code != COMMAND_OK:
+            raise TransferError(response, 'TYPE I refused by server.')
+
+        self.current_type = TYPE_BINARY
+
+    async def size(self, path):
+        return parse_size(await self.command('SIZE', path))
+
+    async def open_data_conn(self):
+        '''open_data_conn() -> AsyncDataConnection
+        Establish a data connection using the client's data connection mode.
+        Raise TransferError if the server refuses the mode.'''
+
+        data_conn = AsyncDataConnection(self.profile)
+        data_conn.limiter = transfer_limiter(self.transfer_limit, self.session_limit)
+        mode = self.data_conn_mode()
+
+        # PASV
+        if mode == PASV:
+            response = await self.command('PASV')
+            self.check_data_conn_reply(response)
+            host, port = parse_pasv_response(response.message)
+            await data_conn.connect(host, port)
+
+        # EPSV
+        elif mode == EPSV:
+            response = await self.command('EPSV')
+            self.check_data_conn_reply(response)
+            port = parse_epsv_response(response.message)
+            await data_conn.connect(self.writer.get_extra_info('peername')[0], port)
+
+        # PORT
+        elif mode == PORT:
+            client_addr = self.writer.get_extra_info('sockname')[0]
+            port = await data_conn.listen(client_addr, socket.AF_INET)
+            p1, p2 = convert_port_to_p1p2(port)
+            h1to4 = client_addr.replace('.', ',')
+            response = await self.command('PORT', f'{h1to4},{p1},{p2}')
+            self.check_data_conn_reply(response)
+
+        # EPRT
+        elif mode == EPRT:
+            client_addr = self.writer.get_extra_info('sockname')[0]
+            family = self.writer.get_extra_info('socket').family
+            net_prt = IPv6 if family == socket.AF_INET6 else IPv4
+            port = await data_conn.listen(client_addr, family)
+            response = await self.command('EPRT', f'|{net_prt}|{client_addr}|{port}|')
+            self.check_data_conn_reply(response)
+
+        else:
+            raise ValueError(f'Unknown data connection mode: {self.mode}')
+
+        return data_conn
+
+    def data_conn_mode(self):
+        '''data_conn_mode() -> PASV, EPSV, PORT or EPRT
+        Return the client's data connection mode. PASV and PORT can only
+        carry IPv4 addresses, so over IPv6 they are replaced by EPSV and
+        EPRT, as in the blocking client.'''
+
+        # Test if control connection is IPv6.
+        if self.writer.get_extra_info('socket').family == socket.AF_INET6:
+            return {PASV: EPSV, PORT: EPRT}.get(self.mode, self.mode)
+
+        return self.mode
+
+    def check_data_conn_reply(self, response):
+        # Test if server refused the data connection mode.
+        if response.code >= 400:
+            raise TransferError(
+                response, f'{self.data_conn_mode().upper()} refused by server.')
+
+    async def transfer(self, command, value, operation):
+        '''transfer(command, value, operation) -> result of operation
+        Run one data transfer: open the data connection, send the transfer
+        command, run operation(data_conn) once the transfer has started and
+        confirm the final reply.'''
+
+        data_conn = await self.open_data_conn()
+        try:
+            response = await self.command(command, value)
+
+            # Test if server did not start the transfer.
+            if not is_transfer_started(response):
+                raise TransferError(response, 'Transfer was not started.')
+
+            await data_conn.wait_connected()
+            result = await operation(data_conn)
+            await data_conn.close()
+
+            response = await self.get_response()
+
+            # Test if server did not complete the transfer.
+            if response.code != FILE_ACTION_SUCCESSFUL:
+                raise TransferError(response, 'Transfer was not completed.')
+
+            return result
+        finally:
+            await data_conn.close()
+
+    async def list(self, path=''):
+        '''list(path='') -> listing text
+        Retrieve a directory listing.'''
+
+        return await self.transfer(
+            'LIST', path, lambda data_conn: data_conn.receive_text())
+
+    async def retr(self, remote_path, local_path):
+        '''retr(remote_path, local_path) -> number of bytes written
+        Retrieve a remote file into a local file.'''
+
+        await self.ensure_binary()
+        f = await asyncio.to_thread(System.open_file, local_path, 'wb')
+        try:
+            return await self.transfer(
+                'RETR', remote_path, lambda data_conn: data_conn.receive_to(f))
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def stor(self, local_path, remote_path):
+        '''stor(local_path, remote_path) -> number of bytes sent
+        Store a local file on the server.'''
+
+        await self.ensure_binary()
+        f = await asyncio.to_thread(System.open_file, local_path, 'rb')
+        try:
+            return await self.transfer(
+                'STOR', remote_path, lambda data_conn: data_conn.send_from(f))
+        finally:
+            await asyncio.to_thread(f.close)
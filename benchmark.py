@@ -0,0 +1,301 @@
+# CS472 - Homework #4
+# Edward Parrish
+# benchmark.py
+#
+# This module is the benchmark module of the FTP client. It runs the client
+# against a local TestServer and measures small file operations per second,
+# large file throughput, the memory high-water mark of a large transfer and
+# directory listing latency, so that performance changes can be measured
+# without a network. The parsing microbenchmark measures the control
+# connection parsers and the command dispatcher without a server.
+#
+# Usage: python benchmark.py [--latency SECONDS] [--bandwidth RATE]
+#                            [--large-size BYTES] [--json] [BENCHMARK ...]
+
+from testserver import TestServer
+from ftpclient import Client, COMMAND_TABLE
+from reply import ReplyReader, parse_pasv_response, parse_epsv_response
+from throttle import parse_rate
+from progress import format_bytes
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SMALL_FILES = 200
+SMALL_FILE_SIZE = 1024
+LARGE_FILE_SIZE = 64 << 20
+LISTING_ENTRIES = 1000
+LISTING_REPEAT = 20
+PARSE_REPLIES = 50000
+
+
+class Benchmark:
+    '''Benchmark
+    One benchmark run: a TestServer serving a scratch directory and a
+    logged-in Client connected to it. Each bench_ method returns a dict of
+    results.'''
+
+    def __init__(self, latency=0.0, bandwidth=None, large_size=LARGE_FILE_SIZE):
+        self.large_size = large_size
+        self.workdir = tempfile.mkdtemp(prefix='ftpbench-')
+        self.root = os.path.join(self.workdir, 'server')
+        self.local = os.path.join(self.workdir, 'client')
+        os.makedirs(self.root)
+        os.makedirs(self.local)
+        self.server = TestServer(self.root, latency=latency, bandwidth=bandwidth)
+        self.client = None
+
+    def __enter__(self):
+        self.server.start()
+        self.client = self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.client.close()
+        self.server.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def connect(self):
+        '''connect() -> Client
+        Connect and log in a quiet client.'''
+
+        client = Client(self.server.host, self.server.port)
+        client.verbose = False
+        client.connect()
+        client.wait_ready()
+        client.login('bench', 'bench')
+        return client
+
+    def make_files(self, directory, count, size):
+        '''make_files(directory, count, size) -> list of names
+        Create count files of size random bytes in a server directory.'''
+
+        path = os.path.join(self.root, directory)
+        os.makedirs(path, exist_ok=True)
+        names = [f'file{i:05d}' for i in range(count)]
+        for name in names:
+            with open(os.path.join(path, name), 'wb') as f:
+                f.write(os.urandom(size))
+
+        return names
+
+    def bench_small(self):
+        '''bench_small() -> results
+        Retrieve many small files over one session, then request their sizes
+        one at a time and pipelined.'''
+
+        names = self.make_files('small', SMALL_FILES, SMALL_FILE_SIZE)
+        remote = [f'/small/{name}' for name in names]
+
+        start = time.perf_counter()
+        for path in remote:
+            self.client.download(path, os.path.join(self.local, 'small.tmp'))
+        get_rate = len(remote) / (time.perf_counter() - start)
+
+        results = {'files': len(remote), 'get_ops_per_sec': get_rate}
+        for pipelining in (False, True):
+            self.client.pipelining = pipelining
+            start = time.perf_counter()
+            self.client.sizes(remote)
+            key = 'pipelined_size_ops_per_sec' if pipelining else 'size_ops_per_sec'
+            results[key] = len(remote) / (time.perf_counter() - start)
+        self.client.pipelining = False
+
+        return results
+
+    def bench_large(self):
+        '''bench_large() -> results
+        Retrieve and store one large file and measure the throughput.'''
+
+        self.make_files('large', 1, self.large_size)
+        local_path = os.path.join(self.local, 'large.tmp')
+
+        start = time.perf_counter()
+        nbytes = self.client.download('/large/file00000', local_path)
+        get_rate = nbytes / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        nbytes = self.client.upload(local_path, '/large/upload')
+        put_rate = nbytes / (time.perf_counter() - start)
+
+        return {'bytes': nbytes, 'get_bytes_per_sec': get_rate,
+                'put_bytes_per_sec': put_rate}
+
+    def bench_memory(self):
+        '''bench_memory() -> results
+        Measure the peak Python memory allocated while a large file is
+        retrieved, and the high-water mark of the whole process.'''
+
+        self.make_files('large', 1, self.large_size)
+        local_path = os.path.join(self.local, 'memory.tmp')
+
+        tracemalloc.start()
+        try:
+            self.client.download('/large/file00000', local_path)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        results = {'bytes': self.large_size, 'peak_traced_bytes': peak}
+
+        # Test if the platform reports the process high-water mark.
+        if resource:
+            # ru_maxrss is in kilobytes on Linux.
+            results['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        return results
+
+    def bench_listing(self):
+        '''bench_listing() -> results
+        Measure the latency of listing a large directory with MLSD and with
+        LIST.'''
+
+        self.make_files('listing', LISTING_ENTRIES, 0)
+        results = {'entries': LISTING_ENTRIES}
+
+        for command, mlst in (('mlsd', True), ('list', False)):
+            self.server.mlst = mlst
+            # Request the features again so the client sees the change.
+            self.client.feature_set = None
+
+            times = []
+            for _ in range(LISTING_REPEAT):
+                start = time.perf_counter()
+                entries = self.client.listdir('/listing', refresh=True)
+                times.append(time.perf_counter() - start)
+            assert len(entries) == LISTING_ENTRIES
+
+            times.sort()
+            results[f'{command}_mean_ms'] = statistics.mean(times) * 1e3
+            results[f'{command}_p50_ms'] = times[len(times) // 2] * 1e3
+            results[f'{command}_p95_ms'] = times[int(len(times) * 0.95) - 1] * 1e3
+
+        self.server.mlst = True
+        return results
+
+
+def ops_per_sec(count, func, *args):
+    '''ops_per_sec(count, func, *args) -> calls per second
+    Call func(*args) count times and return the rate.'''
+
+    start = time.perf_counter()
+    for _ in range(count):
+        func(*args)
+
+    return count / (time.perf_counter() - start)
+
+
+def bench_parsing():
+    '''bench_parsing() -> results
+    Measure how fast pipelined replies are split and parsed, how fast PASV
+    and EPSV addresses are parsed and how fast user commands are looked up.'''
+
+    # One segment of pipelined replies, a quarter of them multi-line.
+    single = b'213 1024\r\n'
+    multi = b'211-Features:\r\n MDTM\r\n SIZE\r\n MLST type*;size*;\r\n211 End\r\n'
+    data = (single * 3 + multi) * (PARSE_REPLIES // 4)
+
+    reader = ReplyReader()
+    start = time.perf_counter()
+    reader.feed(data)
+    count = 0
+    while reader.has_reply():
+        reader.next_reply()
+        count += 1
+    replies_rate = count / (time.perf_counter() - start)
+
+    pasv = 'Entering Passive Mode (127,0,0,1,195,80).'
+    epsv = 'Entering Extended Passive Mode (|||50000|)'
+    commands = list(COMMAND_TABLE) + ['bogus']
+
+    return {
+        'replies': count,
+        'replies_per_sec': replies_rate,
+        'pasv_per_sec': ops_per_sec(PARSE_REPLIES, parse_pasv_response, pasv),
+        'epsv_per_sec': ops_per_sec(PARSE_REPLIES, parse_epsv_response, epsv),
+        'dispatch_per_sec': ops_per_sec(
+            PARSE_REPLIES, lambda: [COMMAND_TABLE.get(c) for c in commands]) * len(commands),
+    }
+
+
+# Benchmarks that need no server.
+MICROBENCHMARKS = {'parsing': bench_parsing}
+
+BENCHMARKS = ['small', 'large', 'memory', 'listing', 'parsing']
+
+
+def run(names=BENCHMARKS, latency=0.0, bandwidth=None, large_size=LARGE_FILE_SIZE):
+    '''run(names=BENCHMARKS, latency=0.0, bandwidth=None, large_size=LARGE_FILE_SIZE) -> dict of results
+    Run the named benchmarks, each against a fresh server and client.'''
+
+    results = {}
+    for name in names:
+        # Test if benchmark needs no server.
+        if name in MICROBENCHMARKS:
+            results[name] = MICROBENCHMARKS[name]()
+            continue
+
+        with Benchmark(latency, bandwidth, large_size) as bench:
+            results[name] = getattr(bench, f'bench_{name}')()
+
+    return results
+
+
+def format_result(key, value):
+    '''format_result(key, value) -> text
+    Format one result for display based on its unit.'''
+
+    if key.endswith('bytes_per_sec'):
+        return f'{format_bytes(value)}/s'
+    if key.endswith('bytes'):
+        return format_bytes(value)
+    if isinstance(value, float):
+        return f'{value:.2f}'
+
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the FTP client.')
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help=f'benchmarks to run: {", ".join(BENCHMARKS)}')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every server reply')
+    parser.add_argument('--bandwidth', type=parse_rate, default=None,
+                        help='server link rate, such as 10M')
+    parser.add_argument('--large-size', type=int, default=LARGE_FILE_SIZE,
+                        help='size of the large file in bytes')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = parser.parse_args()
+
+    # Test if an unknown benchmark was named.
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark: {name}')
+
+    results = run(args.benchmarks or BENCHMARKS, args.latency, args.bandwidth,
+                  args.large_size)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for name, values in results.items():
+        print(name)
+        for key, value in values.items():
+            print(f'    {key:<28} {format_result(key, value)}')
+
+
+if __name__ == '__main__':
+    main()
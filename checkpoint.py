@@ -0,0 +1,157 @@
+# CS472 - Homework #4
+# Edward Parrish
+# checkpoint.py
+#
+# This module is the checkpoint module of the FTP client. It contains the
+# CheckpointJournal class which records how far each transfer has durably
+# progressed so that it can be resumed after a dropped connection.
+
+import json
+import os
+import threading
+
+DEFAULT_JOURNAL = '.ftpclient.journal'
+CHECKPOINT_INTERVAL = 8 << 20
+
+DOWNLOAD = 'get'
+UPLOAD = 'put'
+
+
+class Checkpoint:
+    '''Checkpoint
+    The durable state of one transfer.'''
+
+    __slots__ = ('direction', 'remote_path', 'local_path', 'offset', 'size',
+                 'mtime')
+
+    def __init__(self, direction, remote_path, local_path, offset=0,
+                 size=None, mtime=None):
+        self.direction = direction
+        self.remote_path = remote_path
+        self.local_path = local_path
+        self.offset = offset
+        self.size = size
+        self.mtime = mtime
+
+    def key(self):
+        return checkpoint_key(self.direction, self.remote_path, self.local_path)
+
+    def matches(self, size, mtime):
+        '''matches(size, mtime) -> bool
+        Test if the source file still has the size and modification time it
+        had when the checkpoint was recorded. Unknown values always match.'''
+
+        if size is not None and self.size is not None and size != self.size:
+            return False
+        if mtime is not None and self.mtime is not None and mtime != self.mtime:
+            return False
+        return True
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def checkpoint_key(direction, remote_path, local_path):
+    return f'{direction}|{remote_path}|{os.path.abspath(local_path)}'
+
+
+class CheckpointJournal:
+    '''CheckpointJournal
+    A small on-disk journal of in-progress transfers. Every update rewrites
+    the journal to a temporary file and renames it over the old one, so the
+    journal on disk is always complete.'''
+
+    def __init__(self, path=DEFAULT_JOURNAL):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    def load(self):
+        '''load() -> dict of key to Checkpoint
+        Read the journal from disk. A missing or damaged journal is empty.'''
+
+        try:
+            with open(self.path, mode='r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        entries = {}
+        for item in data:
+            try:
+                checkpoint = Checkpoint(**item)
+            except TypeError:
+                continue
+            entries[checkpoint.key()] = checkpoint
+
+        return entries
+
+    def save(self):
+        '''save()
+        Write the journal to disk atomically.'''
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, mode='w') as f:
+            json.dump([c.to_dict() for c in self.entries.values()], f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def get(self, direction, remote_path, local_path):
+        '''get(direction, remote_path, local_path) -> Checkpoint
+        Return the checkpoint of a transfer, or None if there is none.'''
+
+        with self.lock:
+            return self.entries.get(
+                checkpoint_key(direction, remote_path, local_path))
+
+    def record(self, checkpoint):
+        '''record(checkpoint)
+        Record or update the checkpoint of a transfer.'''
+
+        with self.lock:
+            self.entries[checkpoint.key()] = checkpoint
+            self.save()
+
+    def remove(self, checkpoint):
+        '''remove(checkpoint)
+        Forget a transfer that has completed.'''
+
+        with self.lock:
+            # Test if checkpoint is recorded.
+            if self.entries.pop(checkpoint.key(), None) is not None:
+                self.save()
+
+
+class CheckpointWriter:
+    '''CheckpointWriter
+    A binary file wrapper for downloads. Every interval bytes the file is
+    flushed and synced to disk and only then is the new offset recorded in
+    the journal, so a recorded offset never runs ahead of durable data.'''
+
+    def __init__(self, f, journal, checkpoint, interval=CHECKPOINT_INTERVAL):
+        self.f = f
+        self.journal = journal
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.pending = 0
+
+    def write(self, data):
+        n = self.f.write(data)
+        self.pending += n
+
+        # Test if enough data has arrived for a new checkpoint.
+        if self.pending >= self.interval:
+            self.sync()
+
+        return n
+
+    def sync(self):
+        '''sync()
+        Make the written data durable and record the new offset.'''
+
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.checkpoint.offset += self.pending
+        self.pending = 0
+        self.journal.record(self.checkpoint)
@@ -0,0 +1,221 @@
+# CS472 - Homework #4
+# Edward Parrish
+# compress.py
+#
+# This module is the compression module of the FTP client. It contains the
+# Deflater and Inflater classes which compress and decompress the data of
+# MODE Z transfers on a background thread, so the thread that drives the data
+# connection only ever sends and receives.
+
+from exceptions import TransferError
+import queue
+import threading
+import zlib
+
+MODE_STREAM = 'S'
+MODE_ZLIB = 'Z'
+
+DEFAULT_LEVEL = 6
+MIN_LEVEL = 1
+MAX_LEVEL = 9
+QUEUE_DEPTH = 8
+POLL_INTERVAL = 0.1
+
+
+class Deflater:
+    '''Deflater
+    Read, translate and compress an open binary file into one zlib stream on
+    a background thread. Iterating over the Deflater yields (nbytes, block)
+    pairs, where block is the next compressed block to send and nbytes is the
+    number of file bytes it completes, so progress follows the file rather
+    than the wire. At most QUEUE_DEPTH blocks wait to be sent.'''
+
+    def __init__(self, f, level=DEFAULT_LEVEL, bufsize=65536, translator=None,
+                 depth=QUEUE_DEPTH):
+        self.f = f
+        self.level = level
+        self.bufsize = bufsize
+        self.translator = translator
+        self.queue = queue.Queue(depth)
+        self.error = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        compressor = zlib.compressobj(self.level)
+        nbytes = 0
+        try:
+            while not self.stopped.is_set():
+                chunk = self.f.read(self.bufsize)
+
+                # Test if end of file.
+                if not chunk:
+                    break
+
+                nbytes += len(chunk)
+                if self.translator:
+                    chunk = self.translator.translate(chunk)
+
+                # Small chunks may stay in the compressor until more arrive.
+                block = compressor.compress(chunk)
+                if block:
+                    self.put((nbytes, block))
+                    nbytes = 0
+
+            # End the stream with whatever the translator held back.
+            tail = compressor.compress(self.translator.flush()) if self.translator else b''
+            self.put((nbytes, tail + compressor.flush()))
+        except (OSError, zlib.error) as err:
+            self.error = err
+        finally:
+            self.put(None)
+
+    def put(self, item):
+        # Give up once the sender has stopped taking blocks.
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+
+            # Test if the stream is complete.
+            if item is None:
+                break
+
+            yield item
+
+        if self.error:
+            raise TransferError(None, f'Compression failed: {self.error}')
+
+    def close(self):
+        '''close()
+        Stop the background thread, even if the stream was not sent in full.'''
+
+        self.stopped.set()
+        while self.thread.is_alive():
+            try:
+                self.queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        self.thread.join()
+
+
+class Inflater:
+    '''Inflater
+    A binary file wrapper that decompresses a zlib stream written to it in
+    chunks. Each chunk is copied into a queue and decompressed into f on a
+    background thread, and the size of every decompressed block is added to
+    progress, if given. At most QUEUE_DEPTH chunks wait to be decompressed.'''
+
+    def __init__(self, f, progress=None, depth=QUEUE_DEPTH):
+        self.f = f
+        self.progress = progress
+        self.queue = queue.Queue(depth)
+        self.decompressor = zlib.decompressobj()
+        self.total = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        # Test if decompression has already failed.
+        if self.error:
+            raise TransferError(None, f'Decompression failed: {self.error}')
+
+        self.queue.put(bytes(data))
+        return len(data)
+
+    def run(self):
+        while True:
+            chunk = self.queue.get()
+
+            # Test if the stream is complete.
+            if chunk is None:
+                break
+
+            # Keep draining the queue after an error so the writer never blocks.
+            if not self.error:
+                try:
+                    self.emit(self.decompressor.decompress(chunk))
+                except (OSError, zlib.error) as err:
+                    self.error = err
+
+    def emit(self, data):
+        if data:
+            self.f.write(data)
+            self.total += len(data)
+            if self.progress:
+                self.progress.update(len(data))
+
+    def close(self):
+        '''close()
+        Stop the background thread once every queued chunk is decompressed.'''
+
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def finish(self):
+        '''finish() -> number of bytes decompressed
+        Close the Inflater and write out the rest of the stream. Raise
+        TransferError if the stream is corrupt or ends early.'''
+
+        self.close()
+        if not self.error:
+            try:
+                self.emit(self.decompressor.flush())
+            except (OSError, zlib.error) as err:
+                self.error = err
+
+        if self.error:
+            raise TransferError(None, f'Decompression failed: {self.error}')
+
+        # Test if the stream was cut off before its end.
+        if not self.decompressor.eof:
+            raise TransferError(None, 'Compressed stream ended early.')
+
+        return self.total
+
+
+def parse_level(value):
+    '''parse_level(value) -> compression level
+    Parse a compression level: "on" is DEFAULT_LEVEL, "off" is None and a
+    number must be between MIN_LEVEL and MAX_LEVEL. Raise ValueError if the
+    level is malformed.'''
+
+    value = value.strip().lower()
+
+    if value == 'on':
+        return DEFAULT_LEVEL
+    if value == 'off':
+        return None
+
+    level = int(value)
+    if not MIN_LEVEL <= level <= MAX_LEVEL:
+        raise ValueError(f'Compression level out of range: {level}')
+
+    return level
+
+
+def inflate(data):
+    '''inflate(data) -> bytes
+    Decompress a complete zlib stream, such as a compressed directory
+    listing. Raise TransferError if the stream is corrupt or incomplete.'''
+
+    decompressor = zlib.decompressobj()
+    try:
+        out = decompressor.decompress(data) + decompressor.flush()
+    except zlib.error as err:
+        raise TransferError(None, f'Decompression failed: {err}')
+
+    # Test if the stream was cut off before its end.
+    if not decompressor.eof:
+        raise TransferError(None, 'Compressed stream ended early.')
+
+    return out
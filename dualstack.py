@@ -0,0 +1,121 @@
+# CS472 - Homework #4
+# Edward Parrish
+# dualstack.py
+#
+# This module is the dual-stack module of the FTP client. It contains
+# connect_race which connects to the first reachable of several IPv6 and IPv4
+# addresses by racing staggered attempts (Happy Eyeballs, RFC 8305), so an
+# unreachable address family costs a fraction of a second instead of a full
+# connect timeout.
+
+from itertools import zip_longest
+import errno
+import os
+import selectors
+import socket
+import time
+
+CONNECTION_ATTEMPT_DELAY = 0.25
+
+IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN)
+
+
+def interleave(candidates):
+    '''interleave(candidates) -> list of (family, address)
+    Order candidates so address families alternate, starting with the
+    family of the first candidate, which getaddrinfo ranks as preferred.'''
+
+    # Test if there is nothing to reorder.
+    if not candidates:
+        return []
+
+    first = candidates[0][0]
+    preferred = [c for c in candidates if c[0] == first]
+    others = [c for c in candidates if c[0] != first]
+
+    return [c for pair in zip_longest(preferred, others) for c in pair if c]
+
+
+def connect_race(candidates, delay=CONNECTION_ATTEMPT_DELAY, timeout=None,
+                 prepare=None):
+    '''connect_race(candidates, delay=CONNECTION_ATTEMPT_DELAY, timeout=None, prepare=None) -> socket
+    Connect to the first reachable (family, address) candidate. Attempts
+    start delay seconds apart in interleaved family order, or at once when
+    the attempts in flight have failed, and the first to connect wins; the
+    others are closed. If prepare is given, then it is called with each
+    socket before it connects, to set options such as buffer sizes. Raise
+    socket.timeout if nothing connects within timeout seconds, or the last
+    error if every candidate fails.'''
+
+    candidates = interleave(candidates)
+    selector = selectors.DefaultSelector()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    next_start = 0.0
+    error = OSError('No address to connect to.')
+    winner = None
+
+    try:
+        while winner is None:
+            now = time.monotonic()
+
+            # Test if the next attempt is due, or nothing is in flight.
+            if candidates and (now >= next_start or not selector.get_map()):
+                family, address = candidates.pop(0)
+                try:
+                    sock = socket.socket(family, socket.SOCK_STREAM)
+                except OSError as err:
+                    # The address family is not supported on this host.
+                    error = err
+                    continue
+                if prepare:
+                    try:
+                        prepare(sock)
+                    except BaseException:
+                        sock.close()
+                        raise
+                sock.setblocking(False)
+                err = sock.connect_ex(address)
+
+                if err == 0:
+                    winner = sock
+                elif err in IN_PROGRESS:
+                    selector.register(sock, selectors.EVENT_WRITE)
+                    next_start = now + delay
+                else:
+                    sock.close()
+                    error = OSError(err, os.strerror(err))
+                continue
+
+            # Test if every candidate has failed.
+            if not selector.get_map():
+                raise error
+
+            wait = next_start - now if candidates else None
+            if deadline is not None:
+                # Test if time is up.
+                if now >= deadline:
+                    raise socket.timeout('Connection timed out.')
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+
+            for key, _ in selector.select(wait):
+                sock = key.fileobj
+                selector.unregister(sock)
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+
+                # Test if attempt connected.
+                if err == 0:
+                    winner = sock
+                    break
+
+                sock.close()
+                error = OSError(err, os.strerror(err))
+
+                # A failed attempt starts the next one at once.
+                next_start = now
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+    winner.setblocking(True)
+    return winner
@@ -16,3 +16,33 @@ class ServerReplyError(Error):
 
     def __str__(self):
         return f'{repr(self.response)} -> {self.message}'
+
+
+class TransferError(Error):
+    '''Exception raised when a data transfer does not complete.
+
+    Attributes:
+        response -- server response or path of the failed transfer
+        message -- explanation of the error
+    '''
+
+    def __init__(self, response, message):
+        self.response = response
+        self.message = message
+
+    def __str__(self):
+        return f'{repr(self.response)} -> {self.message}'
+
+
+class ConnectionClosedError(Error):
+    '''Exception raised when the server closes the control connection.
+
+    Attributes:
+        message -- explanation of the error
+    '''
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
@@ -8,11 +8,40 @@
 
 from util import System
 from logger import Logger
-from exceptions import ServerReplyError
+from reply import ReplyReader, ServerResponse, decode
+from reply import parse_server_response, parse_size, parse_mdtm
+from reply import parse_pasv_response, parse_epsv_response, is_transfer_started
+from reply import convert_port_to_p1p2, convert_p1p2_to_port
+from exceptions import ServerReplyError, TransferError, ConnectionClosedError
+from parallel import ParallelTransfer, DEFAULT_WORKERS, summarize
+from segmented import SegmentedDownload
+from checkpoint import Checkpoint, CheckpointJournal, CheckpointWriter
+from checkpoint import DEFAULT_JOURNAL, DOWNLOAD, UPLOAD
+from pool import ClientPool
+from translate import AsciiDecoder, AsciiEncoder, TranslatingWriter
+from listing import ListingCache, parse_listing, parse_list_line, parse_mlsd_line
+from mirror import Mirror
+from metrics import default_metrics, record_retry, GET, PUT
+from progress import Progress, ProgressBar, format_bytes
+from throttle import TokenBucket, parse_rate, global_limit, transfer_limiter
+from listener import default_listeners
+from resolver import default_resolver
+from dualstack import connect_race
+from tuning import default_profile, parse_profile, PROFILES
+from transfer import TransferState
+from compress import Deflater, Inflater, inflate, parse_level, MODE_STREAM, MODE_ZLIB
+from verify import StreamHash, HashingWriter, HashingReader, parse_algorithm
+from verify import parse_hash_feature, parse_hash_reply, parse_x_hash_reply
+from verify import ALGORITHMS, AUTO, CRC32, X_COMMANDS
+from collections import deque
+import os
+import posixpath
 import socket
 import threading
+import time
 
 global logger
+logger = None
 DEFAULT_ENCODING = 'ISO-8859-1'
 
 IPv4 = 1
@@ -20,13 +49,28 @@ IPv6 = 2
 NET_PRTS = [IPv4, IPv6]
 
 FILE_STATUS_OK = 150
+COMMAND_OK = 200
+SYSTEM_STATUS = 211
+FILE_STATUS = 213
 SERVICE_READY = 220
 FILE_ACTION_SUCCESSFUL = 226
 USER_LOGGED_IN = 230
+FILE_ACTION_OK = 250
+PATH_CREATED = 257
 PASSWORD_NEEDED = 331
+FILE_ACTION_PENDING = 350
 TIMEOUT = 421
 COMMAND_NOT_IMPLEMENTED = 502
 
+# The most pipelined commands in flight. A batch takes about one round trip
+# per window, so a 1000-file sweep takes one. The commands and replies of a
+# full window stay well inside the socket buffers, so neither side blocks.
+PIPELINE_WINDOW = 1024
+SENDFILE_SLICE = 8 << 20
+
+TYPE_ASCII = 'A'
+TYPE_BINARY = 'I'
+
 
 def main(client, host, port):
     '''main(client)
@@ -35,10 +79,7 @@ def main(client, host, port):
     # Test if client is not logged in.
     if not client.logged_in:
         # Get server response: 220 Ready for new user.
-        while True:
-            response = client.get_response()
-            if response.code == SERVICE_READY:
-                break
+        client.wait_ready()
 
         # Perform login with USER and PASS commands.
         client.login()
@@ -83,6 +124,18 @@ def log(message):
         logger.write(message)
 
 
+def log_payload(data):
+    '''log_payload(data)
+    Write the content of a data transfer to the log if the logger includes
+    payloads; otherwise only its size is logged.'''
+
+    if logger:
+        if logger.include_payload:
+            logger.write(data)
+        else:
+            logger.write(f'Received {len(data)} characters of data.')
+
+
 def encode(data, encoding='utf-8'):
     try:
         return data.encode(encoding)
@@ -90,42 +143,82 @@ def encode(data, encoding='utf-8'):
         return data.encode(DEFAULT_ENCODING)
 
 
-def decode(data, encoding='utf-8'):
-    try:
-        return data.decode(encoding)
-    except UnicodeDecodeError:
-        return data.decode(DEFAULT_ENCODING)
-
-
-class ServerResponse:
-
-    def __init__(self, code, message):
-        self.code = code
-        self.message = message
-
-    def __str__(self):
-        return f'{self.code} {self.message}'
-
-
 class Client:
 
     def __init__(self, host, port):
         self.conn = None
+        self.reader = ReplyReader()
         self.host = host
         self.port = port
         self.logged_in = False
+        self.timed_out = False
+        self.pool = None
         self.verbose = True
+        self.pipelining = False
+        self.workers = DEFAULT_WORKERS
+        self.segments = 1
+        self.journal = None
+        self.transfer_type = TYPE_BINARY
+        self.current_type = None
+        self.compression = None
+        self.current_mode = None
+        self.current_level = None
+        self.mode_z_refused = False
+        self.verify = None
+        self.current_hash = None
+        self.remote_dir = None
+        self.feature_set = None
+        self.feature_args = {}
+        self.listing_cache = ListingCache()
+        self.metrics = default_metrics
+        self.progress = None
+        self.transfer_limit = None
+        self.session_limit = TokenBucket()
+        self.listeners = default_listeners
+        self.resolver = default_resolver
+        self.family = socket.AF_UNSPEC
+        self.profile = default_profile
+        self.sent = deque()
+        self.username = None
+        self.password = None
         self.use_pasv = True
         self.use_epsv = False
         self.use_port = False
         self.use_eprt = False
 
     def connect(self):
-        hostaddr = socket.gethostbyname(self.host)
-        hostname = socket.gethostbyaddr(hostaddr)[0]
-        log(f'Connecting to {hostname} ({hostaddr}). ')
-        self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.conn.connect((self.host, self.port))
+        '''connect()
+        Connect to the first reachable address of the server. Addresses of
+        the client's address family, IPv6 and IPv4 unless it is limited to
+        one, come from its resolver and are raced with connect_race, so an
+        unreachable family does not hold up the connection. The connection
+        is tuned by the client's socket profile. The name of the server is
+        looked up for the log in the background rather than before
+        connecting. Raise OSError if no address can be reached.'''
+
+        candidates = self.resolver.resolve(self.host, self.port, self.family)
+        self.conn = connect_race(candidates, timeout=self.profile.connect_timeout)
+        self.profile.tune_control(self.conn)
+        hostaddr = self.conn.getpeername()[0]
+        log(f'Connected to {self.host} ({hostaddr}).')
+        self.resolver.reverse(
+            hostaddr, lambda address, name: log(f'Server {address} is {name}.'))
+
+        self.reader = ReplyReader()
+        self.sent.clear()
+        self.current_type = None
+        self.current_mode = None
+        self.current_level = None
+        self.mode_z_refused = False
+        self.current_hash = None
+        self.remote_dir = None
+        self.feature_set = None
+
+    def server_label(self):
+        '''server_label() -> host:port
+        The server label under which measurements are recorded.'''
+
+        return f'{self.host}:{self.port}'
 
     def close(self):
         if self.conn:
@@ -142,28 +235,101 @@ class Client:
 
         msg = f'{command} {value}'
         self.conn.sendall(encode(f'{msg}\r\n'))
+        self.sent.append((command, time.monotonic()))
         log(f'Sent: {msg}')
 
+    def send_messages(self, commands):
+        '''send_messages(commands)
+        Send a batch of (command, value) pairs to the server in one write.'''
+
+        msgs = [f'{command} {value}' for command, value in commands]
+        self.conn.sendall(encode(''.join(f'{msg}\r\n' for msg in msgs)))
+        now = time.monotonic()
+        self.sent.extend((command, now) for command, _ in commands)
+        for msg in msgs:
+            log(f'Sent: {msg}')
+
+    def pipeline(self, commands, window=PIPELINE_WINDOW):
+        '''pipeline(commands, window=PIPELINE_WINDOW) -> list of ServerResponse
+        Send a batch of independent (command, value) pairs and return their
+        replies in the same order. In pipelined mode up to window commands are
+        in flight at once: the window slides, so each reply read makes room
+        for the next command and the link never idles between windows.
+        Otherwise each command waits for its reply. Only commands that do not
+        open a data connection may be pipelined.'''
+
+        # Test if pipelined mode is turned off.
+        if not self.pipelining:
+            window = 1
+
+        responses = []
+        sent = 0
+        while len(responses) < len(commands):
+            # Refill the window in one write.
+            batch = commands[sent:(len(responses) + window)]
+            if batch:
+                self.send_messages(batch)
+                sent += len(batch)
+
+            # Replies arrive in the order the commands were sent. Take the
+            # next one and any others already received before refilling.
+            responses.append(self.get_response())
+            while len(responses) < sent and self.reader.has_reply():
+                responses.append(self.get_response())
+
+        return responses
+
+    def sizes(self, paths):
+        '''sizes(paths) -> dict of path to file size
+        Request the size of many remote files with one pipelined batch of SIZE
+        commands. Files whose size is not reported map to None.'''
+
+        responses = self.pipeline([('SIZE', path) for path in paths])
+        return {path: parse_size(response)
+                for path, response in zip(paths, responses)}
+
+    def mdtms(self, paths):
+        '''mdtms(paths) -> dict of path to modification time
+        Request the modification time of many remote files with one pipelined
+        batch of MDTM commands. Times are seconds since the epoch; files whose
+        time is not reported map to None.'''
+
+        responses = self.pipeline([('MDTM', path) for path in paths])
+        return {path: parse_mdtm(response)
+                for path, response in zip(paths, responses)}
+
     def get_response(self, bufsize=4096):
         '''get_response(bufsize=4096) -> ServerResponse
-        Receive a response from the server. Parse the reply code and message.'''
+        Receive the next complete reply from the server. Replies are read
+        through a buffered reader, so multi-line replies are returned whole and
+        extra replies that arrived in the same segment are kept for the
+        following commands.'''
 
-        # byte_data = b''
-        # while True:
-        #     # Receive some data.
-        #     res = self.conn.recv(bufsize)
-        #     byte_data += res
+        while True:
+            # Receive until the reader holds a complete reply.
+            while not self.reader.has_reply():
+                byte_data = self.conn.recv(bufsize)
 
-        #     # Test if end of message.
-        #     if len(res) < bufsize:
-        #         break
+                # Test if server closed the control connection.
+                if not byte_data:
+                    raise ConnectionClosedError(
+                        'Connection closed by remote host.')
 
-        byte_data = self.conn.recv(bufsize)
-        # Test for bad server reply.
-        try:
-            response = self.parse_server_response(byte_data)
-        except ServerReplyError as err:
-            self.handle_bad_server_reply(err)
+                self.reader.feed(byte_data)
+
+            # Test for bad server reply.
+            try:
+                response = self.reader.next_reply()
+                break
+            except ServerReplyError as err:
+                self.handle_bad_server_reply(err)
+
+        # Test if reply is the first one to a timed command. Later replies,
+        # such as 226 after 150, have no command waiting.
+        if self.sent:
+            command, sent_at = self.sent.popleft()
+            self.metrics.command(
+                self.server_label(), command, time.monotonic() - sent_at)
 
         if self.verbose:
             System.display(response)
@@ -172,6 +338,7 @@ class Client:
 
         # Test if response indicates a timeout.
         if response.code == TIMEOUT:
+            self.timed_out = True
             System.display('Connection closed by remote host.')
 
         return response
@@ -180,54 +347,31 @@ class Client:
         '''parse_server_response(response) -> ServerResponse
         Parse the server reply code and message.'''
 
-        # Test if response is empty.
-        if not response:
-            return ''
-
-        # Test if response has not been decoded.
-        if isinstance(response, bytes):
-            res = decode(response).strip()
-        else:
-            res = response.strip()
-
-        # Test if response doesn't start with 3-digit reply code.
-        res_len = len(res)
-        num_digits = 3
-        if res_len < num_digits:
-            raise ServerReplyError(
-                res, 'Server response does not start with a 3-digit reply code')
-
-        # Parse reply code and message.
-        code_str = res[:num_digits]
-        # Test if response has a message.
-        if res_len > num_digits+1:
-            message = res[(num_digits+1):]
-        else:
-            message = ''
-
-        # Test if reply code is positive integer.
-        try:
-            code = int(code_str)
-            if code < 0:
-                raise ServerReplyError(
-                    res, 'Server reply code is not a positive integer.')
-        except ValueError:
-            raise ServerReplyError(
-                res, 'Server response does not start with a 3-digit reply code.')
-
-        return ServerResponse(code, message)
+        return parse_server_response(response)
 
     def handle_bad_server_reply(self, error):
         System.display(f'Error: {repr(error)}')
         System.display('The server sent a bad reply. It will be ignored.')
 
-    def login(self):
-        '''login()
-        Prompt the user for username and password. Attempt to perform user login
-        by sending the USER and PASS commands to the server.'''
+    def wait_ready(self):
+        '''wait_ready()
+        Wait for the server to send the 220 Ready for new user reply.'''
+
+        while True:
+            response = self.get_response()
+            if response.code == SERVICE_READY:
+                break
+
+    def login(self, username=None, password=None):
+        '''login(username=None, password=None) -> ServerResponse
+        Attempt to perform user login by sending the USER and PASS commands to
+        the server. Prompt the user for the username and password if they are
+        not given. The credentials are kept so that more sessions can be
+        opened to the same server.'''
 
-        # Prompt user for username.
-        username = System.get_username(host, port)
+        # Test if username must be prompted for.
+        if username is None:
+            username = System.get_username(self.host, self.port)
 
         # Send USER command with username and get server response.
         self.send_message('USER', username)
@@ -236,7 +380,8 @@ class Client:
         # Test if server reply code indicates password needed.
         if response.code == PASSWORD_NEEDED:
             # Prompt user for password.
-            password = System.get_password()
+            if password is None:
+                password = System.get_password()
             if password:
                 # Send password and get server response.
                 self.send_message('PASS', password)
@@ -246,47 +391,135 @@ class Client:
                 log('A password is required for account.')
                 System.terminate()
 
+        self.username = username
+        self.password = password
         self.logged_in = True
+        return response
+
+    def session(self, working_dir=None):
+        '''session(working_dir=None) -> Client
+        Open another logged-in session to the same server with the same
+        credentials and data connection type, in working_dir or else this
+        client's working directory. Finding this client's working directory
+        may send PWD over its control connection, so worker threads must be
+        given working_dir; see session_factory. If the client has a session
+        pool, then a warm session is checked out of it. Raise ServerReplyError
+        if the login is refused.'''
+
+        # Test if sessions are drawn from a pool.
+        if self.pool:
+            client = self.pool.checkout(
+                self.host, self.port, self.username, self.password, origin=self)
+        else:
+            client = self.new_session()
+
+        client.use_pasv = self.use_pasv
+        client.use_epsv = self.use_epsv
+        client.use_port = self.use_port
+        client.use_eprt = self.use_eprt
+        client.transfer_type = self.transfer_type
+        client.compression = self.compression
+        client.verify = self.verify
+        client.transfer_limit = self.transfer_limit
+        client.set_socket_profile(self.profile)
+        client.session_limit.set_rate(self.session_limit.rate)
+        client.listing_cache = self.listing_cache
+
+        # Test if session must follow this client's working directory.
+        if working_dir is None:
+            working_dir = self.working_dir()
+        if client.working_dir() != working_dir:
+            client.change_dir(working_dir)
+
+        return client
+
+    def new_session(self):
+        '''new_session() -> Client
+        Connect and log in a new session to the same server with the same
+        credentials.'''
+
+        return self.open_session(
+            self.host, self.port, self.username, self.password, self)
+
+    @classmethod
+    def open_session(cls, host, port, username, password, origin=None):
+        '''open_session(host, port, username, password, origin=None) -> Client
+        Connect and log in a new, quiet session. It resolves, connects and
+        tunes its sockets like origin, if given. This is the one login
+        sequence shared by new_session and the session pool. Raise
+        ServerReplyError if the login is refused.'''
+
+        client = cls(host, port)
+        client.verbose = False
+
+        # Test if the session follows another client's settings.
+        if origin:
+            client.resolver = origin.resolver
+            client.family = origin.family
+            client.profile = origin.profile
+
+        client.connect()
+        try:
+            client.wait_ready()
+            response = client.login(username, password)
+        except BaseException:
+            client.close()
+            raise
+
+        # Test if login was refused.
+        if response.code != USER_LOGGED_IN:
+            client.close()
+            raise ServerReplyError(response, 'Login was refused.')
+
+        return client
+
+    def session_factory(self):
+        '''session_factory() -> function
+        Return a function that opens sessions for worker threads. The working
+        directory is resolved now, on the calling thread, so the workers never
+        use this client's control connection.'''
+
+        working_dir = self.working_dir()
+        return lambda: self.session(working_dir)
+
+    def release_session(self, client):
+        '''release_session(client)
+        Return a session opened by session() to the pool, or close it if the
+        client has no pool.'''
+
+        if self.pool:
+            self.pool.checkin(client)
+        else:
+            client.close()
+
+    def noop(self):
+        '''noop() -> bool
+        Send the NOOP command to keep the session alive. Return False if the
+        server has timed out or closed the session.'''
+
+        try:
+            self.send_message('NOOP')
+            response = self.get_response()
+        except (ConnectionClosedError, OSError):
+            return False
+
+        return response.code != TIMEOUT
 
     def execute(self, command, value=''):
 
-        # Test if command is not in list of user commands.
-        cmd = command.lower()
-        if cmd not in USER_COMMANDS:
+        # Test if command is not in the table of user commands.
+        entry = COMMAND_TABLE.get(command.lower())
+        if entry is None:
             System.display('Invalid command')
+            return
+
+        handler, conn_required = entry
 
         # Test if command requires a connection but client is not connected.
-        elif cmd in CONN_REQUIRED_COMMANDS and not self.conn:
+        if conn_required and not self.conn:
             System.display('Not connected.')
-
-        # Test if command is to set the data connection type.
-        elif cmd in DATA_CONN_COMMANDS:
-            self.toggle_data_conn_type(cmd)
-
-        # Test if command requires a data connection.
-        elif cmd in COMMANDS_THAT_USE_DATA_CONN:
-            if cmd == LIST:
-                self.ls(value)
-            elif cmd == RETR:
-                self.retr(value)
-            elif cmd == STOR:
-                self.stor(value)
-
         else:
-            if cmd == CWD:
-                self.cwd(value)
-            elif cmd == PWD:
-                self.pwd()
-            elif cmd == SYST:
-                self.syst()
-            elif cmd == HELP:
-                self.help()
-            elif cmd == REMOTE_HELP:
-                self.remotehelp()
-            elif cmd == QUIT:
-                self.quit()
-            elif cmd == VERBOSE:
-                self.toggle_verbose()
+            handler(self, value)
 
     def cwd(self, path=''):
         # Test if no path given.
@@ -300,8 +533,22 @@ class Client:
         if not path:
             System.display('Usage: cd remote-directory')
         else:
-            self.send_message('CWD', path)
-            self.get_response()
+            self.change_dir(path)
+
+    def change_dir(self, path):
+        '''change_dir(path) -> bool
+        Send the CWD command and return whether the working directory
+        changed.'''
+
+        self.send_message('CWD', path)
+        response = self.get_response()
+
+        # Test if working directory changed.
+        if response.code == FILE_ACTION_OK:
+            self.remote_dir = path if path.startswith('/') else None
+            return True
+
+        return False
 
     def pwd(self):
 
@@ -312,6 +559,148 @@ class Client:
         if not self.verbose:
             System.display(response)
 
+    def working_dir(self):
+        '''working_dir() -> remote path
+        Return the remote working directory. It is requested with PWD once and
+        remembered until the directory changes.'''
+
+        # Test if working directory is not known.
+        if self.remote_dir is None:
+            self.send_message('PWD')
+            response = self.get_response()
+
+            i1 = response.message.find('"')
+            i2 = response.message.rfind('"')
+            if response.code == PATH_CREATED and i2 > i1:
+                self.remote_dir = response.message[(i1+1):i2].replace('""', '"')
+            else:
+                return '/'
+
+        return self.remote_dir
+
+    def resolve(self, path=''):
+        '''resolve(path='') -> remote path
+        Return the absolute remote path of path.'''
+
+        return posixpath.normpath(posixpath.join(self.working_dir(), path))
+
+    def features(self):
+        '''features() -> set of feature names
+        Return the features the server reports with FEAT, such as MLST or
+        MDTM. The reply is requested once per session. The arguments of each
+        feature, such as the algorithms of HASH, are kept in feature_args.'''
+
+        # Test if features have not been requested yet.
+        if self.feature_set is None:
+            self.send_message('FEAT')
+            response = self.get_response()
+
+            self.feature_set = set()
+            self.feature_args = {}
+            if response.code == SYSTEM_STATUS:
+                for line in response.lines[1:-1]:
+                    words = line.split(None, 1)
+                    if words:
+                        name = words[0].upper()
+                        self.feature_set.add(name)
+                        self.feature_args[name] = words[1] if len(words) > 1 else ''
+
+        return self.feature_set
+
+    def retrieve_lines(self, command, path=''):
+        '''retrieve_lines(command, path='') -> list of lines
+        Run a text transfer command such as LIST or MLSD and return the lines
+        it sends over the data connection. Raise TransferError if the transfer
+        fails.'''
+
+        # Open a data connection using the currently enabled connection type.
+        data_conn = self.open_data_conn()
+        if not data_conn:
+            raise TransferError(command, 'Unable to open data connection.')
+
+        try:
+            self.send_message(command, path)
+            response = self.get_response()
+
+            # Test if server did not start the transfer.
+            if not is_transfer_started(response):
+                raise TransferError(response, 'Transfer was not started.')
+
+            data = data_conn.receive_text()
+            self.finish_transfer(data_conn)
+        finally:
+            data_conn.close()
+
+        return data.splitlines()
+
+    def listdir(self, path='', refresh=False):
+        '''listdir(path='', refresh=False) -> list of Entry
+        Return the parsed entries of a remote directory. MLSD is used when the
+        server offers it, otherwise LIST output is parsed. Listings are cached
+        per directory until they expire or refresh is set.'''
+
+        key = self.resolve(path)
+
+        # Test if a cached listing can be used.
+        if not refresh:
+            entries = self.listing_cache.get(key)
+            if entries is not None:
+                return entries
+
+        # Test if server supports machine readable listings.
+        if 'MLST' in self.features():
+            lines = self.retrieve_lines('MLSD', key)
+            entries = parse_listing(lines, parse_mlsd_line)
+        else:
+            lines = self.retrieve_lines('LIST', key)
+            entries = parse_listing(lines, parse_list_line)
+
+        self.listing_cache.put(key, entries)
+        return entries
+
+    def invalidate_listing(self, remote_path):
+        '''invalidate_listing(remote_path)
+        Forget the cached listing of the directory that holds remote_path.'''
+
+        self.listing_cache.invalidate(self.resolve(posixpath.dirname(remote_path)))
+
+    def walk(self, top=''):
+        '''walk(top='') -> iterator of (dirpath, dirs, files)
+        Walk a remote directory tree top-down like os.walk. dirs and files are
+        lists of Entry; links are listed with the files.'''
+
+        dirpath = self.resolve(top)
+        entries = self.listdir(dirpath)
+        dirs = [e for e in entries if e.is_dir()]
+        files = [e for e in entries if not e.is_dir()]
+
+        yield dirpath, dirs, files
+
+        for d in dirs:
+            yield from self.walk(posixpath.join(dirpath, d.name))
+
+    def stat(self, path):
+        '''stat(path) -> Entry
+        Return the facts of one remote file with MLST, or None if the server
+        does not support MLST or the file does not exist.'''
+
+        # Test if server supports MLST.
+        if 'MLST' not in self.features():
+            return None
+
+        self.send_message('MLST', path)
+        response = self.get_response()
+
+        # Test if server did not report the file.
+        if response.code != FILE_ACTION_OK or len(response.lines) < 3:
+            return None
+
+        entry = parse_mlsd_line(response.lines[1].lstrip())
+        if entry:
+            entry.name = posixpath.basename(entry.name)
+
+        return entry
+
     def ls(self, path=''):
         # Open a data connection using the currently enabled connection type.
         data_conn = self.open_data_conn()
@@ -322,10 +711,10 @@ class Client:
         self.send_message('LIST', path)
         response = self.get_response()
 
-        if response.code == FILE_STATUS_OK or response.message.find(str(FILE_STATUS_OK)) != -1:
+        if is_transfer_started(response):
             # Retrieve directory listing from data connection.
             data_conn.receive_data()
-            response = self.get_response()  # 226 Dir send ok.
+            self.finish_transfer(data_conn)  # 226 Dir send ok.
 
         data_conn.close()
 
@@ -365,26 +754,75 @@ class Client:
         if not remote_path or not local_path:
             System.display('Usage: get remote-file local-file')
         else:
-            # Open a data connection using the currently enabled connection type.
-            data_conn = self.open_data_conn()
-            if not data_conn:
-                return
+            try:
+                # Test if ASCII mode is turned on.
+                if self.transfer_type == TYPE_ASCII:
+                    self.download(remote_path, local_path)
+                # Test if segmented mode is turned on.
+                elif self.segments > 1:
+                    self.download_segmented(remote_path, local_path)
+                # Test if transfers are resumable.
+                elif self.journal:
+                    self.download_resumable(remote_path, local_path)
+                else:
+                    self.download(remote_path, local_path)
+            except TransferError as err:
+                log(f'Error: {err}')
+                System.display(f'Error: {err}')
+
+    def download(self, remote_path, local_path):
+        '''download(remote_path, local_path) -> number of bytes written
+        Retrieve a remote file into a local file. In binary mode the remote
+        file size is requested first so that a truncated transfer can be
+        detected. Return None if the server did not start the transfer.'''
+
+        self.ensure_type()
+
+        # Test if the file size is meaningful for the transfer type.
+        if self.transfer_type == TYPE_BINARY:
+            size = self.size(remote_path)
+        else:
+            size = None
+
+        # Choose the hash before the transfer starts, since it may send FEAT.
+        hasher = self.start_hash()
+
+        # Open a data connection using the currently enabled connection type.
+        data_conn = self.open_data_conn()
+        if not data_conn:
+            return None
 
+        try:
             # Send the RETR command over command channel and get response.
+            started = time.monotonic()
             self.send_message('RETR', remote_path)
             response = self.get_response()
 
-            if response.code == FILE_STATUS_OK or response.message.find(str(FILE_STATUS_OK)) != -1:    
-                # Retrieve remote file data over data connection.
-                file_content = data_conn.receive_data()
-
-                if response.code == FILE_ACTION_SUCCESSFUL:
-                    # Write the local file.
-                    System.write_file(local_path, file_content)
-                    log(f'File "{local_path}" written.')
+            # Test if server did not start the transfer.
+            if not is_transfer_started(response):
+                return None
 
+            # Stream remote file data over data connection to local file.
+            progress = self.start_progress(remote_path, size)
+            try:
+                total = data_conn.receive_file(
+                    local_path, size, translator=self.translator(AsciiDecoder),
+                    progress=progress, hasher=hasher)
+            except TransferError:
+                # Read the final reply so the session stays in step.
+                self.finish_transfer(data_conn, partial=True)
+                raise
+            finally:
+                progress.finish()
+            self.finish_transfer(data_conn)  # 226 Transfer complete.
+            self.record_transfer(GET, total, started, data_conn)
+            log(f'File "{local_path}" written.')
+        finally:
             data_conn.close()
 
+        self.check_hash(remote_path, hasher)
+        return total
+
     def stor(self, path):
 
         # Test if local file is not given.
@@ -421,25 +859,582 @@ class Client:
         if not local_path or not remote_path:
             System.display('Usage: put local-file remote-file')
         else:
-            # Open a data connection using the currently enabled connection type.
-            data_conn = self.open_data_conn()
-            if not data_conn:
-                return
+            try:
+                # Test if transfers are resumable.
+                if self.journal and self.transfer_type == TYPE_BINARY:
+                    self.upload_resumable(local_path, remote_path)
+                else:
+                    self.upload(local_path, remote_path)
+            except TransferError as err:
+                log(f'Error: {err}')
+                System.display(f'Error: {err}')
+
+    def upload(self, local_path, remote_path):
+        '''upload(local_path, remote_path) -> number of bytes sent
+        Store a local file on the server. Return None if the server did not
+        start the transfer.'''
+
+        self.ensure_type()
+
+        # Choose the hash before the transfer starts, since it may send FEAT.
+        hasher = self.start_hash()
+
+        # Open a data connection using the currently enabled connection type.
+        data_conn = self.open_data_conn()
+        if not data_conn:
+            return None
 
+        try:
             # Send the STOR command over command channel and get response.
+            started = time.monotonic()
             self.send_message('STOR', remote_path)
             response = self.get_response()
 
-            if response.code == FILE_STATUS_OK or response.message.find(str(FILE_STATUS_OK)) != -1:
-                
-                # Send local file data over data connection.
-                data_conn.send_file(local_path)
+            # Test if server did not start the transfer.
+            if not is_transfer_started(response):
+                return None
+
+            # Send local file data over data connection.
+            progress = self.start_progress(local_path, os.path.getsize(local_path))
+            try:
+                total = data_conn.send_file(
+                    local_path, translator=self.translator(AsciiEncoder),
+                    progress=progress, hasher=hasher)
+            finally:
+                progress.finish()
+            self.finish_transfer(data_conn)  # 226 Transfer complete.
+            self.record_transfer(PUT, total, started, data_conn)
+            self.invalidate_listing(remote_path)
+            log(f'File "{remote_path}" sent.')
+        finally:
+            data_conn.close()
+
+        self.check_hash(remote_path, hasher)
+        return total
+
+    def mget(self, paths=''):
+        '''mget(paths='')
+        Retrieve several remote files into the current local directory over a
+        pool of parallel sessions.'''
+
+        remote_paths = paths.split()
+
+        # Test if user did not enter any remote files.
+        if not remote_paths:
+            System.display('Usage: mget remote-files')
+            return
+
+        pairs = [(path, posixpath.basename(path)) for path in remote_paths]
+        self.display_stats(self.get_many(pairs))
 
-                if response.code == FILE_ACTION_SUCCESSFUL:
-                    log(f'File "{remote_path}" sent.')
+    def mput(self, paths=''):
+        '''mput(paths='')
+        Store several local files in the current remote directory over a pool
+        of parallel sessions.'''
 
+        local_paths = paths.split()
+
+        # Test if user did not enter any local files.
+        if not local_paths:
+            System.display('Usage: mput local-files')
+            return
+
+        pairs = [(path, os.path.basename(path)) for path in local_paths]
+        self.display_stats(self.put_many(pairs))
+
+    def mirror(self, value=''):
+        '''mirror(value='')
+        Mirror a remote directory tree into a local directory, transferring
+        only new or changed files. With -d, local files that no longer exist
+        remotely are deleted.'''
+
+        args = value.split()
+        delete = '-d' in args
+        paths = [a for a in args if a != '-d']
+
+        # Test if user did not enter both directories.
+        if len(paths) != 2:
+            System.display('Usage: mirror [-d] remote-directory local-directory')
+            return
+
+        try:
+            result = self.mirror_tree(paths[0], paths[1], delete=delete)
+        except TransferError as err:
+            log(f'Error: {err}')
+            System.display(f'Error: {err}')
+            return
+
+        for job, err in result.errors:
+            System.display(f'Error: {job} -> {err}')
+        log(f'Mirror {paths[0]} -> {paths[1]}: {result}')
+        System.display(result)
+
+    def mirror_tree(self, remote_dir, local_dir, workers=None, delete=False):
+        '''mirror_tree(remote_dir, local_dir, workers=None, delete=False) -> MirrorResult
+        Mirror a remote directory tree into a local directory.'''
+
+        os.makedirs(local_dir, exist_ok=True)
+        return Mirror(self, remote_dir, local_dir, workers, delete).run()
+
+    def get_many(self, pairs, workers=None):
+        '''get_many(pairs, workers=None) -> list of WorkerStats
+        Download every (remote path, local path) pair concurrently across a
+        pool of sessions.'''
+
+        transfer = ParallelTransfer(
+            self.session_factory(), workers or self.workers, self.release_session)
+        return transfer.get(pairs)
+
+    def put_many(self, pairs, workers=None):
+        '''put_many(pairs, workers=None) -> list of WorkerStats
+        Upload every (local path, remote path) pair concurrently across a pool
+        of sessions.'''
+
+        transfer = ParallelTransfer(
+            self.session_factory(), workers or self.workers, self.release_session)
+        return transfer.put(pairs)
+
+    def display_stats(self, stats):
+        '''display_stats(stats)
+        Log and display the statistics of a parallel transfer.'''
+
+        for s in stats:
+            log(str(s))
+            if self.verbose:
+                System.display(s)
+            for job, err in s.errors:
+                System.display(f'Error: {job} -> {err}')
+
+        files, nbytes, errors = summarize(stats)
+        System.display(f'{files} files, {nbytes} bytes transferred, {errors} errors.')
+
+    def download_resumable(self, remote_path, local_path):
+        '''download_resumable(remote_path, local_path) -> number of bytes written
+        Retrieve a remote file, resuming from the last durable byte of an
+        earlier attempt. The attempt is only resumed if the remote file still
+        has the size and modification time recorded in the journal. Progress
+        is checkpointed to the journal while the transfer runs. A transfer
+        from the start of the file is compressed if compression is on, and a
+        verified transfer hashes the part already on disk before it resumes.'''
+
+        # Byte offsets are only meaningful in binary mode.
+        self.ensure_type(TYPE_BINARY)
+        size = self.size(remote_path)
+        mtime = self.mdtm(remote_path)
+
+        # Test if an earlier attempt of the same file can be resumed.
+        checkpoint = self.journal.get(DOWNLOAD, remote_path, local_path)
+        if checkpoint and checkpoint.matches(size, mtime) and os.path.exists(local_path):
+            offset = min(checkpoint.offset, os.path.getsize(local_path))
+        else:
+            checkpoint = Checkpoint(DOWNLOAD, remote_path, local_path, 0, size, mtime)
+            offset = 0
+        checkpoint.offset = offset
+
+        # Test if the file was already complete.
+        if size is not None and offset >= size:
+            self.journal.remove(checkpoint)
+            return 0
+
+        # Choose the hash before the transfer starts, since it may send FEAT.
+        hasher = self.start_hash()
+
+        # Open a data connection using the currently enabled connection type.
+        # A compressed stream cannot start part way through the file.
+        data_conn = self.open_data_conn(compress=not offset)
+        if not data_conn:
+            return None
+
+        try:
+            # Test if transfer resumes part way through the file.
+            if offset:
+                self.rest(offset)
+                record_retry(self, 'resume')
+                log(f'Resuming "{remote_path}" at byte {offset}.')
+
+            # Send the RETR command over command channel and get response.
+            started = time.monotonic()
+            self.send_message('RETR', remote_path)
+            response = self.get_response()
+
+            # Test if server did not start the transfer.
+            if not is_transfer_started(response):
+                return None
+
+            self.journal.record(checkpoint)
+            remaining = None if size is None else size - offset
+            with System.open_file(local_path, 'r+b' if offset else 'wb') as f:
+                # Drop any bytes past the last durable checkpoint.
+                f.truncate(offset)
+                if hasher:
+                    f.seek(0)
+                    hasher.update_file(f, offset)
+                f.seek(offset)
+
+                writer = CheckpointWriter(f, self.journal, checkpoint)
+                sink = HashingWriter(writer, hasher) if hasher else writer
+                progress = self.start_progress(remote_path, size, offset)
+                try:
+                    # Test if the data is compressed (MODE Z).
+                    if data_conn.compression:
+                        total = data_conn.receive_inflated(sink, progress=progress)
+                    else:
+                        total = data_conn.receive_to(sink, remaining, progress=progress)
+                finally:
+                    progress.finish()
+                    writer.sync()
+
+            # Test if the transfer was truncated.
+            if remaining is not None and total < remaining:
+                # Read the final reply so the session stays in step.
+                self.finish_transfer(data_conn, partial=True)
+                raise TransferError(
+                    local_path, f'Transfer truncated at {offset + total} of {size} bytes.')
+
+            self.finish_transfer(data_conn)  # 226 Transfer complete.
+            self.record_transfer(GET, total, started, data_conn)
+        finally:
             data_conn.close()
 
+        self.journal.remove(checkpoint)
+        log(f'File "{local_path}" written.')
+        self.check_hash(remote_path, hasher)
+        return total
+
+    def upload_resumable(self, local_path, remote_path):
+        '''upload_resumable(local_path, remote_path) -> number of bytes sent
+        Store a local file on the server, resuming an earlier attempt with
+        APPE from the size the server already holds. The attempt is only
+        resumed if the local file still has the size and modification time
+        recorded in the journal. A transfer from the start of the file is
+        compressed if compression is on, and a verified transfer hashes the
+        whole local file.'''
+
+        # Byte offsets are only meaningful in binary mode.
+        self.ensure_type(TYPE_BINARY)
+        st = os.stat(local_path)
+        size = st.st_size
+        mtime = int(st.st_mtime)
+
+        # Test if an earlier attempt of the same file can be resumed.
+        offset = 0
+        checkpoint = self.journal.get(UPLOAD, remote_path, local_path)
+        if checkpoint and checkpoint.matches(size, mtime):
+            remote_size = self.size(remote_path)
+            if remote_size is not None and remote_size <= size:
+                offset = remote_size
+        else:
+            checkpoint = Checkpoint(UPLOAD, remote_path, local_path, 0, size, mtime)
+        checkpoint.offset = offset
+        self.journal.record(checkpoint)
+
+        # Choose the hash before the transfer starts, since it may send FEAT.
+        hasher = self.start_hash()
+
+        # Open a data connection using the currently enabled connection type.
+        # A compressed stream cannot start part way through the file.
+        data_conn = self.open_data_conn(compress=not offset)
+        if not data_conn:
+            return None
+
+        try:
+            # Test if transfer resumes part way through the file.
+            started = time.monotonic()
+            if offset:
+                self.send_message('APPE', remote_path)
+                record_retry(self, 'resume')
+                log(f'Resuming "{local_path}" at byte {offset}.')
+            else:
+                self.send_message('STOR', remote_path)
+            response = self.get_response()
+
+            # Test if server did not start the transfer.
+            if not is_transfer_started(response):
+                return None
+
+            progress = self.start_progress(local_path, size, offset)
+            try:
+                total = data_conn.send_file(
+                    local_path, offset, progress=progress, hasher=hasher)
+            finally:
+                progress.finish()
+            self.finish_transfer(data_conn)  # 226 Transfer complete.
+            self.record_transfer(PUT, total, started, data_conn)
+            self.invalidate_listing(remote_path)
+        finally:
+            data_conn.close()
+
+        self.journal.remove(checkpoint)
+        log(f'File "{remote_path}" sent.')
+        self.check_hash(remote_path, hasher)
+        return total
+
+    def mdtm(self, path):
+        '''mdtm(path) -> seconds since the epoch
+        Send the MDTM command to the server and return the modification time
+        of the remote file. Return None if the server does not report it.'''
+
+        self.send_message('MDTM', path)
+        return parse_mdtm(self.get_response())
+
+    def size(self, path):
+        '''size(path) -> file size
+        Send the SIZE command to the server and return the size of the remote
+        file in bytes. Return None if the server does not report it.'''
+
+        self.send_message('SIZE', path)
+        return parse_size(self.get_response())
+
+    def finish_transfer(self, data_conn, partial=False):
+        '''finish_transfer(data_conn, partial=False) -> ServerResponse
+        Close the data connection and confirm the final reply of the transfer
+        on the control connection. Raise TransferError if the server did not
+        report the transfer as successful. A partial transfer, which the
+        client ends early on purpose, accepts whatever final reply the server
+        sends.'''
+
+        data_conn.close()
+        response = self.get_response()
+
+        # Test if server did not complete the transfer.
+        if not partial and response.code != FILE_ACTION_SUCCESSFUL:
+            raise TransferError(response, 'Transfer was not completed.')
+
+        return response
+
+    def start_progress(self, name, total=None, done=0):
+        '''start_progress(name, total=None, done=0) -> Progress
+        Start tracking the progress of a transfer of total bytes, of which
+        done bytes were already transferred. The progress is reported to the
+        client's progress callback, if it has one.'''
+
+        return Progress(name, total, self.progress, done).start()
+
+    def start_hash(self):
+        '''start_hash() -> StreamHash
+        Return a new hash of the algorithm used to verify transfers, or None
+        if transfers are not verified. Only binary transfers are verified,
+        since the server hashes its own copy of the file. Call it before the
+        data connection is opened: in AUTO mode it may send FEAT, which must
+        not be answered in the middle of a transfer.'''
+
+        # Test if the transfer cannot be verified.
+        if not self.verify or self.transfer_type != TYPE_BINARY:
+            return None
+
+        return StreamHash(self.hash_algorithm())
+
+    def hash_algorithm(self):
+        '''hash_algorithm() -> algorithm
+        Return the algorithm used to verify transfers. In AUTO mode it is the
+        algorithm the server's HASH feature has selected, or else the most
+        preferred one it offers. A server without HASH is asked for a CRC32
+        with XCRC.'''
+
+        # Test if the user chose the algorithm.
+        if self.verify != AUTO:
+            return self.verify
+
+        self.features()
+        algorithms, selected = parse_hash_feature(self.feature_args.get('HASH', ''))
+        if selected:
+            return selected
+        for algorithm in ALGORITHMS:
+            if algorithm in algorithms:
+                return algorithm
+
+        return CRC32
+
+    def remote_hash(self, path, algorithm):
+        '''remote_hash(path, algorithm) -> hex digest
+        Ask the server for the hash of a remote file: with the HASH command
+        if the server offers the algorithm, otherwise with XCRC, XMD5 or
+        XSHA256. Return None if the server cannot hash the file.'''
+
+        # Test if server offers the algorithm with the HASH command.
+        if 'HASH' in self.features():
+            algorithms, selected = parse_hash_feature(self.feature_args['HASH'])
+            if algorithm in algorithms:
+                # Test if server must be switched to the algorithm.
+                if (self.current_hash or selected) != algorithm:
+                    self.send_message('OPTS', f'HASH {algorithm}')
+                    response = self.get_response()
+                    if response.code == COMMAND_OK:
+                        self.current_hash = algorithm
+
+                if (self.current_hash or selected) == algorithm:
+                    self.send_message('HASH', path)
+                    return parse_hash_reply(self.get_response())
+
+        self.send_message(X_COMMANDS[algorithm], path)
+        return parse_x_hash_reply(self.get_response(), algorithm)
+
+    def check_hash(self, remote_path, hasher):
+        '''check_hash(remote_path, hasher)
+        Compare the hash computed while a file streamed with the server's
+        hash of the remote file. Raise TransferError if they differ. A
+        server that cannot hash the file leaves the transfer unverified.'''
+
+        # Test if the transfer is not verified.
+        if not hasher:
+            return
+
+        digest = self.remote_hash(remote_path, hasher.algorithm)
+
+        # Test if server did not report a hash.
+        if digest is None:
+            log(f'Unable to verify "{remote_path}": server did not report a {hasher.algorithm} hash.')
+            return
+
+        if not hasher.matches(digest):
+            raise TransferError(
+                remote_path, f'{hasher.algorithm} mismatch: local {hasher.hexdigest()}, server {digest}.')
+
+        log(f'Verified "{remote_path}" with {hasher.algorithm} {hasher.hexdigest()}.')
+
+    def record_transfer(self, direction, nbytes, started, data_conn):
+        '''record_transfer(direction, nbytes, started, data_conn)
+        Record the bytes, duration and time to first byte of a transfer whose
+        command was sent at started.'''
+
+        first_byte_at = data_conn.first_byte_at
+        ttfb = first_byte_at - started if first_byte_at else None
+        self.metrics.transfer(self.server_label(), direction, nbytes,
+                              time.monotonic() - started, ttfb)
+
+    def ensure_type(self, transfer_type=None):
+        '''ensure_type(transfer_type=None)
+        Send the TYPE command if the server is not already using the given
+        transfer type, or the client's transfer type if none is given. Raise
+        TransferError if the server refuses the type.'''
+
+        transfer_type = transfer_type or self.transfer_type
+
+        # Test if server already uses the transfer type.
+        if self.current_type == transfer_type:
+            return
+
+        self.send_message('TYPE', transfer_type)
+        response = self.get_response()
+
+        # Test if server refused the transfer type.
+        if response.code != COMMAND_OK:
+            raise TransferError(response, f'TYPE {transfer_type} refused by server.')
+
+        self.current_type = transfer_type
+
+    def ensure_mode(self, transfer_mode):
+        '''ensure_mode(transfer_mode) -> transfer mode in use
+        Send the MODE command if the server is not already using the given
+        transfer mode. If the server refuses MODE Z, then stream mode is used
+        instead and MODE Z is not asked for again on this connection. Raise
+        TransferError if the server refuses stream mode.'''
+
+        # Test if server refused MODE Z before.
+        if transfer_mode == MODE_ZLIB and self.mode_z_refused:
+            transfer_mode = MODE_STREAM
+
+        # Test if server does not already use the transfer mode. Stream mode
+        # is the default.
+        if (self.current_mode or MODE_STREAM) != transfer_mode:
+            self.send_message('MODE', transfer_mode)
+            response = self.get_response()
+
+            # Test if server refused the transfer mode.
+            if response.code != COMMAND_OK:
+                if transfer_mode == MODE_STREAM:
+                    raise TransferError(response, 'MODE S refused by server.')
+                self.mode_z_refused = True
+                log('MODE Z refused by server, using stream mode.')
+                return self.ensure_mode(MODE_STREAM)
+
+            self.current_mode = transfer_mode
+            self.current_level = None
+            log(f'Setting transfer mode to {transfer_mode}')
+
+        # Test if server should compress at a new level. A server without
+        # OPTS MODE Z keeps its own level, so the reply is not checked.
+        if transfer_mode == MODE_ZLIB and self.current_level != self.compression:
+            self.send_message('OPTS', f'MODE Z LEVEL {self.compression}')
+            self.get_response()
+            self.current_level = self.compression
+
+        return transfer_mode
+
+    def translator(self, translator_class):
+        '''translator(translator_class) -> translator
+        Return a new line ending translator for ASCII mode, or None in binary
+        mode where bytes are transferred exactly.'''
+
+        if self.transfer_type == TYPE_ASCII:
+            return translator_class()
+
+        return None
+
+    def rest(self, offset):
+        '''rest(offset)
+        Send the REST command so that the next transfer starts at offset. Raise
+        TransferError if the server cannot restart transfers.'''
+
+        self.send_message('REST', offset)
+        response = self.get_response()
+
+        # Test if server did not accept the restart marker.
+        if response.code != FILE_ACTION_PENDING:
+            raise TransferError(response, 'Server cannot restart transfers.')
+
+    def download_range(self, remote_path, f, offset, length):
+        '''download_range(remote_path, f, offset, length) -> number of bytes
+        Retrieve length bytes of a remote file, starting at offset, and write
+        them at the same offset of the open local file f. Raise TransferError
+        if the range cannot be retrieved in full.'''
+
+        # Byte offsets are only meaningful in binary mode.
+        self.ensure_type(TYPE_BINARY)
+
+        # Open a data connection using the currently enabled connection type.
+        data_conn = self.open_data_conn(compress=False)
+        if not data_conn:
+            raise TransferError(remote_path, 'Unable to open data connection.')
+
+        try:
+            self.rest(offset)
+
+            # Send the RETR command over command channel and get response.
+            started = time.monotonic()
+            self.send_message('RETR', remote_path)
+            response = self.get_response()
+
+            # Test if server did not start the transfer.
+            if not is_transfer_started(response):
+                raise TransferError(response, 'Transfer was not started.')
+
+            total = data_conn.receive_to(f, length, offset)
+
+            # The server may still be sending the rest of the file, so the
+            # data connection is closed early and the final reply may be 426.
+            self.finish_transfer(data_conn, partial=True)
+            self.record_transfer(GET, total, started, data_conn)
+        finally:
+            data_conn.close()
+
+        # Test if the range was truncated.
+        if total < length:
+            raise TransferError(
+                remote_path, f'Range at {offset} truncated at {total} of {length} bytes.')
+
+        return total
+
+    def download_segmented(self, remote_path, local_path, segments=None):
+        '''download_segmented(remote_path, local_path, segments=None) -> number of bytes
+        Retrieve one large remote file over several parallel sessions, each
+        of which retrieves its own byte range with REST and RETR.'''
+
+        self.ensure_type(TYPE_BINARY)
+        segmented = SegmentedDownload(
+            self.session_factory(), segments or self.segments, self.release_session)
+        return segmented.get(self, remote_path, local_path)
+
     def syst(self):
         '''syst()
         Send the SYST comand to server and receive system information in 
@@ -468,8 +1463,7 @@ class Client:
         '''help()
         Display the sorted list of user commands to the console.'''
 
-        commands = USER_COMMANDS
-        commands.sort()
+        commands = sorted(COMMAND_TABLE)
         System.display('Some commands are abbreviated.  Commands are:\n')
         System.display_list(commands)
 
@@ -481,15 +1475,24 @@ class Client:
         self.close()
         System.terminate()
 
-    def open_data_conn(self):
-        '''open_data_conn() -> DataConnection
+    def open_data_conn(self, compress=True):
+        '''open_data_conn(compress=True) -> DataConnection
         Create a new DataConnection object and use the currently enabled
         connection type (PASV/EPSV/PORT/EPRT) to establish a connection with
-        the server.'''
-
-        data_conn = DataConnection()
+        the server. If compress is true and compression is turned on, then
+        the transfer uses MODE Z where the server supports it; otherwise it
+        uses stream mode.'''
+
+        use_zlib = compress and self.compression
+        mode = self.ensure_mode(MODE_ZLIB if use_zlib else MODE_STREAM)
+
+        data_conn = DataConnection(self.profile)
+        data_conn.limiter = self.limiter()
+        data_conn.compression = self.compression if mode == MODE_ZLIB else None
+        conn_type = self.data_conn_type()
+        started = time.monotonic()
         # PASV
-        if self.use_pasv:
+        if conn_type == PASV:
             self.send_message('PASV')
             response = self.get_response()
             # Test if PASV is disabled.
@@ -498,11 +1501,12 @@ class Client:
                 System.display('Use pasv and epsv commands to enable PORT/EPRT')
             else:
                 host, port = self.parse_pasv_response(response.message)
-                data_conn.connect(host, port, self.address_family())
+                data_conn.connect(self.pasv_candidates(host, port))
+                self.record_data_conn(PASV, started)
                 return data_conn
 
         # EPSV
-        elif self.use_epsv:
+        elif conn_type == EPSV:
             self.send_message('EPSV')
             response = self.get_response()
             # Test if EPSV is disabled.
@@ -511,66 +1515,114 @@ class Client:
                 System.display('Use pasv and epsv commands to enable PORT/EPRT')
             else:
                 host, port = self.parse_epsv_response(response.message)
-                data_conn.connect(host, port, self.address_family())
+                data_conn.connect([(self.conn.family, (host, port))])
+                self.record_data_conn(EPSV, started)
                 return data_conn
 
         # PORT
-        elif self.use_port:
-            h1to4 = self.host.replace('.', ',')
-            port = data_conn.bind(self.address_family())
+        elif conn_type == PORT:
+            h1to4 = self.local_address().replace('.', ',')
+            port = data_conn.listen(
+                self.listeners, self.address_family(), self.conn.getpeername()[0])
             p1, p2 = self.convert_port_to_p1p2(port)
             self.send_message('PORT', f'{h1to4},{p1},{p2}')
             response = self.get_response()
             # Test if PORT is disabled.
             if response.code == COMMAND_NOT_IMPLEMENTED:
+                data_conn.close()
                 System.display('PORT/EPRT is disabled by server.')
                 System.display('Use port and eprt commands to enable PASV/EPSV')
             else:
-                # Create and start new thread to serve the data connection.
-                t = threading.Thread(target=data_conn.listen)
-                t.start()
+                # The listener manager accepts the server's connection.
+                self.record_data_conn(PORT, started)
                 return data_conn
 
         # EPRT
-        elif self.use_eprt:
+        elif conn_type == EPRT:
             net_prt = self.address_family_num()
-            client_addr = socket.gethostbyname(socket.gethostname())
-            port = data_conn.bind(self.address_family(net_prt))
+            client_addr = self.local_address()
+            port = data_conn.listen(
+                self.listeners, self.address_family(net_prt), self.conn.getpeername()[0])
             self.send_message('EPRT', f'|{net_prt}|{client_addr}|{port}|')
             response = self.get_response()
             # Test if EPRT is disabled.
             if response.code == COMMAND_NOT_IMPLEMENTED:
+                data_conn.close()
                 System.display('PORT/EPRT is disabled by server.')
                 System.display('Use port and eprt commands to enable PASV/EPSV')
             else:
-                # Create and start new thread to serve the data connection.
-                t = threading.Thread(target=data_conn.listen)
-                t.start()
+                # The listener manager accepts the server's connection.
+                self.record_data_conn(EPRT, started)
                 return data_conn
 
         return None
 
-    def parse_pasv_response(self, response):
-        DELIMETER = ','
-        i1 = response.find('(') + 1
-        i2 = response.find(')')
-        a = response[i1:i2].split(DELIMETER)
+    def data_conn_type(self):
+        '''data_conn_type() -> PASV, EPSV, PORT or EPRT
+        Return the enabled data connection type. PASV and PORT can only
+        carry IPv4 addresses, so over IPv6 they are replaced by EPSV and
+        EPRT.'''
+
+        ipv6 = self.conn.family == socket.AF_INET6
+        if self.use_pasv:
+            return EPSV if ipv6 else PASV
+        if self.use_epsv:
+            return EPSV
+        if self.use_port:
+            return EPRT if ipv6 else PORT
+
+        return EPRT
+
+    def pasv_candidates(self, host, port):
+        '''pasv_candidates(host, port) -> list of (family, address)
+        The addresses to try for a PASV data connection: the address in the
+        reply, then the server of the control connection if it differs. A
+        server behind NAT often replies with a private address the client
+        cannot reach, and racing both finds the one that works.'''
 
-        host = '.'.join(a[:4])
-        port = self.convert_p1p2_to_port(a[4], a[5])
+        candidates = [(socket.AF_INET, (host, port))]
+        peer = self.conn.getpeername()[0]
+        if peer != host and self.conn.family == socket.AF_INET:
+            candidates.append((socket.AF_INET, (peer, port)))
 
-        return host, port
+        return candidates
+
+    def limiter(self):
+        '''limiter() -> RateLimiter
+        Return the rate limiter for a new transfer of this session, or None
+        if it is unlimited. See transfer_limiter.'''
+
+        return transfer_limiter(self.transfer_limit, self.session_limit)
+
+    def record_data_conn(self, mode, started):
+        '''record_data_conn(mode, started)
+        Record the setup latency of a data connection opened since started.
+        In PORT and EPRT modes the server connects once the transfer starts,
+        so only the command round trip is measured.'''
+
+        self.metrics.data_conn(self.server_label(), mode, time.monotonic() - started)
+
+    def parse_pasv_response(self, response):
+        '''parse_pasv_response(response) -> (host, port)
+        Parse the host and port from a reply to the PASV command.'''
+
+        return parse_pasv_response(response)
 
     def parse_epsv_response(self, response):
-        DELIMETER = '|'
-        i1 = response.find('(') + 1
-        i2 = response.find(')')
-        a = response[i1:i2].split(DELIMETER)
+        '''parse_epsv_response(response) -> (host, port)
+        Parse the port from a reply to the EPSV command. The host is the
+        address the control connection is connected to, so the data
+        connection does not resolve the server name again.'''
+
+        return self.conn.getpeername()[0], parse_epsv_response(response)
 
-        # TODO: check port
-        port = int(a[3])
+    def local_address(self):
+        '''local_address() -> address
+        The address of this host sent with PORT and EPRT: the local address
+        of the control connection, which is the one the server can reach. No
+        lookup is needed.'''
 
-        return self.host, port
+        return self.conn.getsockname()[0]
 
     def address_family(self, net_prt=None):
         '''address_family() -> address family
@@ -601,7 +1653,7 @@ class Client:
 
         if addr_fam == socket.AF_INET:
             return IPv4
-        elif addr_fam == socket.AF_INET:
+        elif addr_fam == socket.AF_INET6:
             return IPv6
 
         return None
@@ -610,15 +1662,13 @@ class Client:
         '''convert_port_to_p1p2(port) -> (p1, p2)
         Convert a given port number into p1 and p2.'''
 
-        p1 = int(port) // 256
-        p2 = int(port) - (p1 * 256)
-        return p1, p2
+        return convert_port_to_p1p2(port)
 
     def convert_p1p2_to_port(self, p1, p2):
         '''convert_p1p2_to_port(p1, p2) -> port
         Convert a given p1 and p2 into a port number.'''
 
-        return (int(p1) * 256) + int(p2)
+        return convert_p1p2_to_port(p1, p2)
 
     def toggle_data_conn_type(self, conn_type):
         '''toggle_data_conn_type(conn_type)
@@ -685,12 +1735,204 @@ class Client:
             self.verbose = True
             System.display('Verbose mode On .')
 
+    def toggle_progress(self):
+        '''toggle_progress()
+        Toggle the progress bar on or off. When the progress bar is turned on,
+        then the progress of each get and put is drawn on the terminal.'''
+
+        # Progress bar Off .
+        if self.progress:
+            self.progress = None
+            System.display('Progress bar Off .')
+        else:
+            self.progress = ProgressBar()
+            System.display('Progress bar On .')
+
+    def set_type(self, transfer_type):
+        '''set_type(transfer_type)
+        Set the transfer type used for get and put. The TYPE command is sent
+        before the next transfer.'''
+
+        self.transfer_type = transfer_type
+        if transfer_type == TYPE_ASCII:
+            System.display('Type set to A.')
+        else:
+            System.display('Type set to I.')
+        log(f'Setting transfer type to {transfer_type}')
+
+    def set_compression(self, value=''):
+        '''set_compression(value='')
+        Turn MODE Z compression on at the default level, off, or on at a
+        level from 1 to 9. Without a value, display the current setting.
+        Compression is used for get, put and listings where the server
+        supports it.'''
+
+        # Test if no value given.
+        if not value:
+            level = self.compression
+            System.display(f'Compression: {f"level {level}" if level else "off"}')
+            return
+
+        try:
+            level = parse_level(value)
+        except ValueError:
+            System.display('Usage: compress [on | off | level]')
+            return
+
+        self.compression = level
+        System.display(f'Compression: {f"level {level}" if level else "off"}')
+        log(f'Setting compression level to {level}')
+
+    def set_verify(self, value=''):
+        '''set_verify(value='')
+        Turn verification of binary get and put transfers on, off, or on
+        with one hash algorithm (crc32, md5 or sha-256). Without a value,
+        display the current setting.'''
+
+        # Test if no value given.
+        if not value:
+            System.display(f'Verify: {self.verify or "off"}')
+            return
+
+        try:
+            self.verify = parse_algorithm(value)
+        except ValueError:
+            System.display('Usage: verify [on | off | crc32 | md5 | sha-256]')
+            return
+
+        System.display(f'Verify: {self.verify or "off"}')
+        log(f'Setting transfer verification to {self.verify}')
+
+    def set_profile(self, value=''):
+        '''set_profile(value='')
+        Set the socket profile, which tunes buffer sizes, read sizes,
+        keepalive and timeouts for a kind of network. Without a value,
+        display the current profile and the profiles to choose from.'''
+
+        # Test if no value given.
+        if not value:
+            System.display(f'Socket profile: {self.profile.name}')
+            System.display(f'Profiles: {", ".join(PROFILES)}')
+            return
+
+        try:
+            profile = parse_profile(value)
+        except ValueError:
+            System.display(f'Usage: profile [{" | ".join(PROFILES)}]')
+            return
+
+        self.set_socket_profile(profile)
+        System.display(f'Socket profile: {profile.name}')
+        log(f'Setting socket profile to {profile.name}')
+
+    def set_socket_profile(self, profile):
+        '''set_socket_profile(profile)
+        Use a SocketProfile for the next data connections and retune the
+        control connection, if connected.'''
+
+        self.profile = profile
+        if self.conn:
+            profile.tune_control(self.conn)
+
+    def set_segments(self, value=''):
+        '''set_segments(value='')
+        Set the number of parallel segments used to retrieve a single file.
+        One segment turns segmented mode off.'''
+
+        # Test if no value given.
+        if not value:
+            System.display(f'Segments: {self.segments}')
+            return
+
+        try:
+            segments = int(value)
+            if segments < 1:
+                raise ValueError
+        except ValueError:
+            System.display('Usage: segments positive-integer')
+            return
+
+        self.segments = segments
+        System.display(f'Segments: {self.segments}')
+        log(f'Setting number of download segments to {self.segments}')
+
+    def set_limit(self, value=''):
+        '''set_limit(value='')
+        Set the global, per-session or per-transfer rate limit, for example
+        "limit global 10M" or "limit session off". Without a value, display
+        the current limits.'''
+
+        args = value.split()
+
+        # Test if no value given.
+        if not args:
+            for scope, rate in (('global', global_limit.rate),
+                                ('session', self.session_limit.rate),
+                                ('transfer', self.transfer_limit)):
+                System.display(
+                    f'{scope}: {format_bytes(rate) + "/s" if rate else "unlimited"}')
+            return
+
+        try:
+            if len(args) != 2:
+                raise ValueError
+            scope = args[0].lower()
+            rate = parse_rate(args[1])
+        except ValueError:
+            System.display('Usage: limit [global | session | transfer rate]')
+            return
+
+        if scope == 'global':
+            global_limit.set_rate(rate)
+        elif scope == 'session':
+            self.session_limit.set_rate(rate)
+        elif scope == 'transfer':
+            self.transfer_limit = rate
+        else:
+            System.display('Usage: limit [global | session | transfer rate]')
+            return
+
+        text = f'{format_bytes(rate)}/s' if rate else 'unlimited'
+        System.display(f'{scope.capitalize()} limit: {text}')
+        log(f'Setting {scope} rate limit to {text}')
+
+    def stats(self, value=''):
+        '''stats(value='')
+        Display the transfer metrics as a summary, or as JSON or Prometheus
+        text with the json or prom argument.'''
+
+        fmt = value.strip().lower()
+        if fmt == 'json':
+            System.display(self.metrics.to_json())
+        elif fmt == 'prom':
+            System.display(self.metrics.to_prometheus())
+        elif not fmt:
+            System.display(self.metrics.summary())
+        else:
+            System.display('Usage: stats [json | prom]')
+
+    def toggle_pipelining(self):
+        '''toggle_pipelining()
+        Toggle pipelined mode on or off. When pipelined mode is turned on, then
+        batches of independent commands are sent in one write.'''
+
+        # Pipelined mode Off .
+        if self.pipelining:
+            self.pipelining = False
+            System.display('Pipelined mode Off .')
+        else:
+            self.pipelining = True
+            System.display('Pipelined mode On .')
+
 
 CWD = 'cd'
 PWD = 'pwd'
 LIST = 'ls'
 RETR = 'get'
 STOR = 'put'
+MRETR = 'mget'
+MSTOR = 'mput'
+MIRROR = 'mirror'
 SYST = 'system'
 REMOTE_HELP = 'remotehelp'
 
@@ -703,126 +1945,414 @@ HELP = 'help'
 QUIT = 'quit'
 
 VERBOSE = 'verbose'
-
-CONN_REQUIRED_COMMANDS = [CWD, PWD, LIST, RETR, STOR, SYST, REMOTE_HELP]
-COMMANDS_THAT_USE_DATA_CONN = [LIST, RETR, STOR]
-DATA_CONN_COMMANDS = [PASV, EPSV, PORT, EPRT]
-USER_COMMANDS = [CWD, PWD, LIST, RETR, STOR, SYST, HELP,
-                 REMOTE_HELP, QUIT, VERBOSE, PASV, EPSV, PORT, EPRT]
+PIPELINE = 'pipeline'
+SEGMENTS = 'segments'
+ASCII = 'ascii'
+BINARY = 'binary'
+STATS = 'stats'
+PROGRESS = 'progress'
+LIMIT = 'limit'
+COMPRESS = 'compress'
+VERIFY = 'verify'
+PROFILE = 'profile'
+
+# Each user command maps to its handler, called as handler(client, value),
+# and whether it requires a connection. execute looks a command up once
+# instead of testing it against several lists.
+COMMAND_TABLE = {
+    CWD: (Client.cwd, True),
+    PWD: (lambda client, value: client.pwd(), True),
+    LIST: (Client.ls, True),
+    RETR: (Client.retr, True),
+    STOR: (Client.stor, True),
+    MRETR: (Client.mget, True),
+    MSTOR: (Client.mput, True),
+    MIRROR: (Client.mirror, True),
+    SYST: (lambda client, value: client.syst(), True),
+    REMOTE_HELP: (lambda client, value: client.remotehelp(), True),
+    HELP: (lambda client, value: client.help(), False),
+    QUIT: (lambda client, value: client.quit(), False),
+    VERBOSE: (lambda client, value: client.toggle_verbose(), False),
+    PIPELINE: (lambda client, value: client.toggle_pipelining(), False),
+    SEGMENTS: (Client.set_segments, False),
+    ASCII: (lambda client, value: client.set_type(TYPE_ASCII), False),
+    BINARY: (lambda client, value: client.set_type(TYPE_BINARY), False),
+    STATS: (Client.stats, False),
+    PROGRESS: (lambda client, value: client.toggle_progress(), False),
+    LIMIT: (Client.set_limit, False),
+    COMPRESS: (Client.set_compression, False),
+    VERIFY: (Client.set_verify, False),
+    PROFILE: (Client.set_profile, False),
+    PASV: (lambda client, value: client.toggle_data_conn_type(PASV), False),
+    EPSV: (lambda client, value: client.toggle_data_conn_type(EPSV), False),
+    PORT: (lambda client, value: client.toggle_data_conn_type(PORT), False),
+    EPRT: (lambda client, value: client.toggle_data_conn_type(EPRT), False),
+}
 
 
 class DataConnection:
 
-    def __init__(self):
-        self.listening_sock = None
+    def __init__(self, profile=default_profile):
+        self.profile = profile
+        self.listener = None
+        self.manager = None
         self.conn = None
         self.addr = None
         self.port = None
+        self.first_byte_at = None
+        self.limiter = None
+        self.compression = None
+        self.closed = False
+        self.lock = threading.Lock()
         self.connected = threading.Event()
 
     def close(self):
         '''close()
-        Close the data connection.'''
+        Close the data connection, and stop waiting for the server to connect
+        if it has not yet.'''
+
+        with self.lock:
+            self.closed = True
+            listener, self.listener = self.listener, None
+
+        # Test if server never connected to the listener.
+        if listener and not self.connected.is_set():
+            self.manager.release(listener, self)
 
         if self.conn:
             try:
                 self.conn.close()
                 log('Closed data connection.')
-            except:
-                pass
-
-        if self.listening_sock:
-            try:
-                self.listening_sock.close()
-            except:
+            except OSError:
                 pass
+            self.conn = None
 
-    def connect(self, host, port, addr_fam):
-        '''connect()
-        Connect data connection to host and set the connected event.'''
+    def connect(self, candidates):
+        '''connect(candidates)
+        Connect data connection to the first reachable (family, address)
+        candidate and set the connected event.'''
 
         # Connect to server.
-        self.conn = socket.socket(addr_fam, socket.SOCK_STREAM)
-        self.conn.connect((host, port))
+        self.conn = connect_race(candidates, timeout=self.profile.connect_timeout,
+                                 prepare=self.profile.tune_data)
+        self.conn.settimeout(self.profile.io_timeout)
+        self.addr, self.port = self.conn.getpeername()[:2]
 
         # Set connected event.
         self.connected.set()
-        log(f'Connecting data channel to {host}:{port}')
+        log(f'Connecting data channel to {self.addr}:{self.port}')
+
+    def listen(self, manager, addr_fam, peer=None):
+        '''listen(manager, addr_fam, peer=None) -> port number
+        Reserve a listening socket tuned by the socket profile from a
+        ListenerManager for the server to connect to. Only a connection from
+        the peer address is accepted.'''
+
+        self.manager = manager
+        self.listener = manager.acquire(self, addr_fam, peer, self.profile)
+        log(f'Listening for data connection on port {self.listener.port}.')
+        return self.listener.port
+
+    def attach(self, conn, addr):
+        '''attach(conn, addr)
+        Take the connection accepted by the listener manager and set the
+        connected event.'''
+
+        with self.lock:
+            # Test if the transfer was given up before the server connected.
+            if self.closed:
+                conn.close()
+                return
+
+            conn.settimeout(self.profile.io_timeout)
+            self.conn = conn
+            self.addr = addr[0]
+            self.port = int(addr[1])
+            self.connected.set()
 
-    def bind(self, addr_fam):
-        '''bind(add_fam) -> port number
-        Find an open port and bind to it.'''
+        log('Connected to data channel.')
 
-        low = 50000
-        high = 60000
+    def wait_connected(self, timeout=None):
+        '''wait_connected(timeout=None)
+        Wait until the data connection is established, at most timeout
+        seconds or the accept timeout of the socket profile. Raise
+        TransferError if the server does not connect in time.'''
 
-        # Loop until found an open port.
-        self.listening_sock = socket.socket(addr_fam, socket.SOCK_STREAM)
+        if timeout is None:
+            timeout = self.profile.accept_timeout
+        if not self.connected.wait(timeout):
+            raise TransferError(None, 'Server did not open the data connection.')
+
+    def receive_data(self, bufsize=None):
+        '''receive_data(bufsize=None) -> data
+        Receive the data transfer from the server. A short read does not mean
+        the transfer is over, so keep reading until the server closes the
+        data connection.'''
+
+        # Decode and log/display to console the data response.
+        data = self.receive_text(bufsize)
+        log_payload(data)
+        System.display(data)
+
+        return data
+
+    def receive_text(self, bufsize=None):
+        '''receive_text(bufsize=None) -> data
+        Receive a text transfer, such as a directory listing, until the server
+        closes the data connection and return it decoded.'''
+
+        self.wait_connected()
+
+        state = TransferState(self.profile.chunk_sizer(bufsize), limiter=self.limiter)
+        chunks = []
         while True:
-            # Get random port number within low and high.
-            port = System.randint(low, high)
-            try:
-                # Attempt to bind to port.
-                self.listening_sock.bind(('', port))
-                log(f'Binding data connection to: localhost:{port}.')
+            # Receive some data.
+            response = self.conn.recv(state.next_size())
+
+            # Test if server closed the data connection.
+            if not response:
                 break
-            except:
-                pass
 
-        return port
+            chunks.append(response)
+            wait = state.count(len(response))
+            if wait > 0:
+                time.sleep(wait)
+
+        data = b''.join(chunks)
+
+        # Test if the data is compressed (MODE Z).
+        if self.compression:
+            data = inflate(data)
+
+        return decode(data)
+
+    def receive_file(self, path, size=None, bufsize=None, translator=None,
+                     progress=None, hasher=None):
+        '''receive_file(path, size=None, bufsize=None, translator=None, progress=None, hasher=None) -> number of bytes received
+        Stream the data transfer from the server into a local file. Reading
+        stops at end of file, or once size bytes have arrived when the size is
+        known. Raise TransferError if the connection closes early. If a
+        translator is given, then each chunk is translated on its way to the
+        file; otherwise bytes are written exactly as received. A compressed
+        transfer (MODE Z) is decompressed by an Inflater, off the thread that
+        receives it. If a hasher is given, then the data is hashed as it is
+        written.'''
+
+        with System.open_file(path, 'wb') as f:
+            # Test if chunks must be translated (ASCII mode).
+            if translator:
+                f = TranslatingWriter(f, translator)
+
+            # Test if the data is hashed for verification.
+            if hasher:
+                f = HashingWriter(f, hasher)
+
+            # Test if the data is compressed (MODE Z).
+            if self.compression:
+                total = self.receive_inflated(f, bufsize, progress)
+            else:
+                total = self.receive_to(f, size, bufsize=bufsize, progress=progress)
 
-    def listen(self):
-        '''listen()
-        The data connection listens for the server to connect.'''
+            if translator:
+                f.flush()
 
-        self.listening_sock.settimeout(10)
-        self.listening_sock.listen(1)
-        try:
-            # Accept server data connection.
-            try:
-                conn, addr = self.listening_sock.accept()
-            except socket.timeout:
-                return
+        log(f'Received {total} bytes into "{path}".')
 
-            # Set attributes.
-            self.conn = conn
-            self.addr = addr[0]
-            self.port = int(addr[1])
+        # Test if the transfer was truncated.
+        if size is not None and total < size:
+            raise TransferError(
+                path, f'Transfer truncated at {total} of {size} bytes.')
 
-            # Set connected event.
-            self.connected.set()
-            log('Connected to data channel.')
-        except KeyboardInterrupt:
-            pass
+        return total
 
-    def receive_data(self, bufsize=4096):
-        '''receive_data(bufsize=4096) -> data
-        Receive the data transfer from the server.'''
+    def receive_inflated(self, f, bufsize=None, progress=None):
+        '''receive_inflated(f, bufsize=None, progress=None) -> number of bytes written
+        Stream a compressed transfer (MODE Z) from the server into an open
+        binary file. An Inflater decompresses it off the thread that receives
+        it. Only the end of the stream tells when the transfer is complete.
+        Raise TransferError if the stream is corrupt or cut off.'''
 
-        byte_data = b''
+        inflater = Inflater(f, progress)
+        try:
+            self.receive_to(inflater, bufsize=bufsize)
+        finally:
+            inflater.close()
+
+        return inflater.finish()
+
+    def receive_to(self, f, size=None, offset=None, bufsize=None, progress=None):
+        '''receive_to(f, size=None, offset=None, bufsize=None, progress=None) -> number of bytes
+        Stream the data transfer from the server into an open binary file.
+        Each chunk is received into one reusable buffer and written as raw
+        bytes, so memory use stays flat regardless of the file size. Chunks
+        are bufsize bytes, or sized to the throughput if bufsize is None. If
+        offset is given, then chunks are written with pwrite at that
+        position, which lets several connections fill one file at once. The
+        size of each chunk is added to progress, if given.'''
+
+        self.wait_connected()
+
+        state = TransferState(self.profile.chunk_sizer(bufsize), size,
+                              limiter=self.limiter, progress=progress)
+        buf = bytearray(state.sizer.high)
+        view = memoryview(buf)
+        while not state.is_done():
+            # Receive some data into the buffer, never past the expected end
+            # of the file.
+            n = self.conn.recv_into(buf, state.next_size())
+
+            # Test if server closed the data connection.
+            if not n:
+                break
+
+            # Test if chunk is written at a fixed position.
+            if offset is None:
+                f.write(view[:n])
+            else:
+                os.pwrite(f.fileno(), view[:n], offset + state.total)
+
+            wait = state.count(n)
+            if wait > 0:
+                time.sleep(wait)
+
+        if self.first_byte_at is None:
+            self.first_byte_at = state.first_byte_at
+
+        return state.total
+
+    def send_file(self, path, offset=0, bufsize=None, translator=None,
+                  progress=None, hasher=None):
+        '''send_file(path, offset=0, bufsize=None, translator=None, progress=None, hasher=None) -> number of bytes read
+        Send a local file, starting at offset, to the server over the data
+        connection. The file is streamed from an open binary descriptor with
+        socket.sendfile, which uses the kernel's zero-copy path where
+        available and otherwise falls back to chunked sends. If a translator
+        is given, then the file is sent in translated chunks instead. A
+        compressed transfer (MODE Z) is sent with send_deflated. If a hasher
+        is given, then the file is hashed as it is read, which takes the
+        chunked path since a zero-copy send never passes through Python. The
+        bytes before offset are hashed first, so the hash covers the whole
+        file.'''
+
+        self.wait_connected()
+
+        with System.open_file(path, 'rb') as f:
+            self.first_byte_at = time.monotonic()
+
+            # Test if the data is hashed for verification.
+            if hasher:
+                hasher.update_file(f, offset)
+                f = HashingReader(f, hasher)
+
+            # Test if the data must be compressed (MODE Z).
+            if self.compression:
+                f.seek(offset)
+                total = self.send_deflated(f, bufsize, translator, progress)
+            # Test if chunks must be translated (ASCII mode).
+            elif translator:
+                f.seek(offset)
+                total = self.send_chunks(f, bufsize, translator, progress)
+            # Test if the platform supports zero-copy sends.
+            elif hasattr(os, 'sendfile') and not hasher:
+                total = self.send_zero_copy(f, offset, progress, bufsize)
+            else:
+                f.seek(offset)
+                total = self.send_chunks(f, bufsize, progress=progress)
+
+        log(f'Sent {total} bytes from "{path}".')
+        return total
+
+    def send_zero_copy(self, f, offset=0, progress=None, bufsize=None):
+        '''send_zero_copy(f, offset=0, progress=None, bufsize=None) -> number of bytes sent
+        Send an open binary file, starting at offset, with socket.sendfile.
+        If progress is given, then the file is sent in slices of
+        SENDFILE_SLICE bytes and the size of each slice is added to it. A
+        rate limited file is sent in slices of bufsize bytes, or slices sized
+        to the throughput, each paid for before it is sent, so that it does
+        not go out in bursts.'''
+
+        # Test if the whole file can go in one call.
+        if not progress and not self.limiter:
+            return self.conn.sendfile(f, offset)
+
+        sizer = self.profile.chunk_sizer(bufsize) if self.limiter else None
+        total = 0
         while True:
-            # Receive some data.
-            response = self.conn.recv(bufsize)
-            byte_data += response
+            count = sizer.size if sizer else SENDFILE_SLICE
+            if self.limiter:
+                self.limiter.consume(count)
+            n = self.conn.sendfile(f, offset + total, count)
 
-            # Test if end of message.
-            if len(response) < bufsize:
+            # Test if end of file.
+            if not n:
                 break
 
-        # Decode and log/display to console the data response.
-        data = decode(byte_data)
-        log(data)
-        System.display(data)
+            total += n
+            if sizer:
+                sizer.update(n)
+            if progress:
+                progress.update(n)
+
+        return total
+
+    def send_chunks(self, f, bufsize=None, translator=None, progress=None):
+        '''send_chunks(f, bufsize=None, translator=None, progress=None) -> number of bytes read
+        Send the remainder of an open binary file over the data connection by
+        reading it into one reusable buffer, translating each chunk if a
+        translator is given. Chunks are bufsize bytes, or sized to the
+        throughput if bufsize is None. The size of each chunk is added to
+        progress, if given.'''
+
+        state = TransferState(self.profile.chunk_sizer(bufsize), translator=translator,
+                              limiter=self.limiter, progress=progress)
+        buf = bytearray(state.sizer.high)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(view[:state.next_size()])
 
-        return data
+            # Test if end of file.
+            if not n:
+                break
+
+            # Pay for the chunk before it is sent.
+            wait = state.count(n)
+            if wait > 0:
+                time.sleep(wait)
 
-    def send_file(self, path):
-        '''send_file(path)
-        Send a local file to the server over the data connection.'''
+            self.conn.sendall(state.translate(view[:n]))
 
-        file_data = System.read_file(path)
-        self.conn.sendall(encode(file_data))
-        log(f'Sent: "{path}"')
+        tail = state.flush()
+        if tail:
+            self.conn.sendall(tail)
+
+        return state.total
+
+    def send_deflated(self, f, bufsize=None, translator=None, progress=None):
+        '''send_deflated(f, bufsize=None, translator=None, progress=None) -> number of bytes read
+        Send the remainder of an open binary file as one zlib stream (MODE
+        Z). A Deflater reads, translates and compresses the file on its own
+        thread while this thread sends the compressed blocks, reading
+        bufsize bytes at a time, or the largest chunk of the socket profile.
+        The rate limit applies to the compressed bytes on the wire, and
+        progress follows the bytes read from the file.'''
+
+        deflater = Deflater(f, self.compression, bufsize or self.profile.max_chunk,
+                            translator)
+        total = 0
+        try:
+            for nbytes, block in deflater:
+                if self.limiter:
+                    self.limiter.consume(len(block))
+
+                self.conn.sendall(block)
+                total += nbytes
+
+                if progress:
+                    progress.update(nbytes)
+        finally:
+            deflater.close()
+
+        return total
 
 
 
@@ -832,12 +2362,23 @@ if __name__ == '__main__':
     # host, filename, port = '10.246.251.93', 'mylog.txt', 21
     host, filename, port = '127.0.0.1', 'mylog.txt', 2121
     logger = Logger(filename)
+    journal = CheckpointJournal(DEFAULT_JOURNAL)
+    pool = ClientPool(Client)
+    pool.start()
+    credentials = None
 
     while True:
-        # Connect client to host and begin main processing loop.
-        client = Client(host, port)
+        # Connect client to host and begin main processing loop. The journal
+        # outlives each client so that interrupted transfers can resume. Once
+        # logged in, a restart checks a session out of the pool, which logs
+        # in again with the same credentials instead of prompting.
         try:
-            client.connect()
+            if credentials:
+                client = pool.checkout(host, port, *credentials, origin=client)
+                client.verbose = True
+            else:
+                client = Client(host, port)
+                client.connect()
         except KeyboardInterrupt:
             break
         except:
@@ -845,6 +2386,10 @@ if __name__ == '__main__':
             System.display("Unable to establish a connection with host.")
             break
 
+        client.journal = journal
+        client.pool = pool
+        client.progress = ProgressBar()
+
         try:
             main(client, host, port)
         except KeyboardInterrupt as err:
@@ -855,3 +2400,12 @@ if __name__ == '__main__':
                 f"An error occurred while connected to host, restarting service -> \r\n{err}")
             System.display(
                 f"An error occurred while connected to host, restarting service -> \r\n{err}")
+
+            # Test if the session got far enough to log in.
+            if client.logged_in:
+                credentials = (client.username, client.password)
+                record_retry(client, 'restart')
+            pool.discard(client)
+
+    pool.close()
+    default_listeners.close()
@@ -0,0 +1,249 @@
+# CS472 - Homework #4
+# Edward Parrish
+# listener.py
+#
+# This module is the listener module of the FTP client. It contains the
+# ListenerManager class which owns the listening sockets of active mode
+# (PORT/EPRT) data connections: it binds them within a port range, reuses
+# them across transfers and accepts every server connection on one selector
+# thread.
+
+from exceptions import TransferError
+from collections import deque
+import errno
+import selectors
+import socket
+import threading
+
+ACTIVE_PORT_LOW = 50000
+ACTIVE_PORT_HIGH = 60000
+MAX_IDLE_LISTENERS = 8
+
+
+class Listener:
+    '''Listener
+    One listening socket and the data connection waiting on it, if any.
+    peer is the address the connection is expected from, and profile is the
+    socket profile the socket was tuned with.'''
+
+    __slots__ = ('sock', 'port', 'family', 'profile', 'data_conn', 'peer')
+
+    def __init__(self, sock, family, profile=None):
+        self.sock = sock
+        self.port = sock.getsockname()[1]
+        self.family = family
+        self.profile = profile
+        self.data_conn = None
+        self.peer = None
+
+
+class ListenerManager:
+    '''ListenerManager
+    Manage the listening sockets of active mode data connections. Sockets
+    are bound to ports of the range low to high, taken in turn, and kept
+    listening after a transfer so the next transfer reuses them instead of
+    binding a new port. One selector thread accepts the connections of every
+    waiting transfer and hands each to its DataConnection, so no thread is
+    started per transfer. Idle sockets are kept per address family and
+    socket profile, since buffer sizes must be set before a socket listens.
+    A connection from any address other than the expected server is
+    refused.'''
+
+    def __init__(self, low=ACTIVE_PORT_LOW, high=ACTIVE_PORT_HIGH,
+                 max_idle=MAX_IDLE_LISTENERS):
+        self.low = low
+        self.high = high
+        self.max_idle = max_idle
+        self.next_port = low
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.selector = None
+        self.changes = deque()
+        self.waker = None
+        self.wakee = None
+        self.thread = None
+
+    def acquire(self, data_conn, family, peer=None, profile=None):
+        '''acquire(data_conn, family, peer=None, profile=None) -> Listener
+        Reserve a listening socket, tuned by the socket profile if given, for
+        data_conn and start accepting on it. The connection is handed to
+        data_conn.attach once it arrives.'''
+
+        with self.lock:
+            listeners = self.idle.get((family, profile))
+            listener = listeners.pop() if listeners else None
+        if listener is None:
+            listener = self.bind(family, profile)
+
+        listener.data_conn = data_conn
+        listener.peer = peer
+        self.change(selectors.EVENT_READ, listener, data_conn)
+        return listener
+
+    def bind(self, family, profile=None):
+        '''bind(family, profile=None) -> Listener
+        Bind a new listening socket to the next free port of the range. The
+        socket is tuned by the profile, if given, before it listens, so the
+        TCP window scale of accepted connections covers its buffers. Raise
+        TransferError if every port of the range is taken.'''
+
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            if profile:
+                profile.tune_data(sock)
+
+            for _ in range(self.high - self.low + 1):
+                with self.lock:
+                    port = self.next_port
+                    self.next_port = port + 1 if port < self.high else self.low
+
+                try:
+                    sock.bind(('', port))
+                    break
+                except OSError as err:
+                    # Test if port is taken rather than the bind failing.
+                    if err.errno not in (errno.EADDRINUSE, errno.EACCES):
+                        raise
+            else:
+                raise TransferError(
+                    None, f'No free port between {self.low} and {self.high}.')
+
+            sock.listen(4)
+            sock.setblocking(False)
+        except BaseException:
+            sock.close()
+            raise
+
+        return Listener(sock, family, profile)
+
+    def release(self, listener, data_conn):
+        '''release(listener, data_conn)
+        Stop waiting on a listener for data_conn and keep it for reuse, or
+        close it if enough listeners are idle. Nothing happens if the
+        listener has already accepted data_conn's connection.'''
+
+        self.change(None, listener, data_conn)
+
+    def change(self, event, listener, data_conn=None):
+        '''change(event, listener, data_conn=None)
+        Queue a change for the selector thread: start accepting on listener
+        if event is EVENT_READ, or stop and release it if event is None.'''
+
+        with self.lock:
+            self.changes.append((event, listener, data_conn))
+            self.start()
+        self.waker.send(b'\0')
+
+    def start(self):
+        # The lock is held by the caller.
+        if self.thread:
+            return
+
+        self.selector = selectors.DefaultSelector()
+        self.wakee, self.waker = socket.socketpair()
+        self.wakee.setblocking(False)
+        self.selector.register(self.wakee, selectors.EVENT_READ)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        '''run()
+        The selector loop. Apply queued changes and accept connections until
+        the manager is closed.'''
+
+        while True:
+            for key, _ in self.selector.select():
+                # Test if the loop was woken for queued changes.
+                if key.fileobj is self.wakee:
+                    try:
+                        self.wakee.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    if not self.apply_changes():
+                        return
+                else:
+                    self.accept(key.data)
+
+    def apply_changes(self):
+        '''apply_changes() -> bool
+        Apply the queued changes. Return False if the manager is closing.'''
+
+        while True:
+            with self.lock:
+                if not self.changes:
+                    return True
+                event, listener, data_conn = self.changes.popleft()
+
+            # Test if manager is closing.
+            if listener is None:
+                return False
+
+            if event:
+                self.selector.register(listener.sock, event, listener)
+            # Test if listener still waits for the data connection. A
+            # listener given up on may still get a late connection from the
+            # server, so it is not reused.
+            elif listener.data_conn is data_conn:
+                self.stop_waiting(listener, reuse=False)
+
+    def accept(self, listener):
+        try:
+            conn, addr = listener.sock.accept()
+        except BlockingIOError:
+            return
+
+        # Test if connection comes from an unexpected address.
+        if listener.peer and addr[0] != listener.peer:
+            conn.close()
+            return
+
+        conn.setblocking(True)
+        data_conn = listener.data_conn
+        self.stop_waiting(listener)
+        data_conn.attach(conn, addr)
+
+    def stop_waiting(self, listener, reuse=True):
+        # Test if listener is already released.
+        if listener.data_conn is None:
+            return
+
+        self.selector.unregister(listener.sock)
+        listener.data_conn = None
+        listener.peer = None
+
+        if reuse:
+            with self.lock:
+                listeners = self.idle.setdefault(
+                    (listener.family, listener.profile), [])
+                if len(listeners) < self.max_idle:
+                    listeners.append(listener)
+                    return
+
+        listener.sock.close()
+
+    def close(self):
+        '''close()
+        Stop the selector thread and close every listening socket.'''
+
+        with self.lock:
+            thread = self.thread
+        if thread:
+            self.change(None, None)
+            thread.join()
+
+        with self.lock:
+            listeners = [l for items in self.idle.values() for l in items]
+            self.idle = {}
+            self.thread = None
+
+        for listener in listeners:
+            listener.sock.close()
+        if self.selector:
+            self.selector.close()
+            self.waker.close()
+            self.wakee.close()
+            self.selector = None
+
+
+# One selector thread and one set of idle listeners for the whole process.
+default_listeners = ListenerManager()
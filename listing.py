@@ -0,0 +1,277 @@
+# CS472 - Homework #4
+# Edward Parrish
+# listing.py
+#
+# This module is the listing module of the FTP client. It contains the Entry
+# class for parsed directory entries, the parsers for MLSD facts and for Unix
+# and DOS style LIST output, and the ListingCache class which keeps recent
+# directory listings.
+
+from collections import OrderedDict
+import calendar
+import threading
+import time
+
+FILE = 'file'
+DIR = 'dir'
+LINK = 'link'
+
+LISTING_TTL = 30
+LISTING_CACHE_SIZE = 256
+
+MONTHS = {m: i for i, m in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+     'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+
+class Entry:
+    '''Entry
+    One parsed directory entry. mtime is in seconds since the epoch (UTC) and
+    size and mtime are None when the listing does not report them.'''
+
+    __slots__ = ('name', 'size', 'type', 'mtime')
+
+    def __init__(self, name, size=None, type=FILE, mtime=None):
+        self.name = name
+        self.size = size
+        self.type = type
+        self.mtime = mtime
+
+    def is_dir(self):
+        return self.type == DIR
+
+    def __repr__(self):
+        return f'Entry({self.name!r}, {self.size!r}, {self.type!r}, {self.mtime!r})'
+
+
+def parse_timeval(value):
+    '''parse_timeval(value) -> seconds since the epoch
+    Parse an RFC 3659 time value (YYYYMMDDHHMMSS[.sss], UTC). Return None if
+    the value is malformed.'''
+
+    try:
+        return calendar.timegm(time.strptime(value[:14], '%Y%m%d%H%M%S'))
+    except ValueError:
+        return None
+
+
+def parse_mlsd_line(line):
+    '''parse_mlsd_line(line) -> Entry
+    Parse one line of MLSD or MLST output: a list of fact=value; pairs, a
+    space and the name. Return None for the current and parent directory
+    entries and for malformed lines.'''
+
+    facts, sep, name = line.partition(' ')
+
+    # Test if line has no facts.
+    if not sep:
+        return None
+
+    entry = Entry(name)
+    for fact in facts.split(';'):
+        key, _, value = fact.partition('=')
+        key = key.lower()
+
+        if key == 'type':
+            value = value.lower()
+            # Skip the current and parent directory entries.
+            if value in ('cdir', 'pdir'):
+                return None
+            if value == 'dir':
+                entry.type = DIR
+            elif value.startswith('os.unix=slink') or value.startswith('os.unix=symlink'):
+                entry.type = LINK
+        elif key == 'size' or key == 'sizd':
+            try:
+                entry.size = int(value)
+            except ValueError:
+                pass
+        elif key == 'modify':
+            entry.mtime = parse_timeval(value)
+
+    return entry
+
+
+def parse_unix_line(line, now=None):
+    '''parse_unix_line(line, now=None) -> Entry
+    Parse one line of Unix style LIST output, for example
+    "-rw-r--r--   1 owner group   1234 Jan  1 12:00 name". Return None if
+    the line is not in this format.'''
+
+    parts = line.split(None, 8)
+
+    # Test if line has too few fields or is a "total" line.
+    if len(parts) < 9 or parts[0][:1] not in ('-', 'd', 'l'):
+        return None
+
+    perms, _, _, _, size, month, day, clock, name = parts
+
+    if perms[0] == 'd':
+        type = DIR
+    elif perms[0] == 'l':
+        type = LINK
+        name = name.split(' -> ', 1)[0]
+    else:
+        type = FILE
+
+    try:
+        size = int(size)
+    except ValueError:
+        size = None
+
+    return Entry(name, size, type, parse_unix_time(month, day, clock, now))
+
+
+def parse_unix_time(month, day, clock, now=None):
+    '''parse_unix_time(month, day, clock, now=None) -> seconds since the epoch
+    Parse the "Mon DD HH:MM" or "Mon DD YYYY" time of a Unix listing. A time
+    without a year is within the last year.'''
+
+    try:
+        mon = MONTHS[month[:3].lower()]
+        mday = int(day)
+        now = now if now is not None else time.time()
+
+        # Test if time has a clock instead of a year.
+        if ':' in clock:
+            hour, minute = (int(x) for x in clock.split(':'))
+            year = time.gmtime(now).tm_year
+            t = calendar.timegm((year, mon, mday, hour, minute, 0))
+
+            # A time in the future belongs to the previous year.
+            if t > now + 86400:
+                t = calendar.timegm((year - 1, mon, mday, hour, minute, 0))
+            return t
+
+        return calendar.timegm((int(clock), mon, mday, 0, 0, 0))
+    except (KeyError, ValueError):
+        return None
+
+
+def parse_dos_line(line):
+    '''parse_dos_line(line) -> Entry
+    Parse one line of DOS style LIST output, for example
+    "01-31-24  09:15PM       <DIR>          name". Return None if the line is
+    not in this format.'''
+
+    parts = line.split(None, 3)
+
+    # Test if line has too few fields.
+    if len(parts) < 4:
+        return None
+
+    date, clock, size, name = parts
+    try:
+        mon, mday, year = (int(x) for x in date.split('-'))
+        if year < 100:
+            year += 2000 if year < 70 else 1900
+
+        ampm = clock[-2:].upper()
+        hour, minute = (int(x) for x in clock[:-2].split(':'))
+        if ampm == 'PM' and hour < 12:
+            hour += 12
+        elif ampm == 'AM' and hour == 12:
+            hour = 0
+
+        mtime = calendar.timegm((year, mon, mday, hour, minute, 0))
+    except ValueError:
+        return None
+
+    # Test if entry is a directory.
+    if size.upper() == '<DIR>':
+        return Entry(name, None, DIR, mtime)
+
+    try:
+        return Entry(name, int(size), FILE, mtime)
+    except ValueError:
+        return None
+
+
+def parse_list_line(line, now=None):
+    '''parse_list_line(line, now=None) -> Entry
+    Parse one line of LIST output in either Unix or DOS style. Return None if
+    the line is in neither format.'''
+
+    # Test if line starts with a DOS date.
+    if line[:1].isdigit():
+        return parse_dos_line(line)
+
+    return parse_unix_line(line, now)
+
+
+def is_safe_name(name):
+    '''is_safe_name(name) -> bool
+    Test if a listed name is a plain entry of the listed directory: not
+    empty, . or .., and without a / or NUL that would let a server's name
+    lead a local copy of the tree outside its root.'''
+
+    return name not in ('', '.', '..') and '/' not in name and '\0' not in name
+
+
+def parse_listing(lines, parser):
+    '''parse_listing(lines, parser) -> list of Entry
+    Parse every line of a listing, skipping lines the parser rejects, the
+    . and .. entries and names that are not plain entry names.'''
+
+    entries = []
+    for line in lines:
+        entry = parser(line)
+        if entry and is_safe_name(entry.name):
+            entries.append(entry)
+
+    return entries
+
+
+class ListingCache:
+    '''ListingCache
+    A cache of directory listings keyed by remote path. Listings expire after
+    ttl seconds and the least recently used listing is evicted once the cache
+    holds max_size directories.'''
+
+    def __init__(self, ttl=LISTING_TTL, max_size=LISTING_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.listings = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        '''get(path) -> list of Entry
+        Return the cached listing of path, or None if it is missing or
+        expired.'''
+
+        with self.lock:
+            item = self.listings.get(path)
+
+            # Test if path is not cached.
+            if item is None:
+                return None
+
+            # Test if listing has expired.
+            if time.monotonic() - item[0] > self.ttl:
+                del self.listings[path]
+                return None
+
+            self.listings.move_to_end(path)
+            return item[1]
+
+    def put(self, path, entries):
+        '''put(path, entries)
+        Cache the listing of path.'''
+
+        with self.lock:
+            self.listings[path] = (time.monotonic(), entries)
+            self.listings.move_to_end(path)
+
+            # Evict the least recently used listings.
+            while len(self.listings) > self.max_size:
+                self.listings.popitem(last=False)
+
+    def invalidate(self, path=None):
+        '''invalidate(path=None)
+        Forget the listing of path, or every listing if no path is given.'''
+
+        with self.lock:
+            if path is None:
+                self.listings.clear()
+            else:
+                self.listings.pop(path, None)
@@ -2,39 +2,191 @@
 # Edward Parrish
 # logger.py
 #
-# This module is the logger module of the FTP Client. It contains the Logger
+# This module is the logger module of the FTP client. It contains the Logger
 # class which is used by the major module.
 
+import atexit
 import datetime
+import os
+import queue
+import threading
+import time
+
+MAX_BYTES = 10 << 20
+BACKUP_COUNT = 3
+FLUSH_INTERVAL = 1.0
+FLUSH_SIZE = 64 << 10
+BUFFER_SIZE = 256 << 10
+BATCH_SIZE = 1024
 
 
 class Logger:
     '''Logger
-    The Logger helper class. Used to write log messages to a log file.'''
-    
+    The Logger helper class. Used to write log messages to a log file.
+    Messages are queued and written by a background thread through one
+    buffered file handle, which is flushed once FLUSH_SIZE bytes are pending
+    or FLUSH_INTERVAL seconds have passed, and rotated once the file reaches
+    max_bytes. Transfer payloads are left out of the log unless
+    include_payload is set.'''
+
     LINE_SEP = '\n'
 
-    def __init__(self, filename):
+    def __init__(self, filename, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT,
+                 flush_interval=FLUSH_INTERVAL, include_payload=False):
         self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.include_payload = include_payload
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.file = None
+        self.second = None
+        self.prefix = ''
+
+    def timestamp(self, t=None):
+        '''timestamp(t=None) - > formatted timestamp
+        Return a formatted timestamp string of the given time, or of the
+        current time. The date and time part is only formatted once per
+        second.'''
+
+        t = time.time() if t is None else t
+        second = int(t)
 
-    def timestamp(self):
-        '''timestamp() - > formatted timestamp
-        Return a formatted timestamp string of the current datetime.'''
+        # Test if the formatted second can be reused.
+        if second != self.second:
+            self.prefix = datetime.datetime.fromtimestamp(second).strftime('%x %X')
+            self.second = second
 
-        return datetime.datetime.now().strftime('%x %X.%f')
+        return f'{self.prefix}.{int((t - second) * 1e6):06d}'
 
     def write(self, message):
         '''write(message)
-        Write a log message to log file.'''
-
-        line = f'{self.timestamp()} {message}{self.LINE_SEP}'
+        Queue a log message to be written to the log file.'''
 
         # Test if filename is defined.
-        if self.filename:
+        if not self.filename:
+            return
+
+        self.start()
+        self.queue.put((time.time(), message))
+
+    def start(self):
+        '''start()
+        Start the background writer thread if it is not running.'''
+
+        if self.thread:
+            return
+
+        with self.lock:
+            if self.thread:
+                return
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def run(self):
+        '''run()
+        The writer loop. Write queued messages in batches until the logger is
+        closed.'''
+
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
             try:
-                # Append the line to log file.
-                with open(self.filename, 'a') as f:
-                    f.write(line)
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = False
+
+            # Write every record that is already queued in one batch.
+            lines = []
+            closing = record is None
+            while record:
+                lines.append(f'{self.timestamp(record[0])} {record[1]}{self.LINE_SEP}')
+
+                # Test if batch is full.
+                if len(lines) >= BATCH_SIZE:
+                    break
+
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                closing = record is None
+
+            if lines:
+                pending += self.write_lines(lines)
+
+            # Test if buffered lines should be flushed.
+            if pending and (closing or pending >= FLUSH_SIZE
+                            or time.monotonic() - last_flush >= self.flush_interval):
+                self.flush_file()
+                pending = 0
+            if not pending:
+                last_flush = time.monotonic()
+
+            if closing:
+                break
+
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def write_lines(self, lines):
+        '''write_lines(lines) -> number of characters written
+        Write lines to the log file, rotating it first if it is full.'''
+
+        try:
+            # Test if log file is not open.
+            if not self.file:
+                self.file = open(self.filename, 'a', buffering=BUFFER_SIZE)
+
+            # Test if log file has reached its size limit.
+            if self.max_bytes and self.file.tell() >= self.max_bytes:
+                self.rotate()
+
+            data = ''.join(lines)
+            self.file.write(data)
+            return len(data)
+        except OSError:
+            return 0
+
+    def flush_file(self):
+        try:
+            if self.file:
+                self.file.flush()
+        except OSError:
+            pass
+
+    def rotate(self):
+        '''rotate()
+        Rename the log file to filename.1, shifting older logs up to
+        backup_count, and open a new log file.'''
+
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f'{self.filename}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.filename}.{i + 1}')
+
+        if self.backup_count:
+            os.replace(self.filename, f'{self.filename}.1')
+        else:
+            os.remove(self.filename)
+
+        self.file = open(self.filename, 'a', buffering=BUFFER_SIZE)
+
+    def close(self):
+        '''close()
+        Write every queued message, flush the log file and stop the writer
+        thread.'''
+
+        with self.lock:
+            thread = self.thread
+            self.thread = None
 
-            except:
-                pass
+        if thread:
+            self.queue.put(None)
+            thread.join()
@@ -0,0 +1,265 @@
+# CS472 - Homework #4
+# Edward Parrish
+# metrics.py
+#
+# This module is the metrics module of the FTP client. It contains the
+# Metrics class which collects transfer and control channel measurements and
+# exports them as a summary, as JSON or in the Prometheus text format.
+
+import json
+import threading
+
+GET = 'get'
+PUT = 'put'
+
+
+class Stat:
+    '''Stat
+    A running count, total and maximum of one measurement.'''
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.total, 'max': self.max}
+
+
+class TransferStat:
+    '''TransferStat
+    The totals of the transfers in one direction to one server.'''
+
+    __slots__ = ('count', 'bytes', 'seconds', 'ttfb')
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.ttfb = Stat()
+
+    def throughput(self):
+        '''throughput() -> bytes per second'''
+
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {'count': self.count, 'bytes': self.bytes,
+                'seconds': self.seconds, 'throughput': self.throughput(),
+                'ttfb': self.ttfb.to_dict()}
+
+
+class Metrics:
+    '''Metrics
+    A thread-safe collection of client measurements: bytes, duration and
+    time to first byte of every transfer, the round trip time of every
+    control command, the setup latency of data connections by mode and the
+    number of retries by reason. Callbacks added with add_callback are called
+    with the name and fields of every event as it is recorded.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.reset()
+
+    def reset(self):
+        '''reset()
+        Forget every measurement.'''
+
+        with self.lock:
+            self.transfers = {}
+            self.commands = {}
+            self.data_setup = {}
+            self.retries = {}
+
+    def add_callback(self, callback):
+        '''add_callback(callback)
+        Call callback(event, fields) for every recorded event.'''
+
+        self.callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self.callbacks.remove(callback)
+
+    def emit(self, event, **fields):
+        for callback in self.callbacks:
+            callback(event, fields)
+
+    def transfer(self, server, direction, nbytes, seconds, ttfb=None):
+        '''transfer(server, direction, nbytes, seconds, ttfb=None)
+        Record a completed transfer.'''
+
+        with self.lock:
+            stat = self.transfers.get((server, direction))
+            if stat is None:
+                stat = self.transfers[(server, direction)] = TransferStat()
+            stat.count += 1
+            stat.bytes += nbytes
+            stat.seconds += seconds
+            if ttfb is not None:
+                stat.ttfb.add(ttfb)
+
+        if self.callbacks:
+            self.emit('transfer', server=server, direction=direction,
+                      bytes=nbytes, seconds=seconds, ttfb=ttfb)
+
+    def command(self, server, command, rtt):
+        '''command(server, command, rtt)
+        Record the round trip time of a control command.'''
+
+        self.add_stat(self.commands, (server, command), rtt)
+
+        if self.callbacks:
+            self.emit('command', server=server, command=command, rtt=rtt)
+
+    def data_conn(self, server, mode, seconds):
+        '''data_conn(server, mode, seconds)
+        Record the setup latency of a data connection.'''
+
+        self.add_stat(self.data_setup, (server, mode), seconds)
+
+        if self.callbacks:
+            self.emit('data_conn', server=server, mode=mode, seconds=seconds)
+
+    def retry(self, server, reason):
+        '''retry(server, reason)
+        Record a retried operation.'''
+
+        with self.lock:
+            key = (server, reason)
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+        if self.callbacks:
+            self.emit('retry', server=server, reason=reason)
+
+    def add_stat(self, stats, key, value):
+        with self.lock:
+            stat = stats.get(key)
+            if stat is None:
+                stat = stats[key] = Stat()
+            stat.add(value)
+
+    def snapshot(self):
+        '''snapshot() -> dict
+        Return a copy of every measurement.'''
+
+        with self.lock:
+            return {
+                'transfers': [dict(server=s, direction=d, **t.to_dict())
+                              for (s, d), t in self.transfers.items()],
+                'commands': [dict(server=s, command=c, **t.to_dict())
+                             for (s, c), t in self.commands.items()],
+                'data_setup': [dict(server=s, mode=m, **t.to_dict())
+                               for (s, m), t in self.data_setup.items()],
+                'retries': [{'server': s, 'reason': r, 'count': n}
+                            for (s, r), n in self.retries.items()],
+            }
+
+    def to_json(self):
+        '''to_json() -> JSON text'''
+
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        '''to_prometheus() -> Prometheus text exposition'''
+
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(
+                    f'{k}="{escape_label(v)}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}')
+
+        def labels(item, *names):
+            return {n: item[n] for n in names}
+
+        t = snap['transfers']
+        metric('ftp_transfers_total', 'counter', 'Completed transfers.',
+               [(labels(x, 'server', 'direction'), x['count']) for x in t])
+        metric('ftp_transfer_bytes_total', 'counter', 'Bytes transferred.',
+               [(labels(x, 'server', 'direction'), x['bytes']) for x in t])
+        metric('ftp_transfer_seconds_total', 'counter', 'Time spent transferring.',
+               [(labels(x, 'server', 'direction'), x['seconds']) for x in t])
+        metric('ftp_transfer_ttfb_seconds_sum', 'counter', 'Total time to first byte.',
+               [(labels(x, 'server', 'direction'), x['ttfb']['sum']) for x in t])
+        metric('ftp_transfer_ttfb_seconds_count', 'counter', 'Transfers timed to first byte.',
+               [(labels(x, 'server', 'direction'), x['ttfb']['count']) for x in t])
+
+        c = snap['commands']
+        metric('ftp_command_rtt_seconds_sum', 'counter', 'Total control command round trip time.',
+               [(labels(x, 'server', 'command'), x['sum']) for x in c])
+        metric('ftp_command_rtt_seconds_count', 'counter', 'Control commands timed.',
+               [(labels(x, 'server', 'command'), x['count']) for x in c])
+        metric('ftp_command_rtt_seconds_max', 'gauge', 'Slowest control command round trip.',
+               [(labels(x, 'server', 'command'), x['max']) for x in c])
+
+        d = snap['data_setup']
+        metric('ftp_data_setup_seconds_sum', 'counter', 'Total data connection setup time.',
+               [(labels(x, 'server', 'mode'), x['sum']) for x in d])
+        metric('ftp_data_setup_seconds_count', 'counter', 'Data connections opened.',
+               [(labels(x, 'server', 'mode'), x['count']) for x in d])
+
+        metric('ftp_retries_total', 'counter', 'Retried operations.',
+               [(labels(x, 'server', 'reason'), x['count']) for x in snap['retries']])
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        '''summary() -> summary text
+        Return a human readable summary of every measurement.'''
+
+        snap = self.snapshot()
+        lines = []
+        for x in snap['transfers']:
+            lines.append(
+                f'{x["direction"]} {x["server"]}: {x["count"]} transfers, '
+                f'{x["bytes"]} bytes, {x["throughput"] / 1e6:.2f} MB/s, '
+                f'ttfb {mean(x["ttfb"]) * 1e3:.1f} ms')
+        for x in snap['commands']:
+            lines.append(
+                f'{x["command"]} {x["server"]}: {x["count"]} sent, '
+                f'rtt {mean(x) * 1e3:.1f} ms avg, {x["max"] * 1e3:.1f} ms max')
+        for x in snap['data_setup']:
+            lines.append(
+                f'{x["mode"]} {x["server"]}: {x["count"]} data connections, '
+                f'setup {mean(x) * 1e3:.1f} ms avg')
+        for x in snap['retries']:
+            lines.append(f'retry {x["reason"]} {x["server"]}: {x["count"]}')
+
+        return '\n'.join(lines) if lines else 'No measurements.'
+
+
+def record_retry(client, reason):
+    '''record_retry(client, reason)
+    Record a retry on the metrics of a client, if it keeps any.'''
+
+    metrics = getattr(client, 'metrics', None)
+    if metrics:
+        metrics.retry(f'{client.host}:{client.port}', reason)
+
+
+def mean(stat):
+    return stat['sum'] / stat['count'] if stat['count'] else 0.0
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# The stats command reports every session, so all clients record here.
+default_metrics = Metrics()
@@ -0,0 +1,218 @@
+# CS472 - Homework #4
+# Edward Parrish
+# mirror.py
+#
+# This module is the mirror module of the FTP client. It contains the Mirror
+# class which incrementally synchronizes a local directory tree with a remote
+# one, transferring only new or changed files.
+
+from listing import LINK
+import json
+import os
+import posixpath
+
+INDEX_NAME = '.ftpmirror.json'
+
+
+class MirrorResult:
+    '''MirrorResult
+    The outcome of one mirror run.'''
+
+    def __init__(self):
+        self.transferred = []
+        self.skipped = 0
+        self.deleted = []
+        self.errors = []
+
+    def __str__(self):
+        return (f'{len(self.transferred)} transferred, {self.skipped} unchanged, '
+                f'{len(self.deleted)} deleted, {len(self.errors)} errors.')
+
+
+class MirrorIndex:
+    '''MirrorIndex
+    The local record of the remote size and modification time of every file
+    as of the last successful mirror run. A file whose remote facts still
+    match its record, and whose local copy is still in place, is unchanged
+    without any further checks.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.files = self.load()
+
+    def load(self):
+        '''load() -> dict of relative path to (size, mtime)
+        Read the index from disk. A missing or damaged index is empty.'''
+
+        try:
+            with open(self.path, mode='r') as f:
+                return {k: tuple(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def save(self):
+        '''save()
+        Write the index to disk atomically.'''
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, mode='w') as f:
+            json.dump(self.files, f)
+        os.replace(tmp_path, self.path)
+
+
+class Mirror:
+    '''Mirror
+    Mirror a remote directory tree into a local directory. The remote tree
+    is walked with parsed listings, compared by size and modification time
+    with the local tree and the index of the last run, and new or changed
+    files are downloaded over a bounded pool of parallel sessions. Local
+    files that no longer exist remotely are deleted if delete is set.'''
+
+    def __init__(self, client, remote_root, local_root, workers=None,
+                 delete=False, index_path=None):
+        self.client = client
+        self.remote_root = client.resolve(remote_root)
+        self.local_root = local_root
+        self.workers = workers
+        self.delete = delete
+        self.index = MirrorIndex(index_path or os.path.join(local_root, INDEX_NAME))
+
+    def scan(self):
+        '''scan() -> dict of relative path to (size, mtime)
+        Walk the remote tree and return the facts of every file. Times that
+        the listing does not report are requested with one pipelined batch of
+        MDTM commands.'''
+
+        files = {}
+        for dirpath, _, entries in self.client.walk(self.remote_root):
+            rel_dir = posixpath.relpath(dirpath, self.remote_root)
+            for entry in entries:
+                # Links are not followed.
+                if entry.type == LINK:
+                    continue
+                rel = posixpath.normpath(posixpath.join(rel_dir, entry.name))
+                files[rel] = (entry.size, entry.mtime)
+
+        # Test if any modification times are missing.
+        missing = [rel for rel, (_, mtime) in files.items() if mtime is None]
+        if missing:
+            paths = [posixpath.join(self.remote_root, rel) for rel in missing]
+            mtimes = self.client.mdtms(paths)
+            for rel, path in zip(missing, paths):
+                files[rel] = (files[rel][0], mtimes.get(path))
+
+        return files
+
+    def local_path(self, rel):
+        '''local_path(rel) -> local path
+        Return the local path of a remote file given relative to the root of
+        the tree. Raise ValueError if the path, once links are resolved, lies
+        outside the local root.'''
+
+        path = os.path.join(self.local_root, *rel.split('/'))
+        root = os.path.realpath(self.local_root)
+
+        # Test if path escapes the local root.
+        if os.path.commonpath([root, os.path.realpath(path)]) != root:
+            raise ValueError(f'"{rel}" is outside the mirror root.')
+
+        return path
+
+    def is_unchanged(self, rel, facts):
+        '''is_unchanged(rel, facts) -> bool
+        Test if the local copy of a remote file is up to date.'''
+
+        size, mtime = facts
+        try:
+            st = os.stat(self.local_path(rel))
+        except OSError:
+            return False
+
+        # Test if local size differs from remote size.
+        if size is not None and st.st_size != size:
+            return False
+
+        # Test if index records the same remote facts.
+        if self.index.files.get(rel) == (size, mtime):
+            return True
+
+        # Without a record, the local time must match the remote time.
+        return mtime is not None and int(st.st_mtime) == mtime
+
+    def run(self):
+        '''run() -> MirrorResult
+        Perform one mirror run.'''
+
+        result = MirrorResult()
+        remote = self.scan()
+
+        pairs = []
+        for rel, facts in sorted(remote.items()):
+            try:
+                local_path = self.local_path(rel)
+            except ValueError as err:
+                result.errors.append((rel, str(err)))
+                continue
+
+            # Test if file can be skipped.
+            if self.is_unchanged(rel, facts):
+                result.skipped += 1
+                continue
+
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            pairs.append((posixpath.join(self.remote_root, rel), local_path))
+
+        # Download the new and changed files over the session pool.
+        completed = []
+        if pairs:
+            for stats in self.client.get_many(pairs, self.workers):
+                completed.extend(stats.completed)
+                result.errors.extend(stats.errors)
+
+        for remote_path, local_path in completed:
+            rel = posixpath.relpath(remote_path, self.remote_root)
+            size, mtime = remote[rel]
+
+            # Keep the remote modification time so later runs can compare.
+            if mtime is not None:
+                os.utime(local_path, (mtime, mtime))
+            self.index.files[rel] = (size, mtime)
+            result.transferred.append(rel)
+
+        # Test if extraneous local files are deleted.
+        if self.delete:
+            result.deleted = self.delete_extraneous(remote)
+
+        # Forget files that no longer exist remotely.
+        for rel in list(self.index.files):
+            if rel not in remote:
+                del self.index.files[rel]
+
+        self.index.save()
+        return result
+
+    def delete_extraneous(self, remote):
+        '''delete_extraneous(remote) -> list of deleted relative paths
+        Delete local files, and then empty directories, that do not exist in
+        the remote tree.'''
+
+        deleted = []
+        index_path = os.path.abspath(self.index.path)
+        for dirpath, dirnames, filenames in os.walk(self.local_root, topdown=False):
+            rel_dir = os.path.relpath(dirpath, self.local_root).replace(os.sep, '/')
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                rel = posixpath.normpath(posixpath.join(rel_dir, name))
+
+                # Test if file is the index or exists remotely.
+                if os.path.abspath(path) in (index_path, f'{index_path}.tmp') or rel in remote:
+                    continue
+
+                os.remove(path)
+                deleted.append(rel)
+
+            # Remove the directory if nothing is left in it.
+            if dirpath != self.local_root and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+
+        return deleted
@@ -0,0 +1,144 @@
+# CS472 - Homework #4
+# Edward Parrish
+# parallel.py
+#
+# This module is the parallel transfer module of the FTP client. It contains
+# the ParallelTransfer class which moves many files at once over a pool of
+# logged-in control connections.
+
+from exceptions import Error
+from metrics import record_retry
+from queue import Queue, Empty
+import threading
+import time
+
+DEFAULT_WORKERS = 4
+
+
+class WorkerStats:
+    '''WorkerStats
+    The transfer statistics of one worker session.'''
+
+    def __init__(self, name):
+        self.name = name
+        self.files = 0
+        self.bytes = 0
+        self.completed = []
+        self.errors = []
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return (f'{self.name}: {self.files} files, {self.bytes} bytes, '
+                f'{len(self.errors)} errors in {self.elapsed:.2f}s')
+
+
+class ParallelTransfer:
+    '''ParallelTransfer
+    Run file transfers concurrently across a pool of sessions. Jobs are taken
+    from a shared work queue, so a worker that draws small files simply takes
+    more of them. Each worker opens its own session from session_factory,
+    which must return a logged-in Client, and each transfer uses that
+    session's own DataConnection. When a worker is done its session is given
+    to release, or closed if no release is given.'''
+
+    def __init__(self, session_factory, workers=DEFAULT_WORKERS, release=None):
+        self.session_factory = session_factory
+        self.workers = max(1, int(workers))
+        self.release = release
+
+    def get(self, pairs):
+        '''get(pairs) -> list of WorkerStats
+        Download every (remote path, local path) pair.'''
+
+        return self.run(pairs, lambda client, job: client.download(*job))
+
+    def put(self, pairs):
+        '''put(pairs) -> list of WorkerStats
+        Upload every (local path, remote path) pair.'''
+
+        return self.run(pairs, lambda client, job: client.upload(*job))
+
+    def run(self, jobs, operation):
+        '''run(jobs, operation) -> list of WorkerStats
+        Call operation(client, job) for every job across the worker pool and
+        wait for the queue to drain.'''
+
+        queue = Queue()
+        for job in jobs:
+            queue.put(job)
+
+        # Never open more sessions than there are jobs.
+        num_workers = min(self.workers, len(jobs))
+        stats = [WorkerStats(f'worker-{i}') for i in range(num_workers)]
+        threads = [threading.Thread(target=self.work, args=(s, queue, operation))
+                   for s in stats]
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        return stats
+
+    def work(self, stats, queue, operation):
+        '''work(stats, queue, operation)
+        The worker loop. Open a session and transfer jobs until the queue is
+        empty.'''
+
+        start = time.monotonic()
+        try:
+            client = self.session_factory()
+        except (Error, OSError) as err:
+            stats.errors.append((None, err))
+            return
+
+        try:
+            while True:
+                # Get the next job or stop when none are left.
+                try:
+                    job = queue.get_nowait()
+                except Empty:
+                    break
+
+                try:
+                    nbytes = operation(client, job)
+                except (Error, OSError) as err:
+                    stats.errors.append((job, err))
+
+                    # The session may be out of step with the server, so it is
+                    # replaced rather than reused.
+                    client.close()
+                    record_retry(client, 'session')
+                    try:
+                        client = self.session_factory()
+                    except (Error, OSError) as err:
+                        stats.errors.append((None, err))
+                        client = None
+                        break
+                    continue
+
+                # Test if server refused to start the transfer.
+                if nbytes is None:
+                    stats.errors.append((job, 'Transfer was not started.'))
+                else:
+                    stats.files += 1
+                    stats.bytes += nbytes
+                    stats.completed.append(job)
+        finally:
+            if client is None:
+                pass
+            elif self.release:
+                self.release(client)
+            else:
+                client.close()
+            stats.elapsed = time.monotonic() - start
+
+
+def summarize(stats):
+    '''summarize(stats) -> (files, bytes, errors)
+    Total the statistics of all workers.'''
+
+    files = sum(s.files for s in stats)
+    nbytes = sum(s.bytes for s in stats)
+    errors = sum(len(s.errors) for s in stats)
+    return files, nbytes, errors
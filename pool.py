@@ -0,0 +1,174 @@
+# CS472 - Homework #4
+# Edward Parrish
+# pool.py
+#
+# This module is the session pool module of the FTP client. It contains the
+# ClientPool class which keeps warm, logged-in control connections so that
+# they can be reused instead of connecting and logging in again.
+
+from exceptions import Error
+from metrics import record_retry
+from contextlib import contextmanager
+import threading
+import time
+
+DEFAULT_POOL_SIZE = 4
+KEEPALIVE_INTERVAL = 60
+
+
+class ClientPool:
+    '''ClientPool
+    A pool of logged-in sessions per (host, port, username). Idle sessions are
+    kept alive with NOOP, and a session that the server has timed out (421)
+    or closed is replaced by logging in again, so callers never see a dead
+    session from checkout. New sessions are logged in by the open_session
+    method of client_class.'''
+
+    def __init__(self, client_class, size=DEFAULT_POOL_SIZE,
+                 keepalive=KEEPALIVE_INTERVAL):
+        self.client_class = client_class
+        self.size = size
+        self.keepalive = keepalive
+        self.idle = {}
+        self.passwords = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def checkout(self, host, port, username, password=None, origin=None):
+        '''checkout(host, port, username, password=None, origin=None) -> Client
+        Return a logged-in session, reusing a warm one when possible. The
+        password is remembered so that dropped sessions can log in again. A
+        new session resolves, connects and tunes its sockets like origin, if
+        given.'''
+
+        key = (host, port, username)
+        with self.lock:
+            if password is not None:
+                self.passwords[key] = password
+            password = self.passwords.get(key)
+
+        dead = None
+        while True:
+            with self.lock:
+                sessions = self.idle.get(key)
+                # Test if no warm session is left.
+                if not sessions:
+                    break
+                client, last_used = sessions.pop()
+
+            # Sessions idle for a while are checked before they are reused.
+            if time.monotonic() - last_used < self.keepalive or client.noop():
+                return client
+
+            self.discard(client)
+            dead = client
+
+        client = self.client_class.open_session(
+            host, port, username, password, origin)
+
+        # Test if a dead session was replaced by logging in again.
+        if dead:
+            record_retry(client, 'relogin')
+
+        return client
+
+    def checkin(self, client):
+        '''checkin(client)
+        Return a session to the pool. Sessions that are closed or timed out,
+        or that do not fit in the pool, are closed.'''
+
+        # Test if session can no longer be used.
+        if not client.conn or client.timed_out or not client.logged_in:
+            self.discard(client)
+            return
+
+        key = (client.host, client.port, client.username)
+        with self.lock:
+            sessions = self.idle.setdefault(key, [])
+            if len(sessions) < self.size:
+                sessions.append((client, time.monotonic()))
+                return
+
+        client.close()
+
+    def discard(self, client):
+        '''discard(client)
+        Close a session without returning it to the pool.'''
+
+        try:
+            client.close()
+        except (Error, OSError):
+            pass
+
+    @contextmanager
+    def session(self, host, port, username, password=None):
+        '''session(host, port, username, password=None)
+        Check out a session for the duration of a with block.'''
+
+        client = self.checkout(host, port, username, password)
+        try:
+            yield client
+        except BaseException:
+            # A session that failed part way may be out of step.
+            self.discard(client)
+            raise
+        else:
+            self.checkin(client)
+
+    def ping(self):
+        '''ping()
+        Send NOOP on every session that has been idle for the keepalive
+        interval and drop the sessions that no longer answer.'''
+
+        now = time.monotonic()
+        with self.lock:
+            stale = []
+            for sessions in self.idle.values():
+                for item in list(sessions):
+                    if now - item[1] >= self.keepalive:
+                        sessions.remove(item)
+                        stale.append(item[0])
+
+        for client in stale:
+            # Test if session is still alive.
+            if client.noop():
+                self.checkin(client)
+            else:
+                self.discard(client)
+
+    def start(self):
+        '''start()
+        Start a background thread that keeps idle sessions alive.'''
+
+        if self.thread:
+            return
+
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.keepalive / 2):
+            self.ping()
+
+    def stop(self):
+        '''stop()
+        Stop the keepalive thread.'''
+
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        '''close()
+        Stop the keepalive thread and close every idle session.'''
+
+        self.stop()
+        with self.lock:
+            sessions = [c for items in self.idle.values() for c, _ in items]
+            self.idle = {}
+
+        for client in sessions:
+            self.discard(client)
@@ -0,0 +1,192 @@
+# CS472 - Homework #4
+# Edward Parrish
+# progress.py
+#
+# This module is the progress module of the FTP client. It contains the
+# Progress class which tracks a running transfer and reports it to a callback,
+# and the ProgressBar class which draws those reports on the terminal.
+
+import sys
+import threading
+import time
+
+REPORT_INTERVAL = 0.5
+RATE_SMOOTHING = 0.3
+BAR_WIDTH = 24
+
+UNITS = ['B', 'KB', 'MB', 'GB', 'TB']
+
+
+class Progress:
+    '''Progress
+    The progress of one transfer. The transfer loop only adds the size of
+    each chunk with update, so the transfer is never slowed by reporting.
+    Once started, a background thread calls callback(progress, final) every
+    interval seconds, and keeps reporting while no data arrives so that a
+    stalled transfer can be told apart from a slow one.'''
+
+    def __init__(self, name, total=None, callback=None, done=0,
+                 interval=REPORT_INTERVAL):
+        self.name = name
+        self.total = total
+        self.callback = callback
+        self.interval = interval
+        self.done = done
+        self.initial = done
+        self.rate = 0.0
+        self.started = None
+        self.last_time = None
+        self.last_done = done
+        self.changed_at = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        '''start() -> Progress
+        Start timing the transfer and reporting it.'''
+
+        self.started = self.last_time = self.changed_at = time.monotonic()
+        if self.callback:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+        return self
+
+    def update(self, nbytes):
+        '''update(nbytes)
+        Add the size of a transferred chunk.'''
+
+        self.done += nbytes
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def report(self, final=False):
+        '''report(final=False)
+        Update the current rate and pass the progress to the callback.'''
+
+        now = time.monotonic()
+        elapsed = now - self.last_time
+        if self.done != self.last_done:
+            self.changed_at = now
+        if elapsed > 0:
+            rate = (self.done - self.last_done) / elapsed
+
+            # Smooth the current rate so one slow interval does not swing it.
+            if self.last_done == self.initial:
+                self.rate = rate
+            else:
+                self.rate += RATE_SMOOTHING * (rate - self.rate)
+            self.last_time = now
+            self.last_done = self.done
+
+        self.callback(self, final)
+
+    def finish(self):
+        '''finish()
+        Stop reporting and send the final report.'''
+
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+            self.report(final=True)
+
+    def stalled(self):
+        '''stalled() -> seconds since data last arrived
+        Return 0 unless no data arrived during the last report interval.'''
+
+        idle = time.monotonic() - self.changed_at if self.changed_at else 0.0
+        return idle if idle >= self.interval else 0.0
+
+    def elapsed(self):
+        return time.monotonic() - self.started if self.started else 0.0
+
+    def average_rate(self):
+        '''average_rate() -> bytes per second since the transfer started'''
+
+        elapsed = self.elapsed()
+        return (self.done - self.initial) / elapsed if elapsed else 0.0
+
+    def eta(self):
+        '''eta() -> seconds left
+        Estimate the time left from the current rate. Return None if the
+        total size is unknown or nothing is arriving.'''
+
+        if self.total is None or self.rate <= 0:
+            return None
+
+        return max(0, self.total - self.done) / self.rate
+
+
+class ProgressBar:
+    '''ProgressBar
+    A progress callback that draws one updating line on the terminal with
+    the bytes done, the current and average rate and the time left. Only the
+    sizes of the transfer are shown, never its content.'''
+
+    def __init__(self, stream=None, width=BAR_WIDTH):
+        self.stream = stream or sys.stderr
+        self.width = width
+
+    def __call__(self, progress, final=False):
+        self.stream.write(f'\r{self.render(progress, final)}\x1b[K')
+        if final:
+            self.stream.write('\n')
+        self.stream.flush()
+
+    def render(self, progress, final=False):
+        '''render(progress, final=False) -> progress line'''
+
+        done = format_bytes(progress.done)
+        average = f'{format_bytes(progress.average_rate())}/s'
+
+        # Test if total size is unknown.
+        if not progress.total:
+            line = f'{progress.name} {done}'
+        else:
+            fraction = min(1.0, progress.done / progress.total)
+            filled = int(fraction * self.width)
+            bar = '=' * filled + ' ' * (self.width - filled)
+            line = (f'{progress.name} [{bar}] {fraction:4.0%} '
+                    f'{done} of {format_bytes(progress.total)}')
+
+        if final:
+            return f'{line} in {format_duration(progress.elapsed())} ({average})'
+
+        # Test if no data arrived during the last interval.
+        stalled = progress.stalled()
+        if stalled:
+            return f'{line} stalled for {format_duration(stalled)} ({average} avg)'
+
+        eta = progress.eta()
+        line = f'{line} {format_bytes(progress.rate)}/s ({average} avg)'
+        return f'{line} ETA {format_duration(eta)}' if eta is not None else line
+
+
+def format_bytes(n):
+    '''format_bytes(n) -> size text
+    Format a number of bytes with a binary unit, for example "1.5 MB".'''
+
+    n = float(n)
+    for unit in UNITS:
+        if n < 1024 or unit == UNITS[-1]:
+            break
+        n /= 1024
+
+    return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+
+
+def format_duration(seconds):
+    '''format_duration(seconds) -> duration text
+    Format a number of seconds as M:SS or H:MM:SS.'''
+
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+
+    if hours:
+        return f'{hours}:{minutes:02d}:{seconds:02d}'
+
+    return f'{minutes}:{seconds:02d}'
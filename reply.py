@@ -0,0 +1,296 @@
+# CS472 - Homework #4
+# Edward Parrish
+# reply.py
+#
+# This module is the reply module of the FTP client. It contains the
+# ServerResponse class and the ReplyReader class which turns the raw bytes of
+# the control connection into complete server replies.
+
+from collections import deque
+from exceptions import ServerReplyError
+import calendar
+import re
+import time
+
+DEFAULT_ENCODING = 'ISO-8859-1'
+NUM_DIGITS = 3
+
+MAX_LINE_LENGTH = 64 << 10
+MAX_PORT = 65535
+
+FILE_STATUS = 213
+
+# A reply line: a 3-digit code followed by a space, a hyphen or nothing.
+REPLY_LINE = re.compile(r'(\d{3})([ -]?)')
+
+# The h1,h2,h3,h4,p1,p2 address of a PASV reply. Some servers leave out the
+# parentheses, so the address is searched for anywhere in the message.
+PASV_ADDRESS = re.compile(
+    r'(\d{1,3}),(\d{1,3}),(\d{1,3}),(\d{1,3}),(\d{1,3}),(\d{1,3})')
+
+# The (<d><d><d>port<d>) of an EPSV reply, where <d> is any printable
+# delimiter used the same way four times (RFC 2428).
+EPSV_PORT = re.compile(r'\(([!-~])\1\1(\d{1,5})\1\)')
+
+
+def decode(data, encoding='utf-8'):
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError:
+        return data.decode(DEFAULT_ENCODING)
+
+
+class ServerResponse:
+
+    def __init__(self, code, message, lines=None):
+        self.code = code
+        self.message = message
+        self.lines = lines or [f'{code} {message}']
+
+    def __str__(self):
+        # Test if response is a multi-line reply.
+        if len(self.lines) > 1:
+            return '\n'.join(self.lines)
+
+        return f'{self.code} {self.message}'
+
+    def is_multiline(self):
+        return len(self.lines) > 1
+
+
+def parse_reply_code(line):
+    '''parse_reply_code(line) -> (code, separator)
+    Parse the 3-digit reply code and the character that follows it from a
+    reply line. Raise ServerReplyError if the line does not start with a
+    3-digit reply code.'''
+
+    match = REPLY_LINE.match(line)
+
+    # Test if line doesn't start with 3-digit reply code.
+    if not match:
+        raise ServerReplyError(
+            line, 'Server response does not start with a 3-digit reply code.')
+
+    code_str, sep = match.groups()
+
+    # Test if reply code is followed by something other than space or hyphen.
+    if not sep and len(line) > NUM_DIGITS:
+        raise ServerReplyError(
+            line, 'Server reply code is not followed by a space or hyphen.')
+
+    return int(code_str), sep
+
+
+def build_response(lines):
+    '''build_response(lines) -> ServerResponse
+    Build a ServerResponse from the lines of one complete reply. The message
+    of a multi-line reply holds the text of every line.'''
+
+    code, _ = parse_reply_code(lines[0])
+    text = [lines[0][(NUM_DIGITS+1):]]
+
+    # Test if reply is a multi-line reply.
+    if len(lines) > 1:
+        text.extend(lines[1:-1])
+        text.append(lines[-1][(NUM_DIGITS+1):])
+
+    return ServerResponse(code, '\n'.join(text), lines)
+
+
+def parse_server_response(response):
+    '''parse_server_response(response) -> ServerResponse
+    Parse a complete server reply, single or multi-line, given as bytes or
+    text.'''
+
+    # Test if response has not been decoded.
+    if isinstance(response, bytes):
+        response = decode(response)
+
+    lines = response.strip().splitlines()
+
+    # Test if response is empty.
+    if not lines:
+        raise ServerReplyError(response, 'Server response is empty.')
+
+    # Test if first line is malformed.
+    parse_reply_code(lines[0])
+
+    return build_response(lines)
+
+
+def parse_size(response):
+    '''parse_size(response) -> file size
+    Parse the file size from a reply to the SIZE command. Return None if the
+    reply does not report a size.'''
+
+    # Test if server did not report a file size.
+    if not response or response.code != FILE_STATUS:
+        return None
+
+    try:
+        return int(response.message.split()[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def parse_mdtm(response):
+    '''parse_mdtm(response) -> seconds since the epoch
+    Parse the modification time from a reply to the MDTM command. The server
+    reports the time in UTC as YYYYMMDDHHMMSS with optional fractional
+    seconds. Return None if the reply does not report a time.'''
+
+    # Test if server did not report a modification time.
+    if not response or response.code != FILE_STATUS:
+        return None
+
+    try:
+        value = response.message.split()[0]
+        t = time.strptime(value[:14], '%Y%m%d%H%M%S')
+        return calendar.timegm(t)
+    except (IndexError, ValueError):
+        return None
+
+
+def is_transfer_started(response):
+    '''is_transfer_started(response) -> bool
+    Test if a reply to a transfer command says the data transfer is about to
+    start: a 1yz preliminary reply such as 125 or 150. Only the code counts,
+    since the text of an error reply may hold "150" too.'''
+
+    return response.code // 100 == 1
+
+
+def parse_pasv_response(response):
+    '''parse_pasv_response(response) -> (host, port)
+    Parse the host and port from the message of a reply to the PASV
+    command. Raise ServerReplyError if the message holds no valid address.'''
+
+    match = PASV_ADDRESS.search(response)
+
+    # Test if message holds no h1,h2,h3,h4,p1,p2 address.
+    if not match:
+        raise ServerReplyError(response, 'PASV reply holds no address.')
+
+    groups = match.groups()
+    h1, h2, h3, h4, p1, p2 = map(int, groups)
+
+    # Test if a number is out of the range of one byte.
+    if max(h1, h2, h3, h4, p1, p2) > 255:
+        raise ServerReplyError(response, 'PASV reply holds an invalid address.')
+
+    host = '.'.join(groups[:4])
+    port = (p1 * 256) + p2
+
+    return host, port
+
+
+def parse_epsv_response(response):
+    '''parse_epsv_response(response) -> port
+    Parse the port from the message of a reply to the EPSV command. Raise
+    ServerReplyError if the message holds no valid port.'''
+
+    match = EPSV_PORT.search(response)
+
+    # Test if message holds no (|||port|) field.
+    if not match:
+        raise ServerReplyError(response, 'EPSV reply holds no port.')
+
+    port = int(match.group(2))
+
+    # Test if port is out of range.
+    if not 0 < port <= MAX_PORT:
+        raise ServerReplyError(response, 'EPSV reply holds an invalid port.')
+
+    return port
+
+
+def convert_port_to_p1p2(port):
+    '''convert_port_to_p1p2(port) -> (p1, p2)
+    Convert a given port number into p1 and p2.'''
+
+    p1 = int(port) // 256
+    p2 = int(port) - (p1 * 256)
+    return p1, p2
+
+
+def convert_p1p2_to_port(p1, p2):
+    '''convert_p1p2_to_port(p1, p2) -> port
+    Convert a given p1 and p2 into a port number.'''
+
+    return (int(p1) * 256) + int(p2)
+
+
+class ReplyReader:
+    '''ReplyReader
+    A buffered, line-oriented reader for the control connection. Bytes are
+    fed in as they are received and complete replies are queued following the
+    multi-line rules of RFC 959: a reply that starts with "xyz-" continues
+    until a line that starts with "xyz ". Replies that arrive together in one
+    segment stay queued for the commands that follow. A line longer than
+    MAX_LINE_LENGTH is cut there, so a server that never ends its line
+    cannot grow the buffer without bound.'''
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.pending = []
+        self.replies = deque()
+
+    def feed(self, data):
+        '''feed(data)
+        Add received bytes to the buffer and queue every reply they
+        complete.'''
+
+        self.buffer.extend(data)
+
+        # Split every complete line at once rather than one find per line.
+        end = self.buffer.rfind(b'\n')
+        if end == -1:
+            # Test if a line has grown past the limit.
+            if len(self.buffer) > MAX_LINE_LENGTH:
+                line = bytes(self.buffer[:MAX_LINE_LENGTH])
+                del self.buffer[:MAX_LINE_LENGTH]
+                self.feed_line(decode(line).rstrip('\r'))
+            return
+
+        lines = bytes(self.buffer[:end]).split(b'\n')
+        del self.buffer[:(end+1)]
+        for line in lines:
+            self.feed_line(decode(line).rstrip('\r'))
+
+    def feed_line(self, line):
+        '''feed_line(line)
+        Add one decoded line to the reply being assembled.'''
+
+        # Test if line continues a multi-line reply.
+        if self.pending:
+            self.pending.append(line)
+            match = REPLY_LINE.match(line)
+
+            # Test if line ends the multi-line reply: the same code followed
+            # by a space or by nothing, so "211extra" in a body does not.
+            if (match and match.group(1) == self.pending[0][:NUM_DIGITS]
+                    and line[NUM_DIGITS:NUM_DIGITS+1] in (' ', '')):
+                self.replies.append(self.pending)
+                self.pending = []
+            return
+
+        # Skip blank lines between replies.
+        if not line.strip():
+            return
+
+        # Test if line starts a multi-line reply.
+        match = REPLY_LINE.match(line)
+        if match and match.group(2) == '-':
+            self.pending = [line]
+        else:
+            self.replies.append([line])
+
+    def has_reply(self):
+        return bool(self.replies)
+
+    def next_reply(self):
+        '''next_reply() -> ServerResponse
+        Remove and parse the oldest queued reply. Raise ServerReplyError if
+        the reply is malformed; the reply is dropped either way.'''
+
+        return build_response(self.replies.popleft())
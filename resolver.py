@@ -0,0 +1,146 @@
+# CS472 - Homework #4
+# Edward Parrish
+# resolver.py
+#
+# This module is the resolver module of the FTP client. It contains the
+# Resolver class which looks up server addresses with getaddrinfo, caches
+# them for a time to live and moves slow lookups, such as the reverse lookup
+# of a server name for the log, off the connect path.
+
+import socket
+import threading
+import time
+
+DEFAULT_TTL = 60.0
+NEGATIVE_TTL = 5.0
+RESOLVE_TIMEOUT = 5.0
+
+
+class Lookup:
+    '''Lookup
+    One lookup, cached or in flight. result is the list of candidates, or
+    the error the lookup raised, once done is set. previous is the last
+    list of candidates found for the same name, if any.'''
+
+    __slots__ = ('done', 'result', 'expires', 'previous')
+
+    def __init__(self, previous=None):
+        self.done = threading.Event()
+        self.result = None
+        self.expires = 0.0
+        self.previous = previous
+
+
+class Resolver:
+    '''Resolver
+    A thread-safe resolver with a time to live cache. Forward lookups return
+    every getaddrinfo candidate, IPv6 and IPv4, in the order the system
+    prefers. Each lookup runs on its own thread and is waited for at most
+    timeout seconds, so a broken resolver cannot stall a session for long;
+    a lookup that times out still fills the cache when it completes.
+    Concurrent lookups of the same name share one query. An expired entry
+    is used at once while it is refreshed in the background, and is kept if
+    the refresh fails. getaddrinfo does not report
+    the DNS time to live, so entries live for ttl seconds, and failures for
+    negative_ttl seconds.'''
+
+    def __init__(self, ttl=DEFAULT_TTL, negative_ttl=NEGATIVE_TTL,
+                 timeout=RESOLVE_TIMEOUT):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.forward = {}
+        self.names = {}
+
+    def resolve(self, host, port, family=socket.AF_UNSPEC):
+        '''resolve(host, port, family=socket.AF_UNSPEC) -> list of (family, address)
+        Return the stream socket candidates of host and port, from the cache
+        if they have not expired. Raise socket.gaierror if the host cannot be
+        resolved or the lookup times out.'''
+
+        key = (host, port, family)
+        now = time.monotonic()
+
+        with self.lock:
+            lookup = self.forward.get(key)
+
+            # Test if there is no fresh or in flight lookup of the name.
+            if not lookup or (lookup.done.is_set() and lookup.expires <= now):
+                previous = lookup and (
+                    lookup.previous if isinstance(lookup.result, Exception) else lookup.result)
+                lookup = Lookup(previous)
+                self.forward[key] = lookup
+                threading.Thread(target=self.run_lookup, daemon=True,
+                                 args=(lookup, host, port, family)).start()
+
+        # Test if an expired entry can be used while it is refreshed.
+        if lookup.previous and not lookup.done.is_set():
+            return lookup.previous
+
+        # Test if lookup did not finish in time.
+        if not lookup.done.wait(self.timeout):
+            if lookup.previous:
+                return lookup.previous
+            raise socket.gaierror(socket.EAI_AGAIN, f'Lookup of {host} timed out.')
+
+        # Test if lookup failed.
+        if isinstance(lookup.result, Exception):
+            if lookup.previous:
+                return lookup.previous
+            raise lookup.result
+
+        return lookup.result
+
+    def run_lookup(self, lookup, host, port, family):
+        try:
+            infos = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+            lookup.result = [(info[0], info[4]) for info in infos]
+            lookup.expires = time.monotonic() + self.ttl
+        except OSError as err:
+            lookup.result = err
+            lookup.expires = time.monotonic() + self.negative_ttl
+
+        lookup.done.set()
+
+    def reverse(self, address, callback):
+        '''reverse(address, callback)
+        Look up the name of an address on a background thread and pass it
+        to callback(address, name). The name is the address itself if it has
+        none. Cached names are passed at once.'''
+
+        now = time.monotonic()
+        with self.lock:
+            cached = self.names.get(address)
+
+        # Test if name is cached.
+        if cached and cached[1] > now:
+            callback(address, cached[0])
+            return
+
+        threading.Thread(target=self.run_reverse, daemon=True,
+                         args=(address, callback)).start()
+
+    def run_reverse(self, address, callback):
+        try:
+            name = socket.gethostbyaddr(address)[0]
+            ttl = self.ttl
+        except OSError:
+            name = address
+            ttl = self.negative_ttl
+
+        with self.lock:
+            self.names[address] = (name, time.monotonic() + ttl)
+        callback(address, name)
+
+    def clear(self):
+        '''clear()
+        Forget every cached lookup.'''
+
+        with self.lock:
+            self.forward = {}
+            self.names = {}
+
+
+# Parallel and pooled sessions to one server look its address up once.
+default_resolver = Resolver()
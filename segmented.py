@@ -0,0 +1,96 @@
+# CS472 - Homework #4
+# Edward Parrish
+# segmented.py
+#
+# This module is the segmented download module of the FTP client. It contains
+# the SegmentedDownload class which retrieves one large file as several byte
+# ranges over parallel sessions.
+
+from exceptions import TransferError
+from parallel import ParallelTransfer
+from util import System
+import os
+
+DEFAULT_SEGMENTS = 4
+MIN_SEGMENT_SIZE = 1 << 20
+
+
+def split_ranges(size, segments, min_size=MIN_SEGMENT_SIZE):
+    '''split_ranges(size, segments, min_size=MIN_SEGMENT_SIZE) -> list of (offset, length)
+    Split a file of size bytes into at most segments contiguous byte ranges
+    of at least min_size bytes each.'''
+
+    segments = max(1, min(segments, size // max(1, min_size)))
+    length = size // segments
+    ranges = []
+    for i in range(segments):
+        offset = i * length
+
+        # The last range takes the remainder.
+        if i == segments - 1:
+            length = size - offset
+
+        ranges.append((offset, length))
+
+    return ranges
+
+
+class SegmentedDownload:
+    '''SegmentedDownload
+    Retrieve a single remote file over several sessions at once. The file is
+    split into byte ranges by its SIZE, every session sends REST and RETR for
+    its own range, and each range is written at its offset into one
+    preallocated local file.'''
+
+    def __init__(self, session_factory, segments=DEFAULT_SEGMENTS, release=None):
+        self.session_factory = session_factory
+        self.segments = max(1, int(segments))
+        self.release = release
+
+    def get(self, client, remote_path, local_path):
+        '''get(client, remote_path, local_path) -> number of bytes written
+        Retrieve remote_path into local_path. The size is requested over the
+        given client; files that are too small to split, or whose size is not
+        reported, are retrieved in one ordinary transfer. When the client
+        verifies transfers, the finished file is hashed and checked against
+        the server's hash, since the ranges arrive out of order. Raise
+        TransferError if any range fails or the hashes differ.'''
+
+        size = client.size(remote_path)
+
+        # Test if file cannot be split.
+        if size is None or size < 2 * MIN_SEGMENT_SIZE or self.segments < 2:
+            return client.download(remote_path, local_path)
+
+        ranges = split_ranges(size, self.segments)
+
+        # Choose the hash before the ranges are retrieved.
+        hasher = client.start_hash()
+
+        with System.open_file(local_path, 'wb') as f:
+            # Preallocate the local file so every range has a place to land.
+            f.truncate(size)
+
+            transfer = ParallelTransfer(
+                self.session_factory, len(ranges), self.release)
+            stats = transfer.run(
+                ranges,
+                lambda session, job: session.download_range(remote_path, f, *job))
+
+        errors = [err for s in stats for err in s.errors]
+        total = sum(s.bytes for s in stats)
+
+        # Test if any range failed or the result has the wrong size.
+        if errors:
+            raise TransferError(remote_path, f'{len(errors)} segments failed: {errors[0][1]}')
+        if total != size or os.path.getsize(local_path) != size:
+            raise TransferError(
+                remote_path, f'Segmented transfer wrote {total} of {size} bytes.')
+
+        # Test if the transfer is verified.
+        if hasher:
+            with System.open_file(local_path, 'rb') as f:
+                hasher.update_file(f, size)
+            client.check_hash(remote_path, hasher)
+
+        return total
@@ -0,0 +1,497 @@
+# CS472 - Homework #4
+# Edward Parrish
+# test_ftpclient.py
+#
+# This module is the test module of the FTP client. It drives the Client
+# class against the in-process TestServer: restarted, segmented and resumed
+# transfers, verified, compressed and ASCII transfers, transfers over
+# parallel sessions, mirroring of hostile listings, rate limits and the
+# asyncio client.
+
+from checkpoint import Checkpoint, CheckpointJournal, DOWNLOAD
+from exceptions import TransferError
+from listing import parse_listing, parse_list_line, parse_mlsd_line
+from mirror import Mirror
+from pool import ClientPool
+from reply import ReplyReader
+from resolver import Resolver
+from throttle import parse_rate
+from translate import AsciiDecoder, AsciiEncoder, CRLF, LF
+import aioclient
+import asyncio
+import ftpclient
+import os
+import pytest
+import socket
+import testserver
+import time
+import zlib
+
+FILE_SIZE = 5 << 20
+
+
+@pytest.fixture(scope='module', autouse=True)
+def listeners():
+    yield
+    ftpclient.default_listeners.close()
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / 'root'
+    root.mkdir()
+    (root / 'dir').mkdir()
+    (root / 'dir' / 'big').write_bytes(os.urandom(FILE_SIZE))
+    return root
+
+
+@pytest.fixture
+def server(root):
+    with testserver.TestServer(str(root)) as s:
+        yield s
+
+
+@pytest.fixture
+def client(server):
+    c = login(server)
+    yield c
+    c.close()
+
+
+def login(server):
+    c = ftpclient.Client(server.host, server.port)
+    c.verbose = False
+    c.connect()
+    c.wait_ready()
+    c.login('user', 'pass')
+    return c
+
+
+def test_rest_retrieves_from_offset(client, root, tmp_path):
+    local = tmp_path / 'part'
+    with open(local, 'wb') as f:
+        total = client.download_range('/dir/big', f, 1000, 5000)
+
+    # The range is written at its offset into the local file.
+    assert total == 5000
+    assert local.read_bytes()[1000:] == (root / 'dir' / 'big').read_bytes()[1000:6000]
+
+
+def test_error_reply_mentioning_150(client, server, tmp_path):
+    # Only a 1yz code starts a transfer, whatever the text of the reply.
+    server.inject('RETR', testserver.REPLY, '550 report1500.csv: No such file or directory')
+    started = time.monotonic()
+    assert client.download('/dir/big', str(tmp_path / 'big')) is None
+    assert time.monotonic() - started < 1.0
+
+    # The session is still in step.
+    assert client.working_dir() == '/'
+
+
+def test_reply_ends_on_code_and_space():
+    reader = ReplyReader()
+    reader.feed(b'211-Features:\r\n 211-ish\r\n211extra text\r\n211-more\r\n'
+                b'211 End\r\n200 Next\r\n211-Again\r\n211\r\n')
+
+    response = reader.next_reply()
+    assert response.code == 211 and len(response.lines) == 5
+    assert reader.next_reply().code == 200
+    assert len(reader.next_reply().lines) == 2
+    assert not reader.has_reply()
+
+
+def test_pipeline_window_slides(client, server):
+    server.latency = 0.1
+    client.toggle_pipelining()
+    paths = ['/dir/big', '/missing'] * 500
+
+    # A 1000-file sweep takes about one round trip.
+    started = time.monotonic()
+    sizes = client.sizes(paths)
+    assert time.monotonic() - started < 0.2
+    assert sizes == {'/dir/big': FILE_SIZE, '/missing': None}
+
+    # A smaller window slides: each reply makes room for the next command.
+    responses = client.pipeline([('SIZE', path) for path in paths[:10]], window=3)
+    assert [r.code for r in responses] == [213, 550] * 5
+    assert client.working_dir() == '/'
+
+
+def test_segmented_download_on_fresh_session(client, root, tmp_path):
+    # A fresh session does not know its working directory yet.
+    client.change_dir('dir')
+    assert client.remote_dir is None
+
+    local = tmp_path / 'big'
+    assert client.download_segmented('big', str(local), 4) == FILE_SIZE
+    assert local.read_bytes() == (root / 'dir' / 'big').read_bytes()
+
+
+@pytest.mark.parametrize('algorithm', ['on', 'crc32'])
+def test_verified_segmented_download(client, server, root, tmp_path, algorithm):
+    client.set_verify(algorithm)
+    local = tmp_path / 'big'
+    assert client.download_segmented('/dir/big', str(local), 4) == FILE_SIZE
+
+    assert local.read_bytes() == (root / 'dir' / 'big').read_bytes()
+
+    # The finished file is checked against the server's hash.
+    server.inject('HASH', testserver.REPLY, f'213 {algorithm} 0-{FILE_SIZE} 0 /dir/big')
+    with pytest.raises(TransferError):
+        client.download_segmented('/dir/big', str(local), 4)
+
+
+def test_resumed_download(client, root, tmp_path):
+    data = (root / 'dir' / 'big').read_bytes()
+    local = tmp_path / 'big'
+    local.write_bytes(data[:FILE_SIZE // 3])
+
+    client.journal = CheckpointJournal(str(tmp_path / 'journal'))
+    client.journal.record(Checkpoint(
+        DOWNLOAD, '/dir/big', str(local), FILE_SIZE // 3, FILE_SIZE,
+        client.mdtm('/dir/big')))
+
+    assert client.download_resumable('/dir/big', str(local)) == FILE_SIZE - FILE_SIZE // 3
+    assert local.read_bytes() == data
+
+
+@pytest.mark.parametrize('algorithm', ['on', 'crc32', 'md5', 'sha-256'])
+def test_verified_get_and_put(client, root, tmp_path, algorithm):
+    client.set_verify(algorithm)
+    local = tmp_path / 'big'
+
+    assert client.download('/dir/big', str(local)) == FILE_SIZE
+    assert client.upload(str(local), '/copy') == FILE_SIZE
+    assert (root / 'copy').read_bytes() == local.read_bytes()
+
+    # The session is still in step and knows the server's features.
+    assert 'MLST' in client.features()
+    assert client.working_dir() == '/'
+
+
+def test_verified_get_with_short_crc(client, server, root, tmp_path):
+    # A file whose CRC starts with zeros, which XCRC replies may drop.
+    data = next(d for d in (b'%d' % i for i in range(100000)) if zlib.crc32(d) < 1 << 20)
+    (root / 'small').write_bytes(data)
+    crc = zlib.crc32(data)
+
+    # Without HASH in FEAT the client falls back to XCRC.
+    server.inject('FEAT', testserver.REPLY, '211 No features.')
+    client.set_verify('crc32')
+    server.inject('XCRC', testserver.REPLY, f'250 {crc:x}')
+    assert client.download('/small', str(tmp_path / 'small')) == len(data)
+
+    server.inject('XCRC', testserver.REPLY, f'250 {crc + 1:x}')
+    with pytest.raises(TransferError):
+        client.download('/small', str(tmp_path / 'small'))
+
+
+def test_verified_resumable_get(client, root, tmp_path):
+    client.journal = CheckpointJournal(str(tmp_path / 'journal'))
+    client.set_verify('on')
+    local = tmp_path / 'big'
+
+    assert client.download_resumable('/dir/big', str(local)) == FILE_SIZE
+    assert local.read_bytes() == (root / 'dir' / 'big').read_bytes()
+
+
+def test_parallel_sessions(client, root, tmp_path):
+    client.change_dir('dir')
+    pairs = [('big', str(tmp_path / f'big{i}')) for i in range(4)]
+
+    stats = client.get_many(pairs, 4)
+    assert not [err for s in stats for err in s.errors]
+    for _, local in pairs:
+        assert os.path.getsize(local) == FILE_SIZE
+
+    stats = client.put_many([(local, f'up{i}') for i, (_, local) in enumerate(pairs)], 4)
+    assert not [err for s in stats for err in s.errors]
+    for i in range(4):
+        assert (root / 'dir' / f'up{i}').read_bytes() == (root / 'dir' / 'big').read_bytes()
+
+
+def test_compressed_get_put_and_listing(client, root, tmp_path):
+    (root / 'text').write_bytes(b'compressible line of text\n' * 100000)
+    client.set_compression('on')
+
+    assert {e.name for e in client.listdir('/')} == {'dir', 'text'}
+    assert client.current_mode == 'Z'
+
+    for name in ('dir/big', 'text'):
+        local = tmp_path / 'local'
+        assert client.download(f'/{name}', str(local)) == (root / name).stat().st_size
+        assert client.current_mode == 'Z'
+        assert local.read_bytes() == (root / name).read_bytes()
+        assert client.upload(str(local), '/copy') == local.stat().st_size
+        assert (root / 'copy').read_bytes() == local.read_bytes()
+
+
+def test_compression_refused(root, tmp_path):
+    with testserver.TestServer(str(root), mode_z=False) as server:
+        client = login(server)
+        client.set_compression('9')
+        local = tmp_path / 'big'
+
+        # The server refuses MODE Z once, and stream mode is used from then on.
+        assert client.download('/dir/big', str(local)) == FILE_SIZE
+        assert client.mode_z_refused and client.current_mode != 'Z'
+        assert client.upload(str(local), '/copy') == FILE_SIZE
+        assert client.retrieve_lines('NLST', '/dir') == ['big']
+        client.close()
+
+    assert (root / 'copy').read_bytes() == local.read_bytes()
+
+
+@pytest.mark.parametrize('data', [b'a\r\nb\r\n\r\nc\rd\ne\r', b'\r\r\n\n\r\n'])
+def test_ascii_translators_across_chunks(data):
+    local = data.replace(CRLF, LF)
+
+    # Every split point, including one between the CR and LF of a pair.
+    for i in range(len(data) + 1):
+        decoder = AsciiDecoder(LF)
+        out = decoder.translate(data[:i]) + decoder.translate(data[i:]) + decoder.flush()
+        assert out == local
+
+        encoder = AsciiEncoder()
+        out = encoder.translate(data[:i]) + encoder.translate(data[i:]) + encoder.flush()
+        assert out == AsciiEncoder().translate(data)
+
+
+@pytest.mark.parametrize('compression', [None, 'on'])
+def test_ascii_get_and_put(client, root, tmp_path, compression):
+    text = b''.join(b'line %d\n' % i for i in range(200000))
+    (root / 'text').write_bytes(text)
+    client.set_type(ftpclient.TYPE_ASCII)
+    client.set_compression(compression or 'off')
+
+    # The CRLF pairs on the wire fall across chunk boundaries.
+    local = tmp_path / 'text'
+    client.download('/text', str(local))
+    assert local.read_bytes() == text.replace(LF, os.linesep.encode())
+
+    client.upload(str(local), '/copy')
+    assert (root / 'copy').read_bytes() == text
+
+
+def test_pooled_sessions_follow_client(client):
+    client.pool = ClientPool(ftpclient.Client)
+    client.resolver = Resolver()
+    client.family = socket.AF_INET
+    client.set_profile('lan')
+
+    # A session logged in by the pool resolves and connects like the client.
+    session = client.session()
+    assert session.resolver is client.resolver
+    assert session.family == socket.AF_INET
+    assert session.profile is client.profile
+    assert client.resolver.forward
+
+    client.release_session(session)
+    assert client.session() is session
+    client.pool.close()
+
+
+def test_listing_rejects_unsafe_names():
+    mlsd = ['type=file;size=1; ../../escape.txt', 'type=file;size=1; a/../../b',
+            'type=dir; ..', 'type=file;size=1; ok']
+    unix = ['-rw-r--r-- 1 o g 1 Jan  1 12:00 ../escape', '-rw-r--r-- 1 o g 1 Jan  1 12:00 ok']
+    dos = ['01-31-24  09:15PM  1 ..\\x/../y', '01-31-24  09:15PM  1 ok']
+
+    assert [e.name for e in parse_listing(mlsd, parse_mlsd_line)] == ['ok']
+    assert [e.name for e in parse_listing(unix, parse_list_line)] == ['ok']
+    assert [e.name for e in parse_listing(dos, parse_list_line)] == ['ok']
+
+
+def test_mirror_stays_in_local_root(client, tmp_path):
+    local_root = tmp_path / 'mirror'
+    local_root.mkdir()
+    os.symlink(tmp_path, local_root / 'link')
+    mirror = Mirror(client, '/dir', str(local_root))
+
+    assert mirror.local_path('a/b') == os.path.join(str(local_root), 'a', 'b')
+    for rel in ('../escape.txt', 'a/../../b', 'link/escape.txt'):
+        with pytest.raises(ValueError):
+            mirror.local_path(rel)
+
+    result = mirror.run()
+    assert result.transferred == ['big'] and not result.errors
+
+
+@pytest.mark.parametrize('mode', ['port', 'eprt'])
+def test_active_mode_listeners_per_profile(client, root, tmp_path, mode):
+    client.toggle_data_conn_type(mode)
+    for name in ('default', 'lan'):
+        client.set_profile(name)
+        local = tmp_path / name
+        assert client.download('/dir/big', str(local)) == FILE_SIZE
+        assert local.read_bytes() == (root / 'dir' / 'big').read_bytes()
+
+    # Listeners tuned for one profile are not reused for another.
+    idle = ftpclient.default_listeners.idle
+    for name in ('default', 'lan'):
+        profile = ftpclient.PROFILES[name]
+        assert all(l.profile is profile for l in idle[(client.conn.family, profile)])
+
+
+def test_rate_limit(client, tmp_path):
+    client.session_limit.set_rate(FILE_SIZE * 2)
+    started = time.monotonic()
+    client.download('/dir/big', str(tmp_path / 'big'))
+    elapsed = time.monotonic() - started
+    client.session_limit.set_rate(None)
+
+    assert 0.4 < elapsed < 1.0
+
+
+def test_parse_rate():
+    assert parse_rate('10M') == 10 << 20
+    assert parse_rate('1.5K/s') == 1536
+    assert parse_rate('off') is None
+    for value in ('inf', '1e400', '1e308G', '-1K', 'nan', 'fast'):
+        with pytest.raises(ValueError):
+            parse_rate(value)
+
+
+def test_set_limit_rejects_infinite_rate(client):
+    client.set_limit('global inf')
+    assert ftpclient.global_limit.rate is None
+
+
+class SlowFile:
+    '''SlowFile
+    A file whose reads and writes block, like a slow disk. busy counts the
+    calls still on their way.'''
+
+    def __init__(self, f):
+        self.f = f
+        self.busy = 0
+        self.calls = 0
+
+    def read(self, size):
+        return self.slow(self.f.read, size)
+
+    def write(self, data):
+        return self.slow(self.f.write, data)
+
+    def slow(self, method, arg):
+        self.busy += 1
+        self.calls += 1
+        try:
+            time.sleep(0.02)
+            return method(arg)
+        finally:
+            self.busy -= 1
+
+
+@pytest.mark.parametrize('mode', aioclient.DATA_CONN_MODES)
+def test_async_sessions(server, root, tmp_path, mode):
+    data = (root / 'dir' / 'big').read_bytes()
+
+    async def session(i):
+        c = aioclient.AsyncClient(server.host, server.port, mode)
+        await c.connect()
+        await c.login('user', 'pass')
+        assert await c.retr('/dir/big', str(tmp_path / f'big{i}')) == FILE_SIZE
+        assert await c.stor(str(tmp_path / f'big{i}'), f'/up{i}') == FILE_SIZE
+        assert 'big' in await c.list('/dir')
+        await c.close()
+
+    async def run():
+        await asyncio.gather(*[session(i) for i in range(8)])
+
+    asyncio.run(run())
+    for i in range(8):
+        assert (tmp_path / f'big{i}').read_bytes() == data
+        assert (root / f'up{i}').read_bytes() == data
+
+
+def test_async_file_io_off_the_loop(server, root, tmp_path):
+    lags = []
+
+    async def heartbeat(stop):
+        while not stop.is_set():
+            started = time.monotonic()
+            await asyncio.sleep(0.001)
+            lags.append(time.monotonic() - started)
+
+    async def run():
+        c = aioclient.AsyncClient(server.host, server.port)
+        await c.connect()
+        await c.login('user', 'pass')
+        await c.ensure_binary()
+        stop = asyncio.Event()
+        beat = asyncio.create_task(heartbeat(stop))
+
+        async def receive(data_conn):
+            with open(tmp_path / 'big', 'wb') as f:
+                return await data_conn.receive_to(SlowFile(f), bufsize=1 << 20)
+
+        async def send(data_conn):
+            with open(tmp_path / 'big', 'rb') as f:
+                return await data_conn.send_from(SlowFile(f), bufsize=1 << 20)
+
+        assert await c.transfer('RETR', '/dir/big', receive) == FILE_SIZE
+        assert await c.transfer('STOR', '/copy', send) == FILE_SIZE
+        stop.set()
+        await beat
+        await c.close()
+
+    asyncio.run(run())
+    assert (root / 'copy').read_bytes() == (root / 'dir' / 'big').read_bytes()
+    assert max(lags) < 0.015
+
+
+def test_async_cancelled_transfer_stops_file_worker(server, tmp_path):
+    server.set_bandwidth(FILE_SIZE)
+    (tmp_path / 'big').write_bytes(os.urandom(FILE_SIZE))
+
+    async def run(command, path):
+        c = aioclient.AsyncClient(server.host, server.port)
+        await c.connect()
+        await c.login('user', 'pass')
+        await c.ensure_binary()
+
+        with open(tmp_path / 'big', 'rb' if command == 'STOR' else 'r+b') as f:
+            slow = SlowFile(f)
+
+            async def operation(data_conn):
+                if command == 'STOR':
+                    return await data_conn.send_from(slow)
+                return await data_conn.receive_to(slow)
+
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(c.transfer(command, path, operation), 0.2)
+
+            # No call is left running on a thread once the transfer is over.
+            assert slow.busy == 0
+            calls = slow.calls
+            await asyncio.sleep(0.1)
+            assert slow.calls == calls
+
+    asyncio.run(run('RETR', '/dir/big'))
+    asyncio.run(run('STOR', '/copy'))
+
+
+@pytest.mark.skipif(not socket.has_ipv6, reason='no IPv6')
+@pytest.mark.parametrize('mode', aioclient.DATA_CONN_MODES)
+def test_async_ipv6(root, tmp_path, mode):
+    server = testserver.TestServer(str(root), host='::1')
+    try:
+        server.start()
+    except OSError:
+        pytest.skip('no IPv6 loopback')
+
+    async def run():
+        c = aioclient.AsyncClient(server.host, server.port, mode)
+        await c.connect()
+        await c.login('user', 'pass')
+        assert await c.retr('/dir/big', str(tmp_path / 'big')) == FILE_SIZE
+        await c.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop()
+
+    # PASV and PORT are replaced by EPSV and EPRT over IPv6.
+    assert (tmp_path / 'big').read_bytes() == (root / 'dir' / 'big').read_bytes()
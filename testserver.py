@@ -0,0 +1,805 @@
+# CS472 - Homework #4
+# Edward Parrish
+# testserver.py
+#
+# This module is the test server module of the FTP client. It contains the
+# TestServer class, a small scriptable FTP server that serves a local
+# directory so the client can be exercised and benchmarked without a network.
+# Latency, bandwidth limits and faults can be injected while it runs.
+#
+# Usage: python testserver.py [ROOT] [Optional: PORT]
+
+from throttle import TokenBucket
+from translate import AsciiDecoder, AsciiEncoder
+from compress import DEFAULT_LEVEL, MIN_LEVEL, MAX_LEVEL
+from verify import StreamHash, X_COMMANDS, CRC32, MD5, SHA256
+import os
+import posixpath
+import queue
+import socket
+import stat
+import sys
+import threading
+import time
+import zlib
+
+DEFAULT_HOST = '127.0.0.1'
+ACCEPT_TIMEOUT = 10
+CHUNK_SIZE = 65536
+
+# Fault actions.
+REPLY = 'reply'
+CLOSE = 'close'
+ABORT = 'abort'
+DELAY = 'delay'
+
+
+class Fault:
+    '''Fault
+    A fault injected into the next times commands of one name: a canned
+    reply instead of the command (REPLY), a dropped control connection
+    (CLOSE), a transfer aborted after value bytes (ABORT) or a delay of value
+    seconds before the command runs (DELAY).'''
+
+    def __init__(self, command, action, value=None, times=1):
+        self.command = command.upper()
+        self.action = action
+        self.value = value
+        self.times = times
+
+
+class TestServer:
+    '''TestServer
+    An FTP server on a background thread that serves the files under root.
+    It supports login, PWD/CWD/CDUP, TYPE A and I, MODE S and Z, SIZE, MDTM,
+    REST, PASV, EPSV, PORT, EPRT, LIST, NLST, MLSD, MLST, RETR, STOR, APPE,
+    DELE, MKD, RMD, HASH, XCRC, XMD5 and XSHA256. MODE Z is refused unless
+    mode_z is true. Every reply and data connection is delayed by latency
+    seconds, and all data connections share a link of bandwidth bytes per
+    second. Replies are delayed without holding up the commands behind them,
+    like a round trip on a real link, so pipelined commands gain from it.
+    Any login is accepted unless users maps usernames to passwords.'''
+
+    def __init__(self, root, host=DEFAULT_HOST, port=0, latency=0.0,
+                 bandwidth=None, users=None, mlst=True, mode_z=True):
+        self.root = os.path.abspath(root)
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.link = TokenBucket(bandwidth)
+        self.users = users
+        self.mlst = mlst
+        self.mode_z = mode_z
+        self.faults = []
+        self.lock = threading.Lock()
+        self.sock = None
+        self.thread = None
+        self.sessions = set()
+        self.commands = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        '''start() -> TestServer
+        Listen on host and port, or on a free port if port is 0, and serve
+        connections on a background thread.'''
+
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(64)
+        self.port = self.sock.getsockname()[1]
+
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                break
+
+            session = ServerSession(self, conn)
+            with self.lock:
+                self.sessions.add(session)
+            threading.Thread(target=session.run, daemon=True).start()
+
+    def stop(self):
+        '''stop()
+        Stop listening and close every session.'''
+
+        if self.sock:
+            # Wake the accept call before closing the socket.
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+
+        with self.lock:
+            sessions = list(self.sessions)
+        for session in sessions:
+            session.close()
+
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def set_bandwidth(self, bandwidth):
+        '''set_bandwidth(bandwidth)
+        Change the bandwidth of the link, in bytes per second. None is
+        unlimited.'''
+
+        self.link.set_rate(bandwidth)
+
+    def inject(self, command, action, value=None, times=1):
+        '''inject(command, action, value=None, times=1) -> Fault
+        Inject a fault into the next times commands of one name.'''
+
+        fault = Fault(command, action, value, times)
+        with self.lock:
+            self.faults.append(fault)
+
+        return fault
+
+    def take_fault(self, command):
+        '''take_fault(command) -> Fault
+        Return and use up one injected fault for command, or None.'''
+
+        with self.lock:
+            for fault in self.faults:
+                if fault.command == command:
+                    fault.times -= 1
+                    if fault.times <= 0:
+                        self.faults.remove(fault)
+                    return fault
+
+        return None
+
+    def clear_faults(self):
+        with self.lock:
+            self.faults = []
+
+
+class ServerSession:
+    '''ServerSession
+    One control connection of the TestServer. Commands are dispatched to the
+    cmd_ methods of the same name.'''
+
+    def __init__(self, server, conn):
+        self.server = server
+        self.conn = conn
+        self.cwd = '/'
+        self.username = None
+        self.logged_in = False
+        self.binary = False
+        self.deflate = False
+        self.level = DEFAULT_LEVEL
+        self.hash_algorithm = SHA256
+        self.link = None
+        self.rest = 0
+        self.passive_sock = None
+        self.active_addr = None
+        self.outbox = queue.SimpleQueue()
+        self.writer = None
+
+    def run(self):
+        # Replies are small writes that must not wait for delayed ACKs.
+        self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.writer = threading.Thread(target=self.write_replies, daemon=True)
+        self.writer.start()
+
+        try:
+            self.reply('220 Test server ready.')
+            f = self.conn.makefile('rb')
+            for line in f:
+                line = line.decode('utf-8', 'replace').rstrip('\r\n')
+                command, _, arg = line.partition(' ')
+                if not self.handle(command.upper(), arg):
+                    break
+        except OSError:
+            pass
+        finally:
+            # Send the replies still on their way before closing.
+            self.outbox.put(None)
+            self.writer.join()
+            self.close()
+
+    def write_replies(self):
+        '''write_replies()
+        The reply writer loop. Send each queued reply once it is due.'''
+
+        while True:
+            item = self.outbox.get()
+            if item is None:
+                break
+
+            due, data = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            try:
+                self.conn.sendall(data)
+            except OSError:
+                break
+
+    def handle(self, command, arg):
+        '''handle(command, arg) -> bool
+        Run one command. Return False once the session is over.'''
+
+        self.server.commands += 1
+
+        # Test if a fault is injected into the command.
+        fault = self.server.take_fault(command)
+        if fault:
+            if fault.action == CLOSE:
+                return False
+            if fault.action == REPLY:
+                self.reply(fault.value)
+                return True
+            if fault.action == DELAY:
+                time.sleep(fault.value)
+                fault = None
+
+        # Test if command is not implemented.
+        method = getattr(self, f'cmd_{command}', None)
+        if method is None:
+            self.reply('502 Command not implemented.')
+            return True
+
+        # Test if command requires login.
+        if not self.logged_in and command not in ('USER', 'PASS', 'QUIT', 'FEAT', 'SYST'):
+            self.reply('530 Please login with USER and PASS.')
+            return True
+
+        return method(arg, fault) is not False
+
+    def reply(self, text):
+        '''reply(text)
+        Queue a reply to be sent latency seconds from now.'''
+
+        self.outbox.put((time.monotonic() + self.server.latency,
+                         f'{text}\r\n'.encode()))
+
+    def close(self):
+        self.close_passive()
+        try:
+            # Wake the session thread if it is waiting for a command.
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        with self.server.lock:
+            self.server.sessions.discard(self)
+
+    def close_passive(self):
+        if self.passive_sock:
+            self.passive_sock.close()
+            self.passive_sock = None
+
+    def path(self, arg):
+        '''path(arg) -> (virtual path, local path)
+        Resolve a path argument against the working directory. The virtual
+        path never leaves the root.'''
+
+        virtual = posixpath.normpath(posixpath.join(self.cwd, arg or '.'))
+        if virtual.startswith('//'):
+            virtual = virtual[1:]
+        parts = [p for p in virtual.split('/') if p]
+        return virtual, os.path.join(self.server.root, *parts)
+
+    # Login and session commands.
+
+    def cmd_USER(self, arg, fault):
+        self.username = arg
+        self.logged_in = False
+        self.reply('331 Please specify the password.')
+
+    def cmd_PASS(self, arg, fault):
+        users = self.server.users
+        if users is not None and users.get(self.username) != arg:
+            self.reply('530 Login incorrect.')
+            return
+        self.logged_in = True
+        self.reply('230 Login successful.')
+
+    def cmd_QUIT(self, arg, fault):
+        self.reply('221 Goodbye.')
+        return False
+
+    def cmd_NOOP(self, arg, fault):
+        self.reply('200 NOOP ok.')
+
+    def cmd_SYST(self, arg, fault):
+        self.reply('215 UNIX Type: L8')
+
+    def cmd_FEAT(self, arg, fault):
+        lines = ['211-Features:', ' EPSV', ' EPRT', ' MDTM', ' REST STREAM', ' SIZE']
+        if self.server.mlst:
+            lines.append(' MLST type*;size*;modify*;')
+        if self.server.mode_z:
+            lines.append(' MODE Z')
+        lines.append(' HASH ' + ';'.join(
+            name + ('*' if name == self.hash_algorithm else '') for name in X_COMMANDS))
+        lines.append('211 End')
+        self.reply('\r\n'.join(lines))
+
+    def cmd_HELP(self, arg, fault):
+        commands = sorted(name[4:] for name in dir(self) if name.startswith('cmd_'))
+        self.reply('\r\n'.join(['214-The following commands are recognized.',
+                                ' ' + ' '.join(commands), '214 Help OK.']))
+
+    def cmd_TYPE(self, arg, fault):
+        kind = arg.upper()[:1]
+        if kind not in ('A', 'I'):
+            self.reply('504 Unsupported type.')
+            return
+        self.binary = kind == 'I'
+        self.reply(f'200 Type set to {kind}.')
+
+    def cmd_MODE(self, arg, fault):
+        mode = arg.upper()
+        if mode != 'S' and not (mode == 'Z' and self.server.mode_z):
+            self.reply('504 Unsupported transfer mode.')
+            return
+        self.deflate = mode == 'Z'
+        self.reply(f'200 Mode set to {mode}.')
+
+    def cmd_OPTS(self, arg, fault):
+        words = arg.upper().split()
+
+        # Test if option selects the HASH algorithm.
+        if words[:1] == ['HASH']:
+            if len(words) != 2 or words[1] not in X_COMMANDS:
+                self.reply('501 Unknown algorithm.')
+                return
+            self.hash_algorithm = words[1]
+            self.reply(f'200 {words[1]}')
+            return
+
+        try:
+            if words[:3] != ['MODE', 'Z', 'LEVEL'] or not self.server.mode_z:
+                raise ValueError
+            level = int(words[3])
+            if not MIN_LEVEL <= level <= MAX_LEVEL:
+                raise ValueError
+        except (IndexError, ValueError):
+            self.reply('501 Option not understood.')
+            return
+        self.level = level
+        self.reply(f'200 MODE Z LEVEL set to {level}.')
+
+    def cmd_PWD(self, arg, fault):
+        self.reply(f'257 "{self.cwd}" is the current directory.')
+
+    def cmd_CWD(self, arg, fault):
+        virtual, local = self.path(arg)
+        if not os.path.isdir(local):
+            self.reply('550 Failed to change directory.')
+            return
+        self.cwd = virtual
+        self.reply('250 Directory successfully changed.')
+
+    def cmd_CDUP(self, arg, fault):
+        self.cmd_CWD('..', fault)
+
+    def cmd_MKD(self, arg, fault):
+        virtual, local = self.path(arg)
+        try:
+            os.mkdir(local)
+        except OSError:
+            self.reply('550 Create directory operation failed.')
+            return
+        self.reply(f'257 "{virtual}" created.')
+
+    def cmd_RMD(self, arg, fault):
+        try:
+            os.rmdir(self.path(arg)[1])
+        except OSError:
+            self.reply('550 Remove directory operation failed.')
+            return
+        self.reply('250 Remove directory operation successful.')
+
+    def cmd_DELE(self, arg, fault):
+        try:
+            os.remove(self.path(arg)[1])
+        except OSError:
+            self.reply('550 Delete operation failed.')
+            return
+        self.reply('250 Delete operation successful.')
+
+    def cmd_SIZE(self, arg, fault):
+        local = self.path(arg)[1]
+        if not os.path.isfile(local):
+            self.reply('550 Could not get file size.')
+            return
+        self.reply(f'213 {os.path.getsize(local)}')
+
+    def cmd_MDTM(self, arg, fault):
+        local = self.path(arg)[1]
+        if not os.path.isfile(local):
+            self.reply('550 Could not get file modification time.')
+            return
+        self.reply(f'213 {format_time(os.stat(local).st_mtime)}')
+
+    def cmd_REST(self, arg, fault):
+        try:
+            self.rest = int(arg)
+        except ValueError:
+            self.reply('501 Bad restart marker.')
+            return
+        self.reply(f'350 Restart position accepted ({self.rest}).')
+
+    def hash_file(self, arg, algorithm):
+        '''hash_file(arg, algorithm) -> (virtual path, StreamHash)
+        Hash a file. Return None for the hash if there is no such file.'''
+
+        virtual, local = self.path(arg)
+        if not os.path.isfile(local):
+            return virtual, None
+
+        hasher = StreamHash(algorithm)
+        with open(local, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+
+        return virtual, hasher
+
+    def cmd_HASH(self, arg, fault):
+        virtual, hasher = self.hash_file(arg, self.hash_algorithm)
+        if hasher is None:
+            self.reply('550 File not found.')
+            return
+        size = os.path.getsize(self.path(arg)[1])
+        self.reply(f'213 {hasher.algorithm} 0-{size} {hasher.hexdigest()} {virtual}')
+
+    def x_hash(self, arg, algorithm):
+        hasher = self.hash_file(arg, algorithm)[1]
+        if hasher is None:
+            self.reply('550 File not found.')
+            return
+        self.reply(f'250 {hasher.hexdigest()}')
+
+    def cmd_XCRC(self, arg, fault):
+        self.x_hash(arg, CRC32)
+
+    def cmd_XMD5(self, arg, fault):
+        self.x_hash(arg, MD5)
+
+    def cmd_XSHA256(self, arg, fault):
+        self.x_hash(arg, SHA256)
+
+    # Data connection commands.
+
+    def cmd_PASV(self, arg, fault):
+        host = self.open_passive()
+        port = self.passive_sock.getsockname()[1]
+        h1to4 = host.replace('.', ',')
+        self.reply(f'227 Entering Passive Mode ({h1to4},{port >> 8},{port & 255}).')
+
+    def cmd_EPSV(self, arg, fault):
+        self.open_passive()
+        port = self.passive_sock.getsockname()[1]
+        self.reply(f'229 Entering Extended Passive Mode (|||{port}|).')
+
+    def cmd_PORT(self, arg, fault):
+        try:
+            parts = arg.split(',')
+            host = '.'.join(parts[:4])
+            port = (int(parts[4]) << 8) + int(parts[5])
+        except (IndexError, ValueError):
+            self.reply('501 Illegal PORT command.')
+            return
+        self.set_active((host, port))
+        self.reply('200 PORT command successful.')
+
+    def cmd_EPRT(self, arg, fault):
+        try:
+            _, _, host, port, _ = arg.split(arg[0])
+            port = int(port)
+        except (IndexError, ValueError):
+            self.reply('501 Illegal EPRT command.')
+            return
+        self.set_active((host, port))
+        self.reply('200 EPRT command successful.')
+
+    def open_passive(self):
+        '''open_passive() -> host address
+        Listen for the next data connection on a free port.'''
+
+        self.close_passive()
+        self.active_addr = None
+        host = self.conn.getsockname()[0]
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        self.passive_sock = socket.socket(family, socket.SOCK_STREAM)
+        self.passive_sock.bind((host, 0))
+        self.passive_sock.listen(1)
+        self.passive_sock.settimeout(ACCEPT_TIMEOUT)
+        return host
+
+    def set_active(self, addr):
+        self.close_passive()
+        self.active_addr = addr
+
+    def open_data_conn(self):
+        '''open_data_conn() -> socket
+        Accept or make the data connection set up by the last PASV, EPSV,
+        PORT or EPRT command. Return None if there is none.'''
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        try:
+            if self.passive_sock:
+                conn, _ = self.passive_sock.accept()
+                self.close_passive()
+                return conn
+            if self.active_addr:
+                addr, self.active_addr = self.active_addr, None
+                return socket.create_connection(addr, ACCEPT_TIMEOUT)
+        except OSError:
+            self.close_passive()
+
+        return None
+
+    def transfer(self, operation, fault):
+        '''transfer(operation, fault)
+        Open the data connection, run operation(data_conn, limit) and send
+        the final reply. limit is the number of bytes an ABORT fault allows,
+        or None.'''
+
+        self.reply('150 Opening data connection.')
+        data_conn = self.open_data_conn()
+        if data_conn is None:
+            self.reply("425 Can't open data connection.")
+            return
+
+        # Test if the data is compressed (MODE Z). The link is then paid
+        # for by the compressed stream rather than by the operation.
+        if self.deflate:
+            data_conn = DeflateSocket(data_conn, self.level, self.server.link)
+            self.link = UNLIMITED
+        else:
+            self.link = self.server.link
+
+        limit = fault.value if fault and fault.action == ABORT else None
+        try:
+            complete = operation(data_conn, limit) is not False
+        except OSError:
+            complete = False
+        finally:
+            data_conn.close()
+            self.rest = 0
+
+        if complete:
+            self.reply('226 Transfer complete.')
+        else:
+            self.reply('426 Connection closed; transfer aborted.')
+
+    def send_data(self, data_conn, f, limit=None, translator=None):
+        '''send_data(data_conn, f, limit=None, translator=None) -> bool
+        Send an open binary file over the data connection at the link rate.
+        Return False if the transfer was aborted after limit bytes.'''
+
+        # Test if the fast path can be used. It sends from the current
+        # position, which REST may have moved.
+        if limit is None and translator is None and not self.link.is_limited():
+            data_conn.sendfile(f, f.tell())
+            return True
+
+        total = 0
+        while True:
+            nbytes = CHUNK_SIZE if limit is None else min(CHUNK_SIZE, limit - total)
+            chunk = f.read(nbytes) if nbytes > 0 else b''
+            if not chunk:
+                break
+
+            self.link.consume(len(chunk))
+            data_conn.sendall(translator.translate(chunk) if translator else chunk)
+            total += len(chunk)
+
+        return limit is None
+
+    def cmd_RETR(self, arg, fault):
+        local = self.path(arg)[1]
+        if not os.path.isfile(local):
+            self.reply('550 Failed to open file.')
+            return
+
+        def operation(data_conn, limit):
+            with open(local, 'rb') as f:
+                f.seek(self.rest)
+                translator = None if self.binary else AsciiEncoder()
+                return self.send_data(data_conn, f, limit, translator)
+
+        self.transfer(operation, fault)
+
+    def cmd_STOR(self, arg, fault):
+        self.store(arg, fault, append=False)
+
+    def cmd_APPE(self, arg, fault):
+        self.store(arg, fault, append=True)
+
+    def store(self, arg, fault, append):
+        local = self.path(arg)[1]
+        if not os.path.isdir(os.path.dirname(local)):
+            self.reply('553 Could not create file.')
+            return
+
+        def operation(data_conn, limit):
+            if append:
+                mode = 'ab'
+            elif self.rest and os.path.exists(local):
+                mode = 'r+b'
+            else:
+                mode = 'wb'
+
+            translator = None if self.binary else AsciiDecoder(b'\n')
+            with open(local, mode) as f:
+                if mode == 'r+b':
+                    f.seek(self.rest)
+                    f.truncate()
+
+                total = 0
+                while limit is None or total < limit:
+                    chunk = data_conn.recv(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.link.consume(len(chunk))
+                    f.write(translator.translate(chunk) if translator else chunk)
+                    total += len(chunk)
+
+                if translator:
+                    f.write(translator.flush())
+
+            return limit is None
+
+        self.transfer(operation, fault)
+
+    def listing(self, arg, line_format):
+        virtual, local = self.path(arg)
+        if not os.path.isdir(local):
+            self.reply('550 Failed to open directory.')
+            return
+
+        def operation(data_conn, limit):
+            lines = []
+            for name in sorted(os.listdir(local)):
+                try:
+                    st = os.stat(os.path.join(local, name))
+                except OSError:
+                    continue
+                lines.append(line_format(name, st))
+
+            data = ''.join(f'{line}\r\n' for line in lines).encode()
+            self.link.consume(len(data))
+            data_conn.sendall(data if limit is None else data[:limit])
+            return limit is None
+
+        self.transfer(operation, None)
+
+    def cmd_LIST(self, arg, fault):
+        # Options such as -a are ignored.
+        self.listing('' if arg.startswith('-') else arg, format_list_line)
+
+    def cmd_NLST(self, arg, fault):
+        self.listing(arg, lambda name, st: name)
+
+    def cmd_MLSD(self, arg, fault):
+        self.listing(arg, format_mlsd_line)
+
+    def cmd_MLST(self, arg, fault):
+        virtual, local = self.path(arg)
+        try:
+            st = os.stat(local)
+        except OSError:
+            self.reply('550 No such file or directory.')
+            return
+        self.reply(f'250-Listing {virtual}\r\n {format_mlsd_line(virtual, st)}\r\n250 End')
+
+
+class DeflateSocket:
+    '''DeflateSocket
+    The data connection of a MODE Z transfer. Data sent is compressed and
+    data received is decompressed, and the link is paid for in compressed
+    bytes. Unless data was received, closing ends the compressed stream, so
+    an empty file is still sent as a complete stream.'''
+
+    def __init__(self, conn, level, link):
+        self.conn = conn
+        self.link = link
+        self.compressor = zlib.compressobj(level)
+        self.decompressor = zlib.decompressobj()
+        self.received = False
+
+    def send_block(self, block):
+        if block:
+            self.link.consume(len(block))
+            self.conn.sendall(block)
+
+    def sendall(self, data):
+        self.send_block(self.compressor.compress(data))
+
+    def sendfile(self, f, offset=0):
+        f.seek(offset)
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            self.sendall(chunk)
+
+    def recv(self, bufsize):
+        self.received = True
+        while True:
+            data = self.decompressor.unconsumed_tail
+            if not data:
+                data = self.conn.recv(bufsize)
+
+                # Test if client closed the data connection.
+                if not data:
+                    return self.decompressor.flush()
+                self.link.consume(len(data))
+
+            out = self.decompressor.decompress(data, bufsize)
+            if out:
+                return out
+
+    def close(self):
+        try:
+            if not self.received:
+                self.send_block(self.compressor.flush())
+        except OSError:
+            pass
+        finally:
+            self.conn.close()
+
+
+# The link of a MODE Z operation, which the DeflateSocket pays for instead.
+UNLIMITED = TokenBucket()
+
+
+def format_time(t):
+    '''format_time(t) -> YYYYMMDDHHMMSS time value (UTC)'''
+
+    return time.strftime('%Y%m%d%H%M%S', time.gmtime(t))
+
+
+def format_mlsd_line(name, st):
+    '''format_mlsd_line(name, st) -> MLSD line'''
+
+    kind = 'dir' if stat.S_ISDIR(st.st_mode) else 'file'
+    return f'type={kind};size={st.st_size};modify={format_time(st.st_mtime)}; {name}'
+
+
+def format_list_line(name, st):
+    '''format_list_line(name, st) -> Unix style LIST line'''
+
+    kind = 'd' if stat.S_ISDIR(st.st_mode) else '-'
+    stamp = time.strftime('%b %d %Y', time.gmtime(st.st_mtime))
+    return f'{kind}rw-r--r--   1 ftp      ftp {st.st_size:>12} {stamp} {name}'
+
+
+if __name__ == '__main__':
+    root = sys.argv[1] if len(sys.argv) > 1 else '.'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 2121
+    server = TestServer(root, port=port).start()
+    print(f'Serving {server.root} on {server.host}:{server.port}')
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
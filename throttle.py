@@ -0,0 +1,147 @@
+# CS472 - Homework #4
+# Edward Parrish
+# throttle.py
+#
+# This module is the throttle module of the FTP client. It contains the
+# TokenBucket class which caps the rate of data transfers, the RateLimiter
+# class which applies several buckets at once and the process-wide bucket
+# shared by every session.
+
+import math
+import threading
+import time
+
+BURST_SECONDS = 0.05
+
+UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+class TokenBucket:
+    '''TokenBucket
+    A thread-safe token bucket that allows rate bytes per second. Tokens
+    refill continuously up to a burst of BURST_SECONDS worth of data, so an
+    idle bucket cannot release a large burst at once. A transfer that takes
+    more tokens than are left goes into debt and sleeps, outside the lock,
+    until the debt is paid, which keeps the long-run average at rate no
+    matter how many threads share the bucket. A rate of None or 0 is
+    unlimited.'''
+
+    def __init__(self, rate=None):
+        self.lock = threading.Lock()
+        self.rate = None
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        '''set_rate(rate)
+        Change the rate, in bytes per second. Transfers already running
+        follow the new rate from their next chunk.'''
+
+        with self.lock:
+            self.rate = rate or None
+            self.capacity = rate * BURST_SECONDS if rate else 0.0
+            self.tokens = min(self.tokens, self.capacity)
+            self.updated = time.monotonic()
+
+    def is_limited(self):
+        return self.rate is not None
+
+    def consume(self, nbytes):
+        '''consume(nbytes)
+        Take nbytes tokens, sleeping until the bucket can afford them.'''
+
+        wait = self.reserve(nbytes)
+        if wait > 0:
+            time.sleep(wait)
+
+    def reserve(self, nbytes):
+        '''reserve(nbytes) -> seconds
+        Take nbytes tokens without sleeping and return how long the caller
+        must wait before it may send them, so a transfer on an event loop can
+        wait with asyncio.sleep instead.'''
+
+        with self.lock:
+            # Test if bucket is unlimited.
+            if not self.rate:
+                return 0.0
+
+            now = time.monotonic()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= nbytes
+
+            # Test if bucket is in debt.
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimiter:
+    '''RateLimiter
+    Apply several token buckets to one transfer, for example its own limit,
+    its session's limit and the global limit. The transfer runs at the rate
+    of the slowest bucket.'''
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+
+    def consume(self, nbytes):
+        '''consume(nbytes)
+        Take nbytes tokens from every bucket, sleeping until the slowest can
+        afford them.'''
+
+        wait = self.reserve(nbytes)
+        if wait > 0:
+            time.sleep(wait)
+
+    def reserve(self, nbytes):
+        '''reserve(nbytes) -> seconds
+        Take nbytes tokens from every bucket without sleeping and return how
+        long the slowest asks the caller to wait.'''
+
+        return max((bucket.reserve(nbytes) for bucket in self.buckets), default=0.0)
+
+
+def transfer_limiter(transfer_limit=None, session_limit=None):
+    '''transfer_limiter(transfer_limit=None, session_limit=None) -> RateLimiter
+    Return the rate limiter for a new transfer: a bucket of its own if a
+    per-transfer rate is given, the session's bucket and the global bucket.
+    Unlimited buckets are left out, and None is returned if every bucket is
+    unlimited, so unlimited transfers take the fast path.'''
+
+    buckets = []
+    if transfer_limit:
+        buckets.append(TokenBucket(transfer_limit))
+    if session_limit and session_limit.is_limited():
+        buckets.append(session_limit)
+    if global_limit.is_limited():
+        buckets.append(global_limit)
+
+    return RateLimiter(buckets) if buckets else None
+
+
+def parse_rate(value):
+    '''parse_rate(value) -> bytes per second
+    Parse a rate such as "500K", "10M" or "1.5G" (binary units, per second).
+    "off", "none" and "0" mean unlimited and return None. Raise ValueError
+    if the rate is malformed, negative or not finite.'''
+
+    value = value.strip().upper().removesuffix('/S').removesuffix('B')
+
+    # Test if rate turns the limit off.
+    if value in ('OFF', 'NONE', '0', ''):
+        return None
+
+    unit = value[-1] if value[-1] in UNITS else ''
+    rate = float(value[:-1] if unit else value) * UNITS[unit]
+
+    # Test if rate is negative, infinite or not a number.
+    if not math.isfinite(rate) or rate < 0:
+        raise ValueError(f'Invalid rate: {value}')
+
+    return int(rate) or None
+
+
+# The limit shared by every transfer of every session in the process.
+global_limit = TokenBucket()
@@ -0,0 +1,75 @@
+# CS472 - Homework #4
+# Edward Parrish
+# transfer.py
+#
+# This module is the transfer module of the FTP client. It contains the
+# TransferState class which holds the per-chunk logic of a data transfer,
+# shared by the blocking and the asyncio data connections.
+
+import time
+
+
+class TransferState:
+    '''TransferState
+    The per-chunk logic of one data transfer: how much to read next, the
+    ASCII translation, the rate limit, progress and the time of the first
+    byte. It does no I/O. The blocking DataConnection and the asyncio
+    AsyncDataConnection each drive it with their own sockets and files. The
+    transfer ends after size bytes, if size is given.'''
+
+    __slots__ = ('sizer', 'size', 'translator', 'limiter', 'progress',
+                 'total', 'first_byte_at')
+
+    def __init__(self, sizer, size=None, translator=None, limiter=None,
+                 progress=None):
+        self.sizer = sizer
+        self.size = size
+        self.translator = translator
+        self.limiter = limiter
+        self.progress = progress
+        self.total = 0
+        self.first_byte_at = None
+
+    def is_done(self):
+        return self.size is not None and self.total >= self.size
+
+    def next_size(self):
+        '''next_size() -> number of bytes
+        The size of the next chunk to read. It never reads past size.'''
+
+        if self.size is None:
+            return self.sizer.size
+
+        return min(self.sizer.size, self.size - self.total)
+
+    def count(self, n):
+        '''count(n) -> seconds
+        Count a chunk of n bytes and return how long the rate limit asks the
+        transfer to wait before it goes on. The caller does the waiting, with
+        time.sleep or asyncio.sleep.'''
+
+        if self.first_byte_at is None:
+            self.first_byte_at = time.monotonic()
+
+        self.total += n
+        self.sizer.update(n)
+        if self.progress:
+            self.progress.update(n)
+
+        return self.limiter.reserve(n) if self.limiter else 0.0
+
+    def translate(self, data):
+        '''translate(data) -> bytes
+        Translate one chunk, if the transfer has a translator.'''
+
+        if self.translator:
+            return self.translator.translate(data)
+
+        return data
+
+    def flush(self):
+        '''flush() -> bytes
+        Return the bytes the translator held back at the end of the
+        transfer.'''
+
+        return self.translator.flush() if self.translator else b''
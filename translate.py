@@ -0,0 +1,111 @@
+# CS472 - Homework #4
+# Edward Parrish
+# translate.py
+#
+# This module is the translation module of the FTP client. It contains the
+# incremental line ending translators used for ASCII (TYPE A) transfers. Data
+# stays as bytes and is translated chunk by chunk as it streams, so ASCII
+# transfers never hold a whole file in memory or decode it.
+
+import os
+
+CR = b'\r'
+LF = b'\n'
+CRLF = b'\r\n'
+
+
+class AsciiDecoder:
+    '''AsciiDecoder
+    Translate network line endings (CRLF) into local line endings. A CR at
+    the end of one chunk is held back until the next chunk shows whether it
+    starts a CRLF pair.'''
+
+    def __init__(self, newline=os.linesep.encode()):
+        self.newline = newline
+        self.pending_cr = False
+
+    def translate(self, data):
+        '''translate(data) -> bytes
+        Translate one chunk.'''
+
+        data = bytes(data)
+
+        # Test if the last chunk ended with a CR.
+        if self.pending_cr:
+            data = CR + data
+            self.pending_cr = False
+
+        # Test if this chunk ends with a CR that may start a CRLF pair.
+        if data.endswith(CR):
+            data = data[:-1]
+            self.pending_cr = True
+
+        # Test if translation is needed at all.
+        if self.newline == CRLF:
+            return data
+
+        return data.replace(CRLF, self.newline)
+
+    def flush(self):
+        '''flush() -> bytes
+        Return the bytes held back at the end of the transfer.'''
+
+        if self.pending_cr:
+            self.pending_cr = False
+            return CR
+
+        return b''
+
+
+class AsciiEncoder:
+    '''AsciiEncoder
+    Translate local line endings into network line endings (CRLF). Bare LF
+    becomes CRLF; existing CRLF pairs are left alone, even when the pair is
+    split across two chunks.'''
+
+    def __init__(self):
+        self.last_cr = False
+
+    def translate(self, data):
+        '''translate(data) -> bytes
+        Translate one chunk.'''
+
+        data = bytes(data)
+
+        # Test if there is nothing to translate.
+        if not data:
+            return data
+
+        # Protect CRLF pairs, then expand every remaining LF.
+        out = data.replace(CRLF, LF).replace(LF, CRLF)
+
+        # Test if the chunk starts with the LF of a pair split across chunks.
+        if self.last_cr and data.startswith(LF):
+            out = out[1:]
+
+        self.last_cr = data.endswith(CR)
+        return out
+
+    def flush(self):
+        return b''
+
+
+class TranslatingWriter:
+    '''TranslatingWriter
+    A binary file wrapper that passes every written chunk through a
+    translator before it reaches the file.'''
+
+    def __init__(self, f, translator):
+        self.f = f
+        self.translator = translator
+
+    def write(self, data):
+        self.f.write(self.translator.translate(data))
+        return len(data)
+
+    def flush(self):
+        self.f.write(self.translator.flush())
+        self.f.flush()
+
+    def fileno(self):
+        return self.f.fileno()
@@ -0,0 +1,167 @@
+# CS472 - Homework #4
+# Edward Parrish
+# tuning.py
+#
+# This module is the tuning module of the FTP client. It contains the
+# SocketProfile class which sets the buffer sizes, keepalive and TCP_NODELAY
+# options and timeouts of control and data connections, the named profiles
+# built from it, and the ChunkSizer class which sizes the reads of a transfer
+# to the throughput it observes.
+
+import socket
+import time
+
+DEFAULT = 'default'
+LAN = 'lan'
+WAN_LONG_FAT = 'wan-long-fat'
+
+MIN_CHUNK = 16 << 10
+SAMPLE_PERIOD = 0.05
+CHUNK_INTERVAL = 0.01
+ACCEPT_TIMEOUT = 10.0
+
+# The keepalive options, where the platform has them. macOS names the idle
+# time TCP_KEEPALIVE.
+KEEPIDLE = getattr(socket, 'TCP_KEEPIDLE', getattr(socket, 'TCP_KEEPALIVE', None))
+KEEPINTVL = getattr(socket, 'TCP_KEEPINTVL', None)
+KEEPCNT = getattr(socket, 'TCP_KEEPCNT', None)
+
+
+class SocketProfile:
+    '''SocketProfile
+    The socket options and timeouts for one kind of network. rcvbuf and
+    sndbuf are the data connection buffer sizes in bytes. None leaves them
+    to the kernel, which grows them itself but too slowly to fill a long fat
+    link. The kernel caps larger sizes at its configured maximum. Transfers
+    are read in chunks of min_chunk to max_chunk bytes. keepalive is an
+    (idle seconds, interval seconds, probes) triple for the control
+    connection, or None to leave keepalive off. connect_timeout bounds a
+    connection attempt, accept_timeout bounds the wait for the server to
+    open an active mode data connection and io_timeout bounds each send and
+    receive of a data connection. A timeout of None waits forever.'''
+
+    def __init__(self, name, rcvbuf=None, sndbuf=None, nodelay=True,
+                 keepalive=None, min_chunk=MIN_CHUNK, max_chunk=256 << 10,
+                 connect_timeout=None, accept_timeout=ACCEPT_TIMEOUT,
+                 io_timeout=None):
+        self.name = name
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+        self.nodelay = nodelay
+        self.keepalive = keepalive
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.connect_timeout = connect_timeout
+        self.accept_timeout = accept_timeout
+        self.io_timeout = io_timeout
+
+    def tune_control(self, sock):
+        '''tune_control(sock)
+        Set the options of a connected control connection. TCP_NODELAY sends
+        each command at once instead of holding it back while an earlier
+        segment is unacknowledged. Keepalive stops a NAT or firewall from
+        dropping the control connection while it is idle during a long
+        transfer.'''
+
+        if self.nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        # Test if keepalive is turned on.
+        if not self.keepalive:
+            return
+
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in zip((KEEPIDLE, KEEPINTVL, KEEPCNT), self.keepalive):
+            if option is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+    def tune_data(self, sock):
+        '''tune_data(sock)
+        Set the buffer sizes of a data connection. The TCP window scale is
+        agreed when the connection opens, so this is called on a socket
+        before it connects, or on a listening socket before it accepts.'''
+
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        if self.sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+
+    def chunk_sizer(self, bufsize=None):
+        '''chunk_sizer(bufsize=None) -> ChunkSizer
+        A new ChunkSizer for one transfer: fixed at bufsize bytes if given,
+        or sized to the throughput within the limits of the profile.'''
+
+        if bufsize:
+            return ChunkSizer(bufsize, bufsize)
+
+        return ChunkSizer(self.min_chunk, self.max_chunk)
+
+
+class ChunkSizer:
+    '''ChunkSizer
+    Size the reads of a transfer to its throughput. Each read should carry
+    about CHUNK_INTERVAL seconds of data. A slow link is read in small chunks,
+    which keeps progress and rate limiting smooth. A fast link is read in
+    large chunks, which keeps Python's per-read cost low. The size is a power
+    of two from low to high bytes. It is revised every SAMPLE_PERIOD seconds.'''
+
+    __slots__ = ('low', 'high', 'size', 'started', 'nbytes')
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = max(low, high)
+        self.size = low
+        self.started = time.monotonic()
+        self.nbytes = 0
+
+    def update(self, n):
+        '''update(n) -> chunk size
+        Count n bytes transferred and return the size of the next chunk.'''
+
+        self.nbytes += n
+        now = time.monotonic()
+        elapsed = now - self.started
+
+        # Test if the sample period is over.
+        if elapsed >= SAMPLE_PERIOD:
+            target = self.nbytes / elapsed * CHUNK_INTERVAL
+            size = self.low
+            while size < target and size < self.high:
+                size <<= 1
+            self.size = min(size, self.high)
+            self.started = now
+            self.nbytes = 0
+
+        return self.size
+
+
+PROFILES = {
+    # Kernel buffer tuning and no timeouts beyond the accept wait.
+    DEFAULT: SocketProfile(DEFAULT),
+    # Fast links with short round trips, up to 10 GbE: moderate buffers,
+    # large reads and quick failure.
+    LAN: SocketProfile(
+        LAN, rcvbuf=4 << 20, sndbuf=4 << 20, keepalive=(60, 10, 5),
+        min_chunk=64 << 10, max_chunk=1 << 20, connect_timeout=3.0,
+        accept_timeout=5.0, io_timeout=30.0),
+    # High bandwidth links with long round trips, whose bandwidth-delay
+    # product needs buffers far beyond the kernel defaults.
+    WAN_LONG_FAT: SocketProfile(
+        WAN_LONG_FAT, rcvbuf=32 << 20, sndbuf=32 << 20, keepalive=(30, 10, 6),
+        min_chunk=64 << 10, max_chunk=4 << 20, connect_timeout=15.0,
+        accept_timeout=30.0, io_timeout=120.0),
+}
+
+default_profile = PROFILES[DEFAULT]
+
+
+def parse_profile(value):
+    '''parse_profile(value) -> SocketProfile
+    Look up a socket profile by name. Raise ValueError if there is no
+    profile of that name.'''
+
+    name = value.strip().lower()
+    if name not in PROFILES:
+        raise ValueError(f'Unknown socket profile: {value}')
+
+    return PROFILES[name]
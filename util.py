@@ -119,6 +119,14 @@ class System:
         with open(path, mode='w') as f:
             f.write(content)
 
+    @staticmethod
+    def open_file(path, mode='rb'):
+        '''open_file(path, mode='rb') -> file object
+        Open a local file for streaming transfers. Binary mode is the default
+        so that file content is never decoded.'''
+
+        return open(path, mode=mode)
+
     @staticmethod
     def read_file(path):
         with open(path, mode='r') as f:
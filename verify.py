@@ -0,0 +1,201 @@
+# CS472 - Homework #4
+# Edward Parrish
+# verify.py
+#
+# This module is the verify module of the FTP client. It contains the
+# StreamHash class which hashes a transfer while it streams through the data
+# connection, the file wrappers that feed it and the parsers of the server's
+# HASH, XCRC, XMD5 and XSHA256 replies.
+
+import hashlib
+import re
+import zlib
+
+FILE_STATUS = 213
+BUFSIZE = 1 << 20
+
+CRC32 = 'CRC32'
+MD5 = 'MD5'
+SHA256 = 'SHA-256'
+AUTO = 'auto'
+
+# Algorithms in order of preference when the server offers several.
+ALGORITHMS = [SHA256, MD5, CRC32]
+
+# The commands that hash a file on servers without the HASH command.
+X_COMMANDS = {CRC32: 'XCRC', MD5: 'XMD5', SHA256: 'XSHA256'}
+
+NAMES = {'crc32': CRC32, 'crc': CRC32, 'md5': MD5, 'sha-256': SHA256,
+         'sha256': SHA256}
+
+# The first hexadecimal digest of each algorithm in an XCRC, XMD5 or XSHA256
+# reply. Some servers drop the leading zeros of a CRC.
+HEX_DIGESTS = {
+    CRC32: re.compile(r'\b(?:0[xX])?([0-9a-fA-F]{1,8})\b'),
+    MD5: re.compile(r'\b([0-9a-fA-F]{32})\b'),
+    SHA256: re.compile(r'\b([0-9a-fA-F]{64})\b'),
+}
+
+
+class StreamHash:
+    '''StreamHash
+    A hash of one algorithm, updated chunk by chunk as a transfer streams,
+    so a file is hashed without reading it a second time.'''
+
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self.crc = 0
+        self.hash = None if algorithm == CRC32 else hashlib.new(
+            'md5' if algorithm == MD5 else 'sha256')
+
+    def update(self, data):
+        if self.hash is None:
+            self.crc = zlib.crc32(data, self.crc)
+        else:
+            self.hash.update(data)
+
+    def update_file(self, f, length, bufsize=BUFSIZE):
+        '''update_file(f, length, bufsize=BUFSIZE)
+        Hash the next length bytes of an open binary file, such as the part
+        of a file an earlier attempt of a resumed transfer already sent.'''
+
+        while length > 0:
+            data = f.read(min(bufsize, length))
+
+            # Test if file is shorter than expected.
+            if not data:
+                break
+
+            self.update(data)
+            length -= len(data)
+
+    def hexdigest(self):
+        if self.hash is None:
+            return f'{self.crc:08x}'
+
+        return self.hash.hexdigest()
+
+    def matches(self, digest):
+        '''matches(digest) -> bool
+        Test if a digest reported by the server equals this hash. Case and
+        the leading zeros some servers drop from a CRC are ignored.'''
+
+        digest = digest.lower().removeprefix('0x')
+        if self.hash is None:
+            try:
+                return int(digest, 16) == self.crc
+            except ValueError:
+                return False
+
+        return digest == self.hash.hexdigest()
+
+
+class HashingWriter:
+    '''HashingWriter
+    A binary file wrapper that hashes every written chunk on its way to the
+    file.'''
+
+    def __init__(self, f, hasher):
+        self.f = f
+        self.hasher = hasher
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+    def fileno(self):
+        return self.f.fileno()
+
+
+class HashingReader:
+    '''HashingReader
+    A binary file wrapper that hashes every chunk read from the file.'''
+
+    def __init__(self, f, hasher):
+        self.f = f
+        self.hasher = hasher
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.hasher.update(data)
+        return data
+
+    def readinto(self, buf):
+        n = self.f.readinto(buf)
+        if n:
+            self.hasher.update(memoryview(buf)[:n])
+        return n
+
+    def seek(self, offset, whence=0):
+        return self.f.seek(offset, whence)
+
+    def fileno(self):
+        return self.f.fileno()
+
+
+def parse_algorithm(value):
+    '''parse_algorithm(value) -> algorithm
+    Parse the name of a hash algorithm, such as "sha-256" or "crc32". "on"
+    returns AUTO, which lets the server's offer decide, and "off" returns
+    None. Raise ValueError if the name is unknown.'''
+
+    value = value.strip().lower()
+
+    if value == 'on':
+        return AUTO
+    if value == 'off':
+        return None
+    if value not in NAMES:
+        raise ValueError(f'Unknown hash algorithm: {value}')
+
+    return NAMES[value]
+
+
+def parse_hash_feature(value):
+    '''parse_hash_feature(value) -> (algorithms, selected algorithm)
+    Parse the algorithm list of a HASH feature, such as
+    "SHA-1;SHA-256*;MD5", where the selected algorithm is marked with *.
+    Only algorithms this module can compute are returned.'''
+
+    algorithms = []
+    selected = None
+    for name in value.upper().split(';'):
+        name = name.strip()
+        current = name.endswith('*')
+        name = name.rstrip('*')
+
+        if name in X_COMMANDS:
+            algorithms.append(name)
+            if current:
+                selected = name
+
+    return algorithms, selected
+
+
+def parse_hash_reply(response):
+    '''parse_hash_reply(response) -> hex digest
+    Parse the digest from a 213 reply to the HASH command, which reads
+    "algorithm start-end digest path". Return None if the reply does not
+    report a digest.'''
+
+    if not response or response.code != FILE_STATUS:
+        return None
+
+    words = response.message.split(' ', 3)
+    return words[2] if len(words) >= 3 else None
+
+
+def parse_x_hash_reply(response, algorithm):
+    '''parse_x_hash_reply(response, algorithm) -> hex digest
+    Parse the digest of algorithm from a reply to the XCRC, XMD5 or XSHA256
+    command. Return None if the command failed or the reply holds no
+    digest.'''
+
+    if not response or response.code // 100 != 2:
+        return None
+
+    match = HEX_DIGESTS[algorithm].search(response.message)
+    return match.group(1) if match else None